@@ -1,5 +1,5 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 from transformers import pipeline
@@ -18,6 +18,14 @@ DB_PARAMS = {
 # --- Константы ---
 DUPLICATE_LOOKBACK_DAYS = 1
 SIMILARITY_THRESHOLD = 0.85
+INGEST_BATCH_SIZE = 200       # статей на один INSERT и один commit
+EMBEDDING_BATCH_SIZE = 32
+
+INSERT_COLUMNS = (
+    "id", "title", "url", "source", "published_at", "content", "description", "author", "source_name",
+    "language", "country", "category", "tags", "tickers", "sentiment", "sentiment_score",
+    "relevance_score", "hotness_score", "is_duplicate", "embedding", "credibility_score",
+)
 
 # --- Глобальные переменные для ленивой инициализации ---
 conn = None
@@ -78,15 +86,68 @@ def calculate_relevance(text: str, query: str = "finance") -> float:
     score = cosine_similarity([emb_text], [emb_query])[0][0]
     return float(score)
 
-def insert_article(article_json: dict):
+def get_local_embeddings(texts: list) -> list:
+    """Эмбеддинги пачкой: модель считает их батчами, а не по одному тексту"""
     init()
+    return model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE, convert_to_numpy=True,
+                        show_progress_bar=False).tolist()
 
-    cursor.execute("SELECT 1 FROM news_articles WHERE id = %s", (article_json['id'],))
-    if cursor.fetchone():
-        print(f"Новость {article_json['id']} уже есть в базе — пропускаем")
-        return False
+def classify_categories(texts: list) -> list:
+    init()
+    if not texts:
+        return []
+    labels = ["finance", "crypto", "stocks", "macro"]
+    results = classifier(texts, labels)
+    if isinstance(results, dict):
+        results = [results]
+    return [result["labels"][0] for result in results]
+
+def analyze_sentiments(texts: list) -> list:
+    """analyze_sentiment для пачки текстов: [(значение, метка, уверенность), ...]"""
+    init()
+    outcomes = []
+    for result in sentiment_analyzer([text[:512] for text in texts]):
+        label = result["label"].lower()
+        if "positive" in label:
+            outcomes.append((1, "positive", result["score"]))
+        elif "negative" in label:
+            outcomes.append((-1, "negative", result["score"]))
+        else:
+            outcomes.append((0, "neutral", result["score"]))
+    return outcomes
 
-    text_for_embedding = ' '.join(filter(None, [
+def fetch_group_representatives(group_ids: list) -> dict:
+    """Уже загруженные статьи групп duplicate_group (по отпечаткам нормализатора): {id: строка}"""
+    if not group_ids:
+        return {}
+    cursor.execute("""
+        SELECT id, is_duplicate, embedding, category, sentiment, sentiment_score, relevance_score
+        FROM news_articles
+        WHERE id = ANY(%s) AND embedding IS NOT NULL
+    """, (list(group_ids),))
+    return {row['id']: row for row in cursor.fetchall()}
+
+def next_duplicate_group() -> int:
+    cursor.execute("SELECT COALESCE(MAX(is_duplicate), -1) + 1 AS new_group FROM news_articles")
+    return cursor.fetchone()['new_group']
+
+def join_duplicate_group(existing, new_group=next_duplicate_group, stored: bool = True) -> int:
+    """Номер группы дубликатов существующей статьи; если группы ещё нет — заводит новую.
+
+    Номер записывается и в сам словарь existing, чтобы следующие статьи пачки, похожие
+    на ту же статью, попали в ту же группу. stored=False — статья из этой же пачки,
+    её строки в таблице ещё нет.
+    """
+    if existing['is_duplicate'] >= 0:
+        return existing['is_duplicate']
+    duplicate_group_id = new_group()
+    existing['is_duplicate'] = duplicate_group_id
+    if stored:
+        cursor.execute("UPDATE news_articles SET is_duplicate = %s WHERE id = %s", (duplicate_group_id, existing['id']))
+    return duplicate_group_id
+
+def text_for_embedding(article_json: dict) -> str:
+    return ' '.join(filter(None, [
         article_json.get('title'),
         article_json.get('description'),
         article_json.get('content'),
@@ -95,63 +156,173 @@ def insert_article(article_json: dict):
         ' '.join(article_json.get('tags') or []),
         ' '.join(article_json.get('tickers') or [])
     ]))
-    embedding = get_local_embedding(text_for_embedding)
-
-    category = article_json.get('category') or classify_category(text_for_embedding)
-    sentiment_value, sentiment_enum, sentiment_score = analyze_sentiment(text_for_embedding)
-    relevance_score = calculate_relevance(text_for_embedding, query="finance news")
-    hotness_score = article_json.get('hotness', 0.0)
-    credibility_score = article_json.get('credibility', 0)
-
-    recent_articles = fetch_recent_articles()
-    duplicate_group_id = -1
-
-    for existing in recent_articles:
-        score = cosine_similarity([embedding], [existing['embedding']])[0][0]
-        if score >= SIMILARITY_THRESHOLD:
-            if existing['is_duplicate'] >= 0:
-                duplicate_group_id = existing['is_duplicate']
-            else:
-                cursor.execute("SELECT COALESCE(MAX(is_duplicate), -1) + 1 AS new_group FROM news_articles")
-                duplicate_group_id = cursor.fetchone()['new_group']
-                cursor.execute("UPDATE news_articles SET is_duplicate = %s WHERE id = %s", (duplicate_group_id, existing['id']))
-            break
 
-    cursor.execute("""
-        INSERT INTO news_articles
-        (id, title, url, source, published_at, content, description, author, source_name,
-         language, country, category, tags, tickers, sentiment, sentiment_score,
-         relevance_score, hotness_score, is_duplicate, embedding, credibility_score)
-        VALUES (%(id)s, %(title)s, %(url)s, %(source)s, %(published_at)s, %(content)s, %(description)s,
-                %(author)s, %(source_name)s, %(language)s, %(country)s, %(category)s,
-                %(tags)s, %(tickers)s, %(sentiment)s, %(sentiment_score)s,
-                %(relevance_score)s, %(hotness_score)s, %(is_duplicate)s, %(embedding)s, %(credibility_score)s)
-    """, {
-        'id': article_json['id'],
-        'title': article_json.get('title'),
-        'url': article_json.get('url'),
-        'source': article_json.get('source'),
-        'published_at': article_json.get('published_at'),
-        'content': article_json.get('content'),
-        'description': article_json.get('description'),
-        'author': article_json.get('author'),
-        'source_name': article_json.get('source_name'),
-        'language': article_json.get('language'),
-        'country': article_json.get('country'),
-        'category': category,
-        'tags': article_json.get('tags') or [],
-        'tickers': article_json.get('tickers') or [],
-        'sentiment': sentiment_enum,
-        'sentiment_score': sentiment_value,
-        'relevance_score': relevance_score,
-        'hotness_score': hotness_score,
-        'is_duplicate': duplicate_group_id,
-        'embedding': embedding,
-        'credibility_score': credibility_score
-    })
-    conn.commit()
-    print(f"Новость {article_json['id']} добавлена с категорией={category}, sentiment={sentiment_enum}, relevance={relevance_score:.2f}, hotness={hotness_score}, credibility={credibility_score}, is_duplicate={duplicate_group_id}")
-    return True
+def build_rows(articles: list) -> list:
+    """Строки news_articles для новых статей пачки: модели прогоняются один раз на всю пачку.
+
+    Перепечатки (duplicate_group от нормализатора) берут эмбеддинг и оценки уже загруженной
+    статьи или статьи из этой же пачки. Остальные сравниваются по эмбеддингу со статьями
+    за DUPLICATE_LOOKBACK_DAYS и с предыдущими статьями пачки.
+    """
+    batch_ids = {str(a['id']) for a in articles}
+    groups = {str(a['duplicate_group']) for a in articles
+              if a.get('duplicate_group') and str(a['duplicate_group']) != str(a['id'])}
+    representatives = fetch_group_representatives(groups - batch_ids)
+
+    # Модели — только для статей, которым не нашлось представителя в базе или раньше в пачке
+    fresh, earlier = [], set()
+    for article_json in articles:
+        group = str(article_json.get('duplicate_group') or article_json['id'])
+        if group not in representatives and group not in earlier:
+            fresh.append(article_json)
+        earlier.add(str(article_json['id']))
+    texts = [text_for_embedding(a) for a in fresh]
+    embeddings = get_local_embeddings(texts) if texts else []
+    uncategorized = [i for i, a in enumerate(fresh) if not a.get('category')]
+    categories = dict(zip(uncategorized, classify_categories([texts[i] for i in uncategorized])))
+    sentiments = analyze_sentiments(texts) if texts else []
+    if texts:
+        query = model.encode("finance news", convert_to_numpy=True)
+        relevances = cosine_similarity(embeddings, [query])[:, 0].tolist()
+    computed = {
+        str(a['id']): {
+            'embedding': embeddings[i],
+            'category': a.get('category') or categories[i],
+            'sentiment': sentiments[i][1],
+            'sentiment_score': sentiments[i][0],
+            'relevance_score': float(relevances[i]),
+        }
+        for i, a in enumerate(fresh)
+    }
+
+    # Новые номера групп раздаются по порядку: статьи пачки ещё не в таблице и MAX их не видит
+    allocated = []
+
+    def new_group() -> int:
+        group = next_duplicate_group() if not allocated else allocated[-1] + 1
+        allocated.append(group)
+        return group
+
+    # Статья может оказаться и представителем группы, и недавней статьёй:
+    # один словарь на строку базы, чтобы номер группы был виден обоим путям
+    recent_articles = [representatives.get(row['id'], row) for row in fetch_recent_articles()] if computed else []
+    rows, by_id = [], {}
+    for article_json in articles:
+        article_id = str(article_json['id'])
+        group = str(article_json.get('duplicate_group') or article_id)
+        if article_id in computed:
+            scores = computed[article_id]
+            duplicate_group_id = -1
+            # Сходство сразу со всеми кандидатами; берём первого выше порога, как раньше
+            candidates = recent_articles + rows
+            if candidates:
+                similarities = cosine_similarity([scores['embedding']], [c['embedding'] for c in candidates])[0]
+                match = next((k for k, score in enumerate(similarities) if score >= SIMILARITY_THRESHOLD), None)
+                if match is not None:
+                    duplicate_group_id = join_duplicate_group(candidates[match], new_group,
+                                                              stored=match < len(recent_articles))
+        else:
+            # Нормализатор уже нашёл по отпечаткам, что это перепечатка: модели не запускаем
+            representative = representatives.get(group) or by_id[group]
+            scores = {
+                'embedding': representative['embedding'],
+                'category': article_json.get('category') or representative['category'],
+                'sentiment': representative['sentiment'],
+                'sentiment_score': representative['sentiment_score'],
+                'relevance_score': representative['relevance_score'],
+            }
+            duplicate_group_id = join_duplicate_group(representative, new_group, stored=group in representatives)
+
+        row = {
+            'id': article_id,
+            'title': article_json.get('title'),
+            'url': article_json.get('url'),
+            'source': article_json.get('source'),
+            'published_at': article_json.get('published_at'),
+            'content': article_json.get('content'),
+            'description': article_json.get('description'),
+            'author': article_json.get('author'),
+            'source_name': article_json.get('source_name'),
+            'language': article_json.get('language'),
+            'country': article_json.get('country'),
+            'tags': article_json.get('tags') or [],
+            'tickers': article_json.get('tickers') or [],
+            'hotness_score': article_json.get('hotness', 0.0),
+            'credibility_score': article_json.get('credibility', 0),
+            'is_duplicate': duplicate_group_id,
+            **scores,
+        }
+        rows.append(row)
+        by_id[article_id] = row
+    return rows
+
+def insert_batch(articles: list) -> set:
+    """id статей пачки, вставленных одним INSERT ... ON CONFLICT (id) DO NOTHING; commit делает вызывающий"""
+    cursor.execute("SELECT id FROM news_articles WHERE id = ANY(%s)", ([str(a['id']) for a in articles],))
+    known = {row['id'] for row in cursor.fetchall()}
+    new_articles, seen = [], set()
+    for article_json in articles:
+        article_id = str(article_json['id'])
+        # Повтор id внутри пачки вставляется один раз
+        if article_id not in known and article_id not in seen:
+            seen.add(article_id)
+            new_articles.append(article_json)
+    if not new_articles:
+        return set()
+
+    rows = build_rows(new_articles)
+    returned = execute_values(cursor, f"""
+        INSERT INTO news_articles ({', '.join(INSERT_COLUMNS)})
+        VALUES %s
+        ON CONFLICT (id) DO NOTHING
+        RETURNING id
+    """, rows, template=f"({', '.join(f'%({c})s' for c in INSERT_COLUMNS)})",
+        page_size=len(rows), fetch=True)
+    return {row['id'] for row in returned}
+
+def insert_articles(articles: list) -> list:
+    """Загружает пачку статей одним INSERT ... ON CONFLICT (id) DO NOTHING и одним commit.
+
+    Возвращает исход для каждой статьи в исходном порядке:
+    {"id", "status": "inserted" | "exists" | "error", "error"}.
+    Уже загруженные статьи отсеиваются одним запросом до прогона моделей; статья,
+    которую между проверкой и вставкой успел добавить другой загрузчик, тоже станет "exists".
+    Если пачка целиком не прошла, статьи загружаются по одной: одна битая статья
+    не должна стоить остальных.
+    """
+    init()
+    outcomes = [{'id': str(a['id']), 'status': 'exists', 'error': None} for a in articles]
+    if not articles:
+        return outcomes
+
+    try:
+        inserted = insert_batch(articles)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        if len(articles) > 1:
+            print(f"Ошибка при загрузке пачки из {len(articles)} новостей: {e} — загружаем по одной")
+            return [insert_articles([article_json])[0] for article_json in articles]
+        outcomes[0]['status'], outcomes[0]['error'] = 'error', str(e)
+        return outcomes
+
+    counted = set()
+    for outcome in outcomes:
+        if outcome['id'] in inserted and outcome['id'] not in counted:
+            outcome['status'] = 'inserted'
+            counted.add(outcome['id'])
+    if len(articles) > 1:
+        print(f"Пачка: добавлено {len(counted)}, уже были в базе {len(outcomes) - len(counted)}")
+    return outcomes
+
+def insert_article(article_json: dict):
+    """Одна статья — пачка из одной статьи"""
+    outcome = insert_articles([article_json])[0]
+    if outcome['status'] == 'exists':
+        print(f"Новость {article_json['id']} уже есть в базе — пропускаем")
+    if outcome['status'] == 'error':
+        raise RuntimeError(outcome['error'])
+    return outcome['status'] == 'inserted'
 
 def close():
     global conn, cursor
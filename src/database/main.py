@@ -1,7 +1,9 @@
 import json
 import os
+import time
 import uuid
-from loads2 import insert_article, close, prepare_database, export_recent_news
+from collections import Counter
+from loads2 import INGEST_BATCH_SIZE, insert_articles, close, prepare_database, export_recent_news
 
 def normalize_id(article):
     """Проверяет и приводит ID новости к строковому виду"""
@@ -31,42 +33,95 @@ def normalize_id(article):
     return article
 
 
-def load_all_news():
-    """Загружает новости из всех файлов и добавляет их в базу"""
-    file_names = [
-        "finnhub.json",
-        "marketaux.json",
-        "newsapi.json",
-        "polygon.json"
-    ]
+FOLLOW_POLL_SECONDS = 0.5  # как часто проверять, не дописал ли нормализатор новые строки
+
+
+def iter_ndjson(file_name: str, follow_seconds: float = 0):
+    """Новости из NDJSON по одной, не читая файл целиком.
+
+    follow_seconds > 0 — файл ещё пишет нормализатор: ждём новых строк, пока он
+    растёт, и заканчиваем, когда follow_seconds ничего не добавлялось.
+    Недописанная последняя строка (без перевода строки) не разбирается.
+    """
+    with open(file_name, "r", encoding="utf-8") as f:
+        pending = ""
+        idle_since = time.monotonic()
+        while True:
+            line = f.readline()
+            if line:
+                pending += line
+                # Строка без перевода в конце ещё дописывается
+                if pending.endswith("\n"):
+                    record, pending = pending.strip(), ""
+                    idle_since = time.monotonic()
+                    if record:
+                        try:
+                            yield json.loads(record)
+                        except json.JSONDecodeError as e:
+                            print(f"⚠️ Битая строка в {file_name}: {e}")
+                continue
+            if time.monotonic() - idle_since >= follow_seconds:
+                break
+            time.sleep(FOLLOW_POLL_SECONDS)
+
+        # Нормализатор завершает каждую запись переводом строки: хвост без него ещё пишется
+        # и прочитается целиком при следующей загрузке файла, а не разбирается сейчас как битая
+        if pending.strip():
+            print(f"⏳ Последняя строка {file_name} ещё дописывается, пропущена")
+
+
+def iter_news_file(file_name: str, follow_seconds: float = 0):
+    """Новости из NDJSON нормализатора или из старого JSON-массива"""
+    if file_name.endswith(".ndjson"):
+        yield from iter_ndjson(file_name, follow_seconds)
+        return
+
+    with open(file_name, "r", encoding="utf-8") as f:
+        articles = json.load(f)
+    if not isinstance(articles, list):
+        print(f"⚠️ Неверный формат в {file_name} — ожидается список новостей.")
+        return
+    yield from articles
+
+
+def report_outcomes(outcomes: list) -> Counter:
+    """Печатает ошибки пачки и возвращает число статей по исходам"""
+    for outcome in outcomes:
+        if outcome['status'] == 'error':
+            print(f"Ошибка при вставке новости {outcome['id']}: {outcome['error']}")
+    return Counter(outcome['status'] for outcome in outcomes)
+
+
+def load_all_news(follow_seconds: float = 0):
+    """Загружает новости из всех файлов и добавляет их в базу.
+
+    Для каждого источника берётся NDJSON нормализатора, а если его нет — старый .json.
+    """
+    sources = ["finnhub", "marketaux", "newsapi", "polygon"]
 
     prepare_database()
 
-    for file_name in file_names:
-        if not os.path.exists(file_name):
-            print(f"Файл {file_name} не найден, пропускаем.")
+    for source in sources:
+        file_name = next((name for name in (f"{source}.ndjson", f"{source}.json") if os.path.exists(name)), None)
+        if file_name is None:
+            print(f"Файл {source}.ndjson не найден, пропускаем.")
             continue
 
         print(f"\nЗагружается файл: {file_name}")
+        totals = Counter()
+        batch = []
         try:
-            with open(file_name, "r", encoding="utf-8") as f:
-                articles = json.load(f)
-
-            if not isinstance(articles, list):
-                print(f"⚠️ Неверный формат в {file_name} — ожидается список новостей.")
-                continue
-
-            for article in articles:
+            for article in iter_news_file(file_name, follow_seconds):
                 # Проверка и исправление ID
-                article = normalize_id(article)
-
-                try:
-                    insert_article(article)
-                except Exception as e:
-                    print(f"Ошибка при вставке новости {article.get('id')}: {e}")
-
+                batch.append(normalize_id(article))
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    totals.update(report_outcomes(insert_articles(batch)))
+                    batch = []
         except Exception as e:
             print(f"Ошибка при чтении {file_name}: {e}")
+        if batch:
+            totals.update(report_outcomes(insert_articles(batch)))
+        print(f"{file_name}: добавлено {totals['inserted']}, уже были {totals['exists']}, ошибок {totals['error']}")
 
     close()
     print("\n✅ Все доступные новости обработаны и добавлены в базу данных.")
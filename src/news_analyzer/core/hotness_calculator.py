@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 
 from news_analyzer.models.data_models import NewsItem, HotnessScore
 from news_analyzer.utils.financial_data import FinancialDataProvider
+from news_analyzer.utils.language import CYRILLIC_LANGUAGES, detect_language
 from news_analyzer.utils.text_processing import TextProcessor
 
 
@@ -117,12 +118,9 @@ class HotnessCalculator:
         if news_item.language:
             return 'ru' if news_item.language in ['ru', 'russian'] else 'en'
 
-        # Определяем по содержимому
-        text = f"{news_item.title} {news_item.content or ''}"
-        russian_chars = len(re.findall(r'[а-яёА-ЯЁ]', text))
-        english_chars = len(re.findall(r'[a-zA-Z]', text))
-
-        return 'ru' if russian_chars > english_chars else 'en'
+        # Определяем по содержимому (общий сервис, результат запоминается по хэшу текста)
+        language = detect_language(f"{news_item.title} {news_item.content or ''}")
+        return 'ru' if language in CYRILLIC_LANGUAGES else 'en'
 
     def _calculate_unexpectedness(self, news_item: NewsItem, language: str) -> float:
         """ОПТИМИЗИРОВАННЫЙ расчет неожиданности события"""
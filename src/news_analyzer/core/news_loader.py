@@ -2,7 +2,7 @@
 
 import json
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 from pathlib import Path
 from datetime import datetime
 from pydantic import ValidationError
@@ -22,6 +22,11 @@ class NewsLoader:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Файл {file_path} не найден")
 
+        if file_path.endswith(('.ndjson', '.jsonl')):
+            news_data = NewsData(news=list(self.iter_ndjson(file_path)), timestamp=datetime.now())
+            print(f"Загружено и валидировано {len(news_data.news)} новостей из NDJSON")
+            return news_data
+
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
@@ -57,6 +62,34 @@ class NewsLoader:
         except Exception as e:
             raise RuntimeError(f"Неожиданная ошибка при загрузке: {e}")
 
+    def iter_ndjson(self, file_path: str) -> Iterator[NewsItem]:
+        """Построчная загрузка NDJSON нормализатора: новость отдаётся сразу после валидации.
+
+        В памяти держится одна строка, поэтому обработку можно начинать, пока файл
+        ещё дописывается. Битые и невалидные строки пропускаются с предупреждением.
+        Нормализатор завершает каждую запись переводом строки, так что последняя строка
+        без него ещё пишется — она не разбирается до следующего чтения файла.
+        """
+
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Файл {file_path} не найден")
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.endswith('\n'):
+                    if line.strip():
+                        print(f"Строка {line_number}: ещё дописывается, пропущена")
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield NewsItem(**json.loads(line))
+                except json.JSONDecodeError as e:
+                    print(f"Строка {line_number}: ошибка парсинга JSON: {e}")
+                except ValidationError as e:
+                    print(f"Строка {line_number}: ошибка валидации данных: {e}")
+
     def _convert_old_to_new_format(self, old_item: Dict[str, Any]) -> Dict[str, Any]:
         """Конвертация старого формата в новый"""
 
@@ -0,0 +1,114 @@
+"""Ключевые слова статей по TF-IDF корпуса — общие для нормализатора и анализатора
+
+Тексты разбираются пачкой: каждый токенизируется один раз, документная частота слов
+копится в таблице между пачками (и, если задан path, между запусками). Вес старых
+частот падает вдвое за каждые half_life документов, так что таблица отражает недавний
+поток новостей: слово, которое сегодня встречается в каждой статье ("said", "рынок"),
+перестаёт попадать в ключевые, а редкое для потока — поднимается выше.
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Iterable, List, Optional
+
+WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+STOP_WORDS = {
+    # en
+    "the", "and", "for", "that", "this", "with", "from", "was", "were", "will", "have", "has",
+    "are", "its", "but", "not", "you", "all", "can", "had", "her", "his", "one", "our", "out",
+    "they", "their", "them", "been", "than", "then", "more", "also", "into", "over", "after",
+    "about", "said", "says", "which", "would", "could", "there", "what", "when", "while", "who",
+    "how", "new", "year", "chars",
+    # ru
+    "для", "что", "как", "это", "все", "был", "быть", "или", "так", "уже", "еще", "его", "ее",
+    "их", "них", "том", "под", "над", "при", "без", "через", "про", "она", "они", "оно",
+    "была", "были", "будет", "этот", "эта", "эти", "также", "который", "которая", "которые",
+    "после", "года", "году",
+}
+
+
+class KeywordExtractor:
+    """TF-IDF по пачкам текстов с накопительной таблицей документной частоты"""
+
+    def __init__(self, path: Optional[str] = None, half_life: float = 2000, min_length: int = 3,
+                 max_terms: int = 100000, stop_words: Optional[set] = None):
+        self.path = path
+        self.half_life = half_life
+        self.min_length = min_length
+        self.max_terms = max_terms
+        self.stop_words = STOP_WORDS if stop_words is None else stop_words
+        self.lock = threading.Lock()
+
+        # Затухание без обхода таблицы: вместо умножения старых частот на множитель < 1
+        # растёт вес новых документов; IDF зависит только от отношения частот
+        self.df = Counter()
+        self.documents = 0.0
+        self.weight = 1.0
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.df = Counter(data.get("df", {}))
+                self.documents = float(data.get("documents", 0))
+            except Exception as e:
+                print(f"⚠️ Ошибка чтения таблицы частот {path}: {e}")
+
+    def tokenize(self, text: str) -> List[str]:
+        return [w for w in WORD_RE.findall((text or "").lower())
+                if len(w) >= self.min_length and w not in self.stop_words]
+
+    def _update(self, documents: List[List[str]]):
+        """Добавляет частоты новой пачки; старые при этом относительно затухают"""
+        for tokens in documents:
+            for word in set(tokens):
+                self.df[word] += self.weight
+        self.documents += self.weight * len(documents)
+        self.weight *= 2 ** (len(documents) / self.half_life)
+        if self.weight > 1e6 or len(self.df) > self.max_terms:
+            self._rescale()
+
+    def _rescale(self):
+        """Возвращает вес к 1 и выбрасывает слова, которые давно не встречались"""
+        self.df = Counter({word: value / self.weight for word, value in self.df.items()
+                           if value / self.weight >= 0.05})
+        if len(self.df) > self.max_terms:
+            self.df = Counter(dict(self.df.most_common(self.max_terms)))
+        self.documents /= self.weight
+        self.weight = 1.0
+
+    def extract(self, texts: Iterable[str], top_k: int = 10) -> List[List[str]]:
+        """Для каждого текста — top_k слов по убыванию TF-IDF; пустые тексты пачку не меняют"""
+        texts = list(texts)
+        documents = [self.tokenize(text) for text in texts]
+        with self.lock:
+            self._update([tokens for tokens in documents if tokens])
+            total, scale = self.documents / self.weight, self.weight
+            result = []
+            for tokens in documents:
+                if not tokens:
+                    result.append([])
+                    continue
+                tf = Counter(tokens)
+                scores = {
+                    word: count / len(tokens) * (math.log((1 + total) / (1 + self.df[word] / scale)) + 1)
+                    for word, count in tf.items()
+                }
+                result.append(sorted(scores, key=lambda w: (-scores[w], w))[:top_k])
+        return result
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            self._rescale()
+            data = {"documents": self.documents, "df": dict(self.df)}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"⚠️ Ошибка записи таблицы частот {self.path}: {e}")
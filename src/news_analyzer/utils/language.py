@@ -0,0 +1,128 @@
+"""Определение языка текста — общее для нормализатора и анализатора
+
+Сначала дешёвая гистограмма письменностей по началу текста (один проход по символам):
+  * кириллица без украинских/белорусских букв — 'ru';
+  * латиница с заметной долей английских служебных слов — 'en';
+  * кана — 'ja', хангыль — 'ko', иероглифы без каны — 'zh'.
+Статистический детектор (langdetect, с фиксированным seed — иначе результат плавает
+от запуска к запуску) вызывается только в остальных, неоднозначных случаях.
+Результаты запоминаются по хэшу проверяемого фрагмента: одна и та же новость,
+пришедшая от разных провайдеров или оцениваемая повторно, не разбирается заново.
+"""
+import hashlib
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Iterable, List, Optional
+
+try:
+    from langdetect import DetectorFactory, detect
+    DetectorFactory.seed = 0
+except ImportError:
+    detect = None
+
+SAMPLE_CHARS = 1000          # язык определяется по началу текста
+SCRIPT_DOMINANCE = 0.8       # доля букв одной письменности, при которой она считается основной
+MIN_LETTERS = 20
+EN_STOPWORD_SHARE = 0.12     # доля английских служебных слов среди слов латинского текста
+MEMO_SIZE = 20000
+
+CYRILLIC_LANGUAGES = {"ru", "uk", "be", "bg", "mk", "sr"}
+NON_RUSSIAN_CYRILLIC = set("іїєґўІЇЄҐЎ")
+
+EN_STOPWORDS = {
+    "the", "and", "of", "to", "in", "is", "for", "on", "that", "with", "as", "by", "at",
+    "from", "it", "its", "are", "was", "were", "be", "has", "have", "will", "said", "this",
+    "an", "after", "but", "not", "or", "which", "their", "than", "more",
+}
+WORD_RE = re.compile(r"[a-z]+")
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+stats = Counter()  # script / detector / memo — каким путём получен ответ
+
+
+def script_histogram(text: str) -> Counter:
+    """Число букв каждой письменности: latin, cyrillic, kana, hangul, han, other"""
+    counts = Counter()
+    for ch in text:
+        if not ch.isalpha():
+            continue
+        code = ord(ch)
+        if code < 0x250:
+            counts["latin"] += 1
+        elif 0x400 <= code < 0x530:
+            counts["cyrillic"] += 1
+        elif 0x3040 <= code < 0x3100:
+            counts["kana"] += 1
+        elif 0xAC00 <= code < 0xD7B0 or 0x1100 <= code < 0x1200:
+            counts["hangul"] += 1
+        elif 0x4E00 <= code < 0xA000:
+            counts["han"] += 1
+        else:
+            counts["other"] += 1
+    return counts
+
+
+def _by_script(sample: str) -> Optional[str]:
+    """Язык по письменности или None, если без статистического детектора не обойтись"""
+    counts = script_histogram(sample)
+    letters = sum(counts.values())
+    if letters < MIN_LETTERS:
+        return None
+    if counts["kana"]:
+        return "ja"
+    if counts["hangul"] / letters >= SCRIPT_DOMINANCE:
+        return "ko"
+    if counts["han"] / letters >= SCRIPT_DOMINANCE:
+        return "zh"
+    if counts["cyrillic"] / letters >= SCRIPT_DOMINANCE:
+        return None if NON_RUSSIAN_CYRILLIC.intersection(sample) else "ru"
+    if counts["latin"] / letters >= SCRIPT_DOMINANCE:
+        words = WORD_RE.findall(sample.lower())
+        if words and sum(w in EN_STOPWORDS for w in words) / len(words) >= EN_STOPWORD_SHARE:
+            return "en"
+    return None
+
+
+def _identify(sample: str) -> Optional[str]:
+    language = _by_script(sample)
+    if language is not None:
+        stats["script"] += 1
+        return language
+    if detect is None:
+        return None
+    stats["detector"] += 1
+    try:
+        return detect(sample)
+    except Exception:
+        return None
+
+
+def detect_language(text: str) -> Optional[str]:
+    """Код языка (ISO 639-1) или None, если текста мало или язык не определился"""
+    sample = (text or "").strip()[:SAMPLE_CHARS]
+    if not sample:
+        return None
+    key = hashlib.blake2b(sample.encode("utf-8"), digest_size=16).digest()
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            stats["memo"] += 1
+            return _memo[key]
+
+    language = _identify(sample)
+    with _memo_lock:
+        _memo[key] = language
+        if len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return language
+
+
+def detect_languages(texts: Iterable[str]) -> List[Optional[str]]:
+    """detect_language для пачки текстов; одинаковые тексты разбираются один раз"""
+    texts = list(texts)
+    unique = {text: None for text in texts}
+    for text in unique:
+        unique[text] = detect_language(text)
+    return [unique[text] for text in texts]
@@ -1,17 +1,17 @@
 import re
-from typing import List
 from collections import Counter
+from typing import List
+
+from news_analyzer.utils.keywords import STOP_WORDS, KeywordExtractor
 
 
 class TextProcessor:
     """Утилиты для обработки текста"""
 
     def __init__(self):
-        self.stop_words = {
-            'и', 'в', 'на', 'с', 'по', 'для', 'из', 'к', 'о', 'от', 'до', 'за', 'при', 'про',
-            'что', 'как', 'это', 'все', 'был', 'быть', 'или', 'не', 'но', 'же', 'так', 'уже',
-            'еще', 'его', 'ее', 'их', 'них', 'том', 'под', 'над', 'при', 'без', 'через'
-        }
+        self.stop_words = STOP_WORDS
+        # Только токенизатор: таблица частот KeywordExtractor здесь не копится
+        self.keyword_extractor = KeywordExtractor(stop_words=self.stop_words)
 
     def extract_numbers(self, text: str) -> List[float]:
         """Извлечение числовых значений из текста"""
@@ -48,20 +48,14 @@ class TextProcessor:
         return numbers
 
     def extract_keywords(self, text: str, top_k: int = 10) -> List[str]:
-        """Извлечение ключевых слов из текста"""
-
-        # Очистка и токенизация
-        text = text.lower()
-        text = re.sub(r'[^а-яё\s]', ' ', text)
-        words = text.split()
-
-        # Фильтрация
-        words = [w for w in words if w not in self.stop_words and len(w) > 2]
-
-        # Подсчет частоты
-        word_freq = Counter(words)
-
-        return [word for word, freq in word_freq.most_common(top_k)]
+        """Извлечение ключевых слов из текста: самые частые слова без стоп-слов.
+
+        Без состояния — результат зависит только от text. Токены те же, что у
+        KeywordExtractor (слова от трёх букв любой письменности, не только кириллица);
+        TF-IDF по потоку статей считает KeywordExtractor.extract в нормализаторе.
+        """
+        words = self.keyword_extractor.tokenize(text)
+        return [word for word, _ in Counter(words).most_common(top_k)]
 
     def clean_text(self, text: str) -> str:
         """Очистка текста"""
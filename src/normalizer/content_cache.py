@@ -0,0 +1,118 @@
+"""Кэш скачанного текста статей между циклами нормализатора
+
+news_*_latest.json от цикла к циклу во многом повторяются, и без кэша одна и та же
+страница скачивается и разбирается заново. Ключ — хэш канонического URL (как в индексе
+виденных URL загрузчика), значение — извлечённый текст, авторы, дата и язык. Ключевые слова
+не кэшируются: TF-IDF зависит от текущей таблицы частот, их считает keyword_stage.
+Записи живут ttl_hours; когда суммарный объём текста превышает max_bytes, вытесняются
+давно не запрошенные (LRU).
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from parser.seen_index import canonicalize_url, url_hash
+
+
+class ContentCache:
+    def __init__(self, path: str, ttl_hours: float = 168, max_bytes: int = 200 * 1024 * 1024,
+                 evict_every: int = 200):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every   # проверять объём раз в столько записей
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Обогащение идёт из пула потоков
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS content_cache (
+                url_hash TEXT PRIMARY KEY,
+                url TEXT,
+                content TEXT,
+                authors TEXT,
+                published_at TEXT,
+                language TEXT,
+                size INTEGER,
+                fetched_at REAL,
+                accessed_at REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS content_cache_accessed ON content_cache (accessed_at)")
+        self.conn.commit()
+        self.evict()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Сохранённый результат извлечения или None (нет записи или она просрочена)"""
+        key = url_hash(canonicalize_url(url))
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content, authors, published_at, language FROM content_cache "
+                "WHERE url_hash = ? AND fetched_at >= ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if not row:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE content_cache SET accessed_at = ? WHERE url_hash = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+
+        content, authors, published_at, language = row
+        return {
+            "content": content,
+            "author": authors,
+            "published_at": published_at,
+            "language": language,
+        }
+
+    def put(self, url: str, content: str, author: str = None, published_at: str = None,
+            language: str = None):
+        canonical = canonicalize_url(url)
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO content_cache "
+                "(url_hash, url, content, authors, published_at, language, size, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url_hash(canonical), canonical, content, author, published_at, language,
+                 len(content.encode("utf-8")), now, now),
+            )
+            self.conn.commit()
+            self._puts += 1
+            due = self._puts % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Удаляет просроченные записи, затем самые давно запрошенные, пока объём больше max_bytes"""
+        with self.lock:
+            self.conn.execute("DELETE FROM content_cache WHERE fetched_at < ?", (time.time() - self.ttl,))
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM content_cache").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                victims, freed = [], 0
+                for key, size in self.conn.execute("SELECT url_hash, size FROM content_cache ORDER BY accessed_at"):
+                    if freed >= excess:
+                        break
+                    victims.append((key,))
+                    freed += size
+                self.conn.executemany("DELETE FROM content_cache WHERE url_hash = ?", victims)
+            self.conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            count, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM content_cache").fetchone()
+        return {"entries": count, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,112 @@
+"""Статистика загрузки статей по доменам (между циклами нормализатора)
+
+Для каждого сайта запоминаем, сколько раз удалось достать текст, каким путём
+(напрямую или через ScraperAPI), какой экстрактор сработал и сколько в среднем
+длится загрузка. По этим данным:
+  * заведомо плохие домены (paywall, постоянные 401/403, пустые страницы) не качаются
+    вовсе — статья сразу остаётся с description; раз в retry_after_hours домен
+    пробуется снова, вдруг починился;
+  * для хороших доменов сразу выбирается рабочий путь и экстрактор.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+COLUMNS = ("domain", "attempts", "successes", "blocked", "short", "route", "extractor",
+           "avg_latency", "last_attempt", "last_success")
+
+
+class DomainStats:
+    def __init__(self, path: str, min_attempts: int = 3, bad_success_rate: float = 0.2,
+                 retry_after_hours: float = 6, smoothing: float = 0.3):
+        self.path = path
+        self.min_attempts = min_attempts
+        self.bad_success_rate = bad_success_rate
+        self.retry_after = retry_after_hours * 3600
+        self.smoothing = smoothing   # вес последней загрузки в средней латентности
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS domain_stats (
+                domain TEXT PRIMARY KEY,
+                attempts INTEGER,
+                successes INTEGER,
+                blocked INTEGER,
+                short INTEGER,
+                route TEXT,
+                extractor TEXT,
+                avg_latency REAL,
+                last_attempt REAL,
+                last_success REAL
+            )
+        """)
+        self.conn.commit()
+        # Таблица маленькая (один ряд на сайт) — держим её в памяти, на диск пишем каждое изменение
+        self.rows: Dict[str, Dict[str, Any]] = {
+            row[0]: dict(zip(COLUMNS, row))
+            for row in self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM domain_stats")
+        }
+
+    def is_bad(self, row: Dict[str, Any]) -> bool:
+        return (row["attempts"] >= self.min_attempts
+                and row["successes"] / row["attempts"] < self.bad_success_rate)
+
+    def plan(self, domain: str) -> Dict[str, Any]:
+        """Как качать статью с домена: {"skip": bool, "route": ..., "extractor": ...}"""
+        with self.lock:
+            row = self.rows.get(domain)
+            if row is None:
+                return {"skip": False, "route": None, "extractor": None}
+            if self.is_bad(row):
+                if time.time() - (row["last_attempt"] or 0) < self.retry_after:
+                    return {"skip": True, "route": None, "extractor": None}
+                # Пробная загрузка: отметим попытку сразу, чтобы параллельные статьи домена её не повторяли
+                row["last_attempt"] = time.time()
+                return {"skip": False, "route": None, "extractor": None}
+            return {"skip": False, "route": row["route"], "extractor": row["extractor"]}
+
+    def record(self, domain: str, ok: bool, latency: float, route: str = None, extractor: str = None,
+               blocked: bool = False, short: bool = False):
+        """ok — текст длиннее порога; blocked — 401/403 без обхода; short — страница без нормального текста"""
+        now = time.time()
+        with self.lock:
+            row = self.rows.get(domain) or {
+                "domain": domain, "attempts": 0, "successes": 0, "blocked": 0, "short": 0, "route": None,
+                "extractor": None, "avg_latency": None, "last_attempt": None, "last_success": None,
+            }
+            row["attempts"] += 1
+            row["blocked"] += blocked
+            row["short"] += short
+            row["avg_latency"] = latency if row["avg_latency"] is None else (
+                self.smoothing * latency + (1 - self.smoothing) * row["avg_latency"]
+            )
+            row["last_attempt"] = now
+            if ok:
+                row["successes"] += 1
+                row["route"] = route
+                row["extractor"] = extractor
+                row["last_success"] = now
+            self.rows[domain] = row
+
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO domain_stats ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                tuple(row[c] for c in COLUMNS),
+            )
+            self.conn.commit()
+
+    def get(self, domain: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.rows.get(domain)
+            return dict(row) if row else None
+
+    def bad_domains(self) -> list:
+        with self.lock:
+            return sorted(domain for domain, row in self.rows.items() if self.is_bad(row))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
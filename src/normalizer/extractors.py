@@ -0,0 +1,142 @@
+"""Извлечение текста статьи из уже скачанного HTML
+
+Страница скачивается один раз, а дальше по очереди пробуются экстракторы:
+  * newspaper  — newspaper3k разбирает готовый HTML (текст, авторы, дата публикации);
+  * paragraphs — все <p> страницы через lxml (быстро, но с мусором из подвалов и меню);
+  * readability — эвристика в духе Readability: ищем блок, в котором больше всего
+    "текстовых" абзацев, штрафуем за ссылки и служебные class/id.
+Первый результат длиннее min_chars побеждает; если не дотянул никто — берём самый длинный.
+
+parse_page собирает весь CPU-тяжёлый разбор страницы в один вызов без общего состояния,
+чтобы его можно было отдать в пул процессов.
+"""
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from lxml import etree
+from lxml import html as lxml_html
+from newspaper import Article
+
+from news_analyzer.utils.language import detect_language as identify_language
+
+MIN_CONTENT_CHARS = 200
+
+POSITIVE_HINTS = re.compile(r"article|body|content|entry|main|post|story|text", re.I)
+NEGATIVE_HINTS = re.compile(r"comment|footer|sidebar|nav|menu|related|share|social|promo|subscribe|banner|ad-", re.I)
+
+
+def parse_html(html: str):
+    """lxml-дерево без script/style; None, если HTML не разбирается"""
+    try:
+        try:
+            doc = lxml_html.document_fromstring(html)
+        except ValueError:
+            # Строка с XML-декларацией кодировки: lxml принимает такое только байтами
+            doc = lxml_html.document_fromstring(html.encode("utf-8"))
+    except (etree.ParserError, ValueError):
+        return None
+    etree.strip_elements(doc, "script", "style", "noscript", etree.Comment, with_tail=False)
+    return doc
+
+
+def _paragraph_texts(node) -> List[str]:
+    texts = (p.text_content().strip() for p in node.iter("p"))
+    return [t for t in texts if t]
+
+
+def extract_newspaper(url: str, html: str, doc) -> Optional[Dict]:
+    art = Article(url)
+    art.download(input_html=html)
+    art.parse()
+    if not art.text:
+        return None
+    return {
+        "text": art.text.strip(),
+        "authors": art.authors,
+        "publish_date": art.publish_date.isoformat() if art.publish_date else None,
+    }
+
+
+def extract_paragraphs(url: str, html: str, doc) -> Optional[Dict]:
+    if doc is None:
+        return None
+    text = "\n".join(_paragraph_texts(doc))
+    return {"text": text} if text else None
+
+
+def extract_readability(url: str, html: str, doc) -> Optional[Dict]:
+    if doc is None:
+        return None
+
+    scores = {}
+    for p in doc.iter("p"):
+        text = p.text_content().strip()
+        if len(text) < 25:
+            continue
+        score = 1 + text.count(",") + min(len(text) // 100, 3)
+        parent = p.getparent()
+        grandparent = parent.getparent() if parent is not None else None
+        for node, weight in ((parent, 1.0), (grandparent, 0.5)):
+            if node is None:
+                continue
+            if node not in scores:
+                hints = f"{node.get('class', '')} {node.get('id', '')}"
+                scores[node] = 25 * bool(POSITIVE_HINTS.search(hints)) - 25 * bool(NEGATIVE_HINTS.search(hints))
+            scores[node] += score * weight
+    if not scores:
+        return None
+
+    def link_density(node) -> float:
+        text_len = len(node.text_content()) or 1
+        return sum(len(a.text_content()) for a in node.iter("a")) / text_len
+
+    best = max(scores, key=lambda node: scores[node] * (1 - link_density(node)))
+    text = "\n".join(_paragraph_texts(best))
+    return {"text": text} if text else None
+
+
+EXTRACTORS = {
+    "newspaper": extract_newspaper,
+    "paragraphs": extract_paragraphs,
+    "readability": extract_readability,
+}
+
+
+def extract_article(url: str, html: str, prefer: str = None,
+                    min_chars: int = MIN_CONTENT_CHARS) -> Tuple[Optional[str], Optional[Dict]]:
+    """(имя экстрактора, результат) — prefer пробуется первым"""
+    order = list(EXTRACTORS)
+    if prefer in EXTRACTORS:
+        order.remove(prefer)
+        order.insert(0, prefer)
+
+    doc = parse_html(html)
+    best_name, best = None, None
+    for name in order:
+        try:
+            result = EXTRACTORS[name](url, html, doc)
+        except Exception:
+            continue
+        if not result:
+            continue
+        if len(result["text"]) > min_chars:
+            return name, result
+        if best is None or len(result["text"]) > len(best["text"]):
+            best_name, best = name, result
+    return best_name, best
+
+
+def parse_page(url: str, html: str, prefer: str = None, detect_language: bool = False) -> Dict[str, Any]:
+    """extract_article + определение языка; возвращает и pid/время воркера для отчёта"""
+    started = time.perf_counter()
+    name, result = extract_article(url, html, prefer=prefer)
+    language = identify_language(result["text"]) if result and detect_language else None
+    return {
+        "extractor": name,
+        "result": result,
+        "language": language,
+        "worker": os.getpid(),
+        "seconds": time.perf_counter() - started,
+    }
@@ -0,0 +1,211 @@
+"""Отпечатки текста статьи и поиск почти-дубликатов до эмбеддингов
+
+Два уровня:
+  * точный хэш нормализованных заголовка и текста — перепечатки слово в слово;
+  * 64-битный SimHash по шинглам из трёх слов — та же новость с правками, другой
+    подписью или обрезанным хвостом. Близость — расстояние Хэмминга <= max_distance.
+Кандидатов ищем через LSH: 64 бита режутся на max_distance + 1 полос (если 64 не делится
+нацело, первые полосы на бит шире), и по принципу Дирихле у отпечатков на расстоянии
+<= max_distance хотя бы одна полоса совпадает целиком.
+
+Группа дубликатов обозначается id первой статьи, попавшей в индекс. Индекс живёт
+в памяти и сохраняется в SQLite, так что повторы узнаются и через несколько циклов;
+статьи старше ttl_hours удаляются и из базы, и из таблиц в памяти (см. expire()).
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+SHINGLE_SIZE = 3
+MIN_SHINGLES = 8        # у совсем коротких текстов SimHash шумный — только точный хэш
+MAX_SHINGLES = 5000
+
+
+def normalize_text(text: str) -> List[str]:
+    return WORD_RE.findall((text or "").lower())
+
+
+def content_hash(title: str, content: str) -> str:
+    normalized = " ".join(normalize_text(title)) + "|" + " ".join(normalize_text(content))
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def simhash(words: List[str]) -> Optional[int]:
+    """64-битный SimHash по шинглам; None, если текст слишком короткий"""
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    shingles = list(shingles)[:MAX_SHINGLES]
+
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(len(shingles), 64)
+    # Каждый шингл голосует за 1 или 0 в каждом бите; знак суммы — бит отпечатка
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    value = 0
+    for bit in (votes > 0):
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def to_signed(value: int) -> int:
+    """SQLite хранит только знаковые 64-битные целые"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class FingerprintIndex:
+    def __init__(self, path: str, ttl_hours: float = 72, max_distance: int = 3):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        if not 0 <= max_distance < 64:
+            raise ValueError(f"max_distance must be in [0, 63], got {max_distance}")
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        # (сдвиг, ширина) каждой полосы: остаток 64 % bands раздаётся первым полосам по биту,
+        # чтобы полосы покрывали все 64 бита
+        width, extra = divmod(64, self.bands)
+        self.band_layout: List[Tuple[int, int]] = []
+        shift = 0
+        for band in range(self.bands):
+            bits = width + (band < extra)
+            self.band_layout.append((shift, bits))
+            shift += bits
+        self.lock = threading.Lock()
+
+        self.exact: Dict[str, str] = {}
+        self._exact_refs: Counter = Counter()              # сколько живых статей держат точный хэш
+        self.articles: Dict[str, Tuple[str, str]] = {}   # id статьи -> (точный хэш, группа)
+        self.tables: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in range(self.bands)]
+        # (added_at, id статьи, SimHash) в порядке добавления — для удаления по TTL
+        self._added: Deque[Tuple[float, str, Optional[int]]] = deque()
+        self._pending = []
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                article_id TEXT PRIMARY KEY,
+                exact_hash TEXT,
+                simhash INTEGER,
+                group_id TEXT,
+                added_at REAL
+            )
+        """)
+        self.conn.execute("DELETE FROM fingerprints WHERE added_at < ?", (time.time() - self.ttl,))
+        self.conn.commit()
+        rows = self.conn.execute(
+            "SELECT article_id, exact_hash, simhash, group_id, added_at FROM fingerprints ORDER BY added_at"
+        )
+        for article_id, exact, value, group, added_at in rows:
+            self.articles[article_id] = (exact, group)
+            value = None if value is None else to_unsigned(value)
+            self._index(exact, value, group)
+            self._added.append((added_at, article_id, value))
+
+    def _band_keys(self, value: int):
+        for band, (shift, bits) in enumerate(self.band_layout):
+            yield band, (value >> shift) & ((1 << bits) - 1)
+
+    def _index(self, exact: str, value: Optional[int], group: str):
+        self.exact.setdefault(exact, group)
+        self._exact_refs[exact] += 1
+        if value is not None:
+            for band, key in self._band_keys(value):
+                self.tables[band].setdefault(key, []).append((value, group))
+
+    def _unindex(self, exact: str, value: Optional[int], group: str):
+        self._exact_refs[exact] -= 1
+        if self._exact_refs[exact] <= 0:
+            del self._exact_refs[exact]
+            self.exact.pop(exact, None)
+        if value is not None:
+            for band, key in self._band_keys(value):
+                bucket = self.tables[band].get(key)
+                if bucket and (value, group) in bucket:
+                    bucket.remove((value, group))
+                    if not bucket:
+                        del self.tables[band][key]
+
+    def _near(self, value: int) -> Optional[str]:
+        best, best_distance = None, self.max_distance + 1
+        for band, key in self._band_keys(value):
+            for other, group in self.tables[band].get(key, ()):
+                distance = hamming(value, other)
+                if distance < best_distance:
+                    best, best_distance = group, distance
+        return best
+
+    def assign(self, article_id: str, title: str, content: str) -> Tuple[str, str, bool]:
+        """(точный хэш, id группы, дубликат ли) — новая статья открывает свою группу"""
+        with self.lock:
+            known = self.articles.get(article_id)
+        if known:
+            exact, group = known
+            return exact, group, group != article_id
+
+        exact = content_hash(title, content)
+        value = simhash(normalize_text(f"{title or ''} {content or ''}"))
+        with self.lock:
+            group = self.exact.get(exact)
+            if group is None and value is not None:
+                group = self._near(value)
+            duplicate = group is not None and group != article_id
+            if group is None:
+                group = article_id
+            self.articles[article_id] = (exact, group)
+            self._index(exact, value, group)
+            now = time.time()
+            self._added.append((now, article_id, value))
+            self._pending.append((article_id, exact, None if value is None else to_signed(value), group, now))
+        return exact, group, duplicate
+
+    def expire(self) -> int:
+        """Удаляет статьи старше TTL из таблиц в памяти и из базы; возвращает их число"""
+        cutoff = time.time() - self.ttl
+        expired = 0
+        with self.lock:
+            while self._added and self._added[0][0] < cutoff:
+                _, article_id, value = self._added.popleft()
+                known = self.articles.pop(article_id, None)
+                if known:
+                    self._unindex(known[0], value, known[1])
+                    expired += 1
+            if expired:
+                self.conn.execute("DELETE FROM fingerprints WHERE added_at < ?", (cutoff,))
+                self.conn.commit()
+        return expired
+
+    def flush(self):
+        """Сохраняет отпечатки, добавленные с прошлого вызова, и удаляет просроченные"""
+        with self.lock:
+            pending, self._pending = self._pending, []
+            if pending:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO fingerprints (article_id, exact_hash, simhash, group_id, added_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    pending,
+                )
+                self.conn.commit()
+        self.expire()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.conn.close()
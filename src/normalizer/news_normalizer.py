@@ -2,15 +2,27 @@ import os
 import json
 import hashlib
 import time
+import asyncio
+import multiprocessing
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timezone
-from uuid import uuid4
+from urllib.parse import quote, urlparse
 import requests
-from bs4 import BeautifulSoup
-from newspaper import Article
-from langdetect import detect
-from collections import Counter
+from requests.adapters import HTTPAdapter
 import re
 
+from news_analyzer.utils.keywords import KeywordExtractor
+from news_analyzer.utils.language import detect_languages
+from normalizer.content_cache import ContentCache
+from normalizer.domain_stats import DomainStats
+from normalizer.extractors import MIN_CONTENT_CHARS, parse_page
+from normalizer.fingerprints import FingerprintIndex
+from normalizer.processed_index import ProcessedIndex
+
 # === Папки ===
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 PARSER_DIR = os.path.join(BASE_DIR, "parser")
@@ -23,6 +35,73 @@ os.makedirs(PARSER_DIR, exist_ok=True)
 SCRAPER_API_KEY = os.getenv("SCRAPER_API_KEY", "")
 SCRAPER_API_URL = f"https://api.scraperapi.com?api_key={SCRAPER_API_KEY}&url=" if SCRAPER_API_KEY else None
 
+# === Параллельное обогащение усечённых статей ===
+ENRICH_CONCURRENCY = 16      # одновременных загрузок страниц всего
+ENRICH_PER_DOMAIN = 2        # одновременных загрузок с одного сайта
+ENRICH_CYCLE_DEADLINE = 60   # сек на обогащение за цикл; кто не успел — остаётся с description
+ENRICH_WINDOW = ENRICH_CONCURRENCY * 4   # статей в окне конвейера: память ограничена окном, а не файлом
+
+# Одна сессия на все загрузки страниц: keep-alive между статьями одного сайта
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.headers.update({
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/127.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Referer": "https://www.google.com/",
+    "Connection": "keep-alive",
+})
+_adapter = HTTPAdapter(pool_connections=ENRICH_CONCURRENCY, pool_maxsize=ENRICH_CONCURRENCY)
+HTTP_SESSION.mount("https://", _adapter)
+HTTP_SESSION.mount("http://", _adapter)
+
+# === Разбор скачанных страниц в пуле процессов ===
+# HTML-парсинг и определение языка упираются в GIL, поэтому при PARSE_WORKERS > 1
+# потоки обогащения только качают страницы, а разбирают их процессы. 1 — всё в потоках.
+PARSE_WORKERS = min(4, os.cpu_count() or 1)
+
+_parse_pool = None
+PARSE_TIMINGS = {}  # pid воркера -> [страниц, сек]
+_timings_lock = threading.Lock()
+
+# === Кэш скачанного текста (между циклами) ===
+CONTENT_CACHE_ENABLED = True
+CONTENT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content_cache.sqlite3")
+CONTENT_CACHE_TTL_HOURS = 168               # неделя: статьи после публикации почти не меняются
+CONTENT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# === Статистика по доменам: плохие пропускаем, хорошим сразу рабочий путь ===
+DOMAIN_STATS_ENABLED = True
+DOMAIN_STATS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "domain_stats.sqlite3")
+
+# === Инкрементальный режим: нормализуем только новые статьи и дописываем их в выходной файл ===
+INCREMENTAL = True
+PROCESSED_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "processed_articles.sqlite3")
+PROCESSED_TTL_HOURS = 168
+OUTPUT_MAX_BYTES = 50 * 1024 * 1024  # больше — выходной файл начинается заново (старое уже в базе)
+
+# === Отпечатки текста: дубликаты помечаются группой ещё до эмбеддингов ===
+FINGERPRINTS_ENABLED = True
+FINGERPRINTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fingerprints.sqlite3")
+FINGERPRINTS_TTL_HOURS = 72
+FINGERPRINT_MAX_DISTANCE = 3   # бит SimHash, при котором тексты считаются одной новостью
+
+# === Ключевые слова: TF-IDF по потоку статей (таблица частот живёт между циклами) ===
+KEYWORDS_DF_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "keyword_df.json")
+KEYWORDS_HALF_LIFE = 2000   # статей, за которые вес старых частот падает вдвое
+KEYWORDS_TOP_N = 10
+
+# Хранилища открываются в init_stores(), а не при импорте: импорт модуля (в том числе
+# воркерами пула разбора) не трогает файлы состояния
+CONTENT_CACHE = None
+DOMAIN_STATS = None
+PROCESSED_INDEX = None
+FINGERPRINTS = None
+KEYWORDS = None
+
 # === Уровни доверия источникам ===
 SOURCE_CREDIBILITY = {
     "newsdata": 1,
@@ -35,17 +114,32 @@ SOURCE_CREDIBILITY = {
 
 # === ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ===
 
+def init_stores():
+    """Открывает включённые хранилища: кэш текста, статистику доменов, индекс обработанных,
+    отпечатки и таблицу частот слов. Уже открытые не трогает"""
+    global CONTENT_CACHE, DOMAIN_STATS, PROCESSED_INDEX, FINGERPRINTS, KEYWORDS
+    if CONTENT_CACHE is None and CONTENT_CACHE_ENABLED:
+        CONTENT_CACHE = ContentCache(CONTENT_CACHE_PATH, ttl_hours=CONTENT_CACHE_TTL_HOURS,
+                                     max_bytes=CONTENT_CACHE_MAX_BYTES)
+    if DOMAIN_STATS is None and DOMAIN_STATS_ENABLED:
+        DOMAIN_STATS = DomainStats(DOMAIN_STATS_PATH)
+    if PROCESSED_INDEX is None and INCREMENTAL:
+        PROCESSED_INDEX = ProcessedIndex(PROCESSED_INDEX_PATH, ttl_hours=PROCESSED_TTL_HOURS)
+    if FINGERPRINTS is None and FINGERPRINTS_ENABLED:
+        FINGERPRINTS = FingerprintIndex(FINGERPRINTS_PATH, ttl_hours=FINGERPRINTS_TTL_HOURS,
+                                        max_distance=FINGERPRINT_MAX_DISTANCE)
+    if KEYWORDS is None:
+        KEYWORDS = KeywordExtractor(KEYWORDS_DF_PATH, half_life=KEYWORDS_HALF_LIFE)
+
+
 def generate_hash(text: str) -> str:
     return hashlib.md5(text.encode("utf-8")).hexdigest()
 
 
-def extract_keywords(text: str, top_n: int = 10) -> list:
-    """Простое выделение ключевых слов по частоте"""
-    text = re.sub(r"[^a-zA-Zа-яА-Я\s]", "", text)
-    words = text.lower().split()
-    stop_words = {"the", "and", "for", "that", "this", "with", "from", "was", "were", "will", "have", "has", "are"}
-    words = [w for w in words if len(w) > 3 and w not in stop_words]
-    return [w for w, _ in Counter(words).most_common(top_n)]
+def extract_keywords(text: str, top_n: int = KEYWORDS_TOP_N) -> list:
+    """Ключевые слова одного текста; в конвейере они считаются пачкой в keyword_stage"""
+    init_stores()
+    return KEYWORDS.extract([text], top_n)[0]
 
 
 def is_truncated_text(text: str) -> bool:
@@ -61,103 +155,251 @@ def is_truncated_text(text: str) -> bool:
     return False
 
 
-def enrich_from_url(article: dict) -> dict:
-    """Скачивает текст новости по URL и дополняет недостающие поля"""
+def apply_cached(article: dict, cached: dict) -> dict:
+    """Дополняет статью результатом извлечения из кэша"""
+    article["content"] = cached["content"]
+    article["keywords"] = []  # пересчитаются по полному тексту в keyword_stage
+    if cached.get("author"):
+        article["author"] = cached["author"]
+    if cached.get("published_at"):
+        article["published_at"] = cached["published_at"]
+    if not article.get("language") and cached.get("language"):
+        article["language"] = cached["language"]
+    return article
+
+
+def remember_extracted(url: str, article: dict):
+    """Кладёт успешно извлечённый текст в кэш"""
+    if CONTENT_CACHE is None:
+        return
+    try:
+        CONTENT_CACHE.put(url, article["content"], author=article.get("author"),
+                          published_at=article.get("published_at"), language=article.get("language"))
+    except Exception as e:
+        print(f"⚠️ Ошибка записи в кэш {url[:60]}...: {e}")
+
+
+def fetch_html(url: str, route: str = None) -> dict:
+    """Единственная загрузка страницы: напрямую, а на 401/403 — через ScraperAPI.
+
+    route="scraperapi" — сразу через ScraperAPI (домен известен тем, что блокирует прямые запросы).
+    Возвращает {"html", "route", "failure", "blocked"}.
+    """
+    if route != "scraperapi" or not SCRAPER_API_URL:
+        resp = HTTP_SESSION.get(url, timeout=10)
+        if resp.status_code == 200:
+            return {"html": resp.text, "route": "direct", "failure": None, "blocked": False}
+        if resp.status_code not in (401, 403):
+            return {"html": None, "route": "direct", "failure": f"HTTP {resp.status_code}", "blocked": False}
+        if not SCRAPER_API_URL:
+            return {"html": None, "route": "direct", "failure": f"HTTP {resp.status_code}", "blocked": True}
+        print(f"⚠️ {resp.status_code} для {url[:60]}... → ScraperAPI")
+
+    r2 = HTTP_SESSION.get(SCRAPER_API_URL + quote(url, safe=""), timeout=15)
+    if r2.status_code == 200:
+        return {"html": r2.text, "route": "scraperapi", "failure": None, "blocked": False}
+    return {"html": None, "route": "scraperapi", "failure": f"ScraperAPI {r2.status_code}", "blocked": True}
+
+
+def start_parse_pool():
+    """Пул создаётся из главного потока до запуска обогащения и живёт между циклами"""
+    global _parse_pool
+    if _parse_pool is None and PARSE_WORKERS > 1:
+        # spawn, а не fork: форк из процесса с работающими потоками может унаследовать чужие блокировки
+        _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _parse_pool
+
+
+def shutdown_parse_pool():
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+def run_parse_page(url: str, html: str, prefer: str = None, detect_language: bool = False,
+                   deadline: float = None) -> dict:
+    """parse_page в пуле процессов (если он есть) или в текущем потоке.
+
+    deadline — момент time.monotonic(), дольше которого результат из пула не ждём:
+    тогда возвращается None, а страница остаётся разбираться в воркере без нас.
+    """
+    parsed = None
+    pool = _parse_pool
+    if pool is not None:
+        future = pool.submit(parse_page, url, html, prefer, detect_language)
+        timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        try:
+            parsed = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            return None
+        except BrokenProcessPool as e:
+            print(f"⚠️ Пул разбора упал, разбираем в потоках: {e}")
+            shutdown_parse_pool()
+    if parsed is None:
+        parsed = parse_page(url, html, prefer, detect_language)
+
+    with _timings_lock:
+        timing = PARSE_TIMINGS.setdefault(parsed["worker"], [0, 0.0])
+        timing[0] += 1
+        timing[1] += parsed["seconds"]
+    return parsed
+
+
+def enrich_from_url(article: dict, deadline: float = None) -> dict:
+    """Скачивает текст новости по URL и дополняет недостающие поля.
+
+    Страница качается один раз (fetch_html) и разбирается цепочкой экстракторов
+    (newspaper3k → абзацы lxml → эвристика readability, см. extractors.py).
+    Путь загрузки и первый экстрактор подсказывает DOMAIN_STATS; домены, с которых
+    текст не достать, пропускаются сразу. Не разобранная к deadline страница
+    заменяется description.
+    """
     url = article.get("url")
     if not url:
         return article
 
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/127.0 Safari/537.36"
-        ),
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Referer": "https://www.google.com/",
-        "Connection": "keep-alive",
-    }
+    cached = CONTENT_CACHE.get(url) if CONTENT_CACHE is not None else None
+    if cached:
+        return apply_cached(article, cached)
 
-    # === 1️⃣ Newspaper3k ===
-    try:
-        art = Article(url)
-        art.download()
-        art.parse()
-        if art.text and len(art.text) > 200:
-            article["content"] = art.text.strip()
-            if art.authors:
-                article["author"] = ", ".join(art.authors)
-            if art.publish_date:
-                article["published_at"] = art.publish_date.isoformat()
-
-            if not article.get("language"):
-                try:
-                    article["language"] = detect(art.text[:500])
-                except:
-                    pass
+    domain = article_domain(url)
+    plan = DOMAIN_STATS.plan(domain) if DOMAIN_STATS is not None else {}
+    if plan.get("skip"):
+        print(f"⏭️ {domain} не отдаёт текст — оставляем description")
+        return fallback_to_description(article)
 
-            article["keywords"] = extract_keywords(art.text)
-            print(f"✅ Newspaper3k извлек {len(art.text)} символов из {url[:60]}...")
-            return article
-    except Exception:
-        pass
-
-    # === 2️⃣ Requests + BeautifulSoup ===
+    started = time.monotonic()
+    outcome = {"ok": False, "route": None, "extractor": None, "blocked": False, "short": False}
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        if resp.status_code == 200:
-            soup = BeautifulSoup(resp.text, "html.parser")
-            paragraphs = [p.get_text() for p in soup.find_all("p")]
-            text = "\n".join(paragraphs).strip()
+        page = fetch_html(url, route=plan.get("route"))
+        outcome.update(route=page["route"], blocked=page["blocked"])
+        if page["html"]:
+            parsed = run_parse_page(url, page["html"], prefer=plan.get("extractor"),
+                                    detect_language=not article.get("language"), deadline=deadline)
+            if parsed is None:
+                print(f"⏱️ Разбор {url[:60]}... не успел к дедлайну цикла")
+                outcome = None  # дедлайн цикла — не вина домена, в статистику не пишем
+                return fallback_to_description(article)
+            name, result = parsed["extractor"], parsed["result"]
+            text = result["text"] if result else ""
+            outcome.update(ok=len(text) > MIN_CONTENT_CHARS, short=len(text) <= MIN_CONTENT_CHARS, extractor=name)
             if text:
                 article["content"] = text
-                article["keywords"] = extract_keywords(text)
-                if not article.get("language"):
-                    try:
-                        article["language"] = detect(text[:500])
-                    except:
-                        pass
-                print(f"✅ BeautifulSoup извлёк {len(text)} символов из {url[:60]}...")
+                if result.get("authors"):
+                    article["author"] = ", ".join(result["authors"])
+                if result.get("publish_date"):
+                    article["published_at"] = result["publish_date"]
+                if not article.get("language") and parsed["language"]:
+                    article["language"] = parsed["language"]
+                article["keywords"] = []  # пересчитаются по полному тексту
+                print(f"✅ {name} извлёк {len(text)} символов из {url[:60]}...")
+                if outcome["ok"]:
+                    remember_extracted(url, article)
                 return article
-        elif resp.status_code in (401, 403) and SCRAPER_API_URL:
-            # === 3️⃣ ScraperAPI ===
-            print(f"⚠️ 401 для {url[:60]}... → ScraperAPI")
-            scraper_url = SCRAPER_API_URL + url
-            r2 = requests.get(scraper_url, headers=headers, timeout=15)
-            if r2.status_code == 200:
-                soup = BeautifulSoup(r2.text, "html.parser")
-                paragraphs = [p.get_text() for p in soup.find_all("p")]
-                text = "\n".join(paragraphs).strip()
-                if text:
-                    article["content"] = text
-                    article["keywords"] = extract_keywords(text)
-                    if not article.get("language"):
-                        try:
-                            article["language"] = detect(text[:500])
-                        except:
-                            pass
-                    print(f"✅ ScraperAPI успешно получил текст ({len(text)} символов)")
-                    return article
-            else:
-                print(f"⚠️ ScraperAPI не помог ({r2.status_code}) для {url[:60]}...")
+            print(f"⚠️ Текст не найден на {url[:60]}...")
         else:
-            print(f"⚠️ HTTP {resp.status_code} для {url[:60]}...")
+            print(f"⚠️ {page['failure']} для {url[:60]}...")
     except Exception as e:
         print(f"⚠️ Ошибка при загрузке {url[:60]}...: {e}")
+    finally:
+        if DOMAIN_STATS is not None and outcome is not None:
+            DOMAIN_STATS.record(domain, latency=time.monotonic() - started, **outcome)
+
+    return fallback_to_description(article)
+
 
-    # === 4️⃣ fallback — хотя бы description ===
+def fallback_to_description(article: dict) -> dict:
+    """Хотя бы description, если текст страницы достать не удалось"""
     if not article.get("content") and article.get("description"):
         article["content"] = article["description"]
-
     return article
 
 
+def article_domain(url: str) -> str:
+    host = (urlparse(url).hostname or "") if url else ""
+    return host[4:] if host.startswith("www.") else host
+
+
+async def enrich_articles_async(articles: list, deadline: float) -> dict:
+    """Обогащает статьи параллельно: не больше ENRICH_CONCURRENCY загрузок всего
+    и ENRICH_PER_DOMAIN на один сайт. deadline — момент time.monotonic(), после
+    которого недождавшиеся статьи остаются как есть (content = description из API).
+
+    enrich_from_url блокирующий (newspaper3k, requests), поэтому работает в пуле потоков
+    над копией статьи: опоздавший поток не может испортить уже сохранённый результат.
+    """
+    stats = {"enriched": 0, "timed_out": 0, "failed": 0}
+    if not articles:
+        return stats
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=ENRICH_CONCURRENCY, thread_name_prefix="enrich")
+    global_limit = asyncio.Semaphore(ENRICH_CONCURRENCY)
+    domain_limits = defaultdict(lambda: asyncio.Semaphore(ENRICH_PER_DOMAIN))
+
+    async def enrich_one(index: int):
+        article = articles[index]
+        # Сначала слот домена, потом общий: ожидающие своего сайта не занимают общие слоты
+        async with domain_limits[article_domain(article.get("url"))]:
+            async with global_limit:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    stats["timed_out"] += 1
+                    return
+                try:
+                    articles[index] = await asyncio.wait_for(
+                        loop.run_in_executor(executor, enrich_from_url, dict(article), deadline), remaining
+                    )
+                    stats["enriched"] += 1
+                except asyncio.TimeoutError:
+                    stats["timed_out"] += 1
+                except Exception as e:
+                    print(f"⚠️ Ошибка обогащения {str(article.get('url'))[:60]}...: {e}")
+                    stats["failed"] += 1
+
+    try:
+        await asyncio.gather(*(enrich_one(i) for i in range(len(articles))))
+    finally:
+        # Зависшие загрузки доработают в фоне, цикл их не ждёт
+        executor.shutdown(wait=False)
+    return stats
+
+
 # === ОСНОВНАЯ НОРМАЛИЗАЦИЯ ===
 
-def normalize_article(article: dict, source: str) -> dict:
+def article_id(article: dict, source: str):
+    """id статьи: свой id провайдера, generate_hash(url), а без url — хэш источника, заголовка и даты.
+
+    id должен совпадать от цикла к циклу: по нему инкрементальный режим узнаёт обработанные статьи.
+    """
+    if article.get("id"):
+        return article["id"]
+    if article.get("url"):
+        return generate_hash(article["url"])
+    title = article.get("title") or article.get("headline") or ""
+    return generate_hash(f"{source}|{title}|{article.get('published_at') or ''}")
+
+
+def fingerprint_article(normalized: dict) -> dict:
+    """content_hash и duplicate_group (id первой статьи группы) по финальному тексту.
+
+    is_duplicate не трогаем: номера групп в базе раздаёт загрузчик, а по duplicate_group
+    он берёт эмбеддинг и оценки уже загруженной статьи вместо повторного прогона моделей.
+    """
+    if FINGERPRINTS is None:
+        return normalized
+    exact, group, duplicate = FINGERPRINTS.assign(str(normalized["id"]), normalized["title"], normalized["content"])
+    normalized["content_hash"] = exact
+    normalized["duplicate_group"] = group
+    return normalized
+
+
+def normalize_article(article: dict, source: str, enrich: bool = True) -> dict:
+    """enrich=False — без загрузки страницы (её делает enrich_articles_async для всего цикла)"""
     now = datetime.now(timezone.utc).isoformat()
-    uid = article.get("id") or generate_hash(article.get("url", str(uuid4())))
+    uid = article_id(article, source)
     content = article.get("content") or article.get("description") or None
 
     normalized = {
@@ -187,8 +429,12 @@ def normalize_article(article: dict, source: str) -> dict:
     }
 
     # 🚀 Новый фильтр: проверяем, обрезан ли текст
-    if is_truncated_text(normalized["content"]):
-        normalized = enrich_from_url(normalized)
+    if enrich:
+        if is_truncated_text(normalized["content"]):
+            normalized = enrich_from_url(normalized)
+        if not normalized["keywords"] and normalized["content"]:
+            normalized["keywords"] = extract_keywords(normalized["content"])
+        fingerprint_article(normalized)
 
     return normalized
 
@@ -209,37 +455,223 @@ def load_articles(file_path: str) -> list:
         return []
 
 
-def normalize_file(input_path: str, output_path: str, source: str):
+def chunked(items, size: int):
+    """Порции по size элементов из любого итератора"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# === ПОТОКОВЫЙ КОНВЕЙЕР: загрузка → фильтр → нормализация → обогащение → язык → ключевые слова → отпечатки → запись ===
+# Этапы — генераторы над парами (номер задания, статья). В памяти одновременно
+# не больше одного окна обогащения, а записанную строку загрузчик в базу видит сразу.
+
+def load_stage(jobs: list, marks: list, incremental: bool):
+    """Сырые статьи всех входных файлов цикла; неизменившиеся файлы не читаются"""
+    for index, (input_path, _, source) in enumerate(jobs):
+        if incremental and PROCESSED_INDEX.unchanged(source, marks[index]):
+            print(f"⏭️ [{source}] файл не менялся")
+            continue
+        for article in load_articles(input_path):
+            # id считается один раз и дальше едет вместе со статьёй по всем этапам
+            article["id"] = article_id(article, source)
+            yield index, article
+
+
+def filter_stage(items, jobs: list, incremental: bool):
+    """Пропускает статьи, которые уже были обработаны (по article_id)"""
+    if not incremental:
+        yield from items
+        return
+    seen = defaultdict(set)  # повтор внутри цикла берём один раз
+    for chunk in chunked(items, ENRICH_WINDOW):
+        by_source = defaultdict(list)
+        for index, article in chunk:
+            by_source[jobs[index][2]].append(str(article["id"]))
+        fresh = {source: PROCESSED_INDEX.filter_new(source, ids) for source, ids in by_source.items()}
+        for index, article in chunk:
+            source, uid = jobs[index][2], str(article["id"])
+            if uid in fresh[source] and uid not in seen[source]:
+                seen[source].add(uid)
+                yield index, article
+
+
+def normalize_stage(items, jobs: list):
+    for index, article in items:
+        yield index, normalize_article(article, jobs[index][2], enrich=False)
+
+
+def enrich_stage(items, deadline: float, stats: dict):
+    """Обогащает усечённые статьи окнами по ENRICH_WINDOW; порядок статей сохраняется"""
+    for window in chunked(items, ENRICH_WINDOW):
+        truncated = [k for k, (_, art) in enumerate(window) if is_truncated_text(art["content"])]
+        if truncated:
+            start_parse_pool()
+            batch = [window[k][1] for k in truncated]
+            window_stats = asyncio.run(enrich_articles_async(batch, deadline))
+            for key, value in window_stats.items():
+                stats[key] += value
+            stats["truncated"] += len(batch)
+            for k, art in zip(truncated, batch):
+                window[k] = (window[k][0], art)
+        yield from window
+
+
+def language_stage(items):
+    """Язык для статей, у которых его не указал провайдер и не определил разбор страницы"""
+    for window in chunked(items, ENRICH_WINDOW):
+        missing = [art for _, art in window if not art.get("language") and art.get("content")]
+        for art, language in zip(missing, detect_languages(f"{art['title'] or ''} {art['content']}" for art in missing)):
+            art["language"] = language
+        yield from window
+
+
+def keyword_stage(items):
+    """Ключевые слова по TF-IDF пачкой на окно; частоты слов копятся в KEYWORDS между окнами и циклами"""
+    for window in chunked(items, ENRICH_WINDOW):
+        missing = [art for _, art in window if not art["keywords"] and art.get("content")]
+        for art, keywords in zip(missing, KEYWORDS.extract((art["content"] for art in missing), KEYWORDS_TOP_N)):
+            art["keywords"] = keywords
+        yield from window
+
+
+def fingerprint_stage(items, stats: dict):
+    """Отпечатки — по финальному тексту, уже после обогащения"""
+    if FINGERPRINTS is None:
+        yield from items
+        return
+    for index, art in items:
+        fingerprint_article(art)
+        stats["duplicates"] += art["duplicate_group"] != str(art["id"])
+        yield index, art
+
+
+def open_output(path: str, incremental: bool):
+    """NDJSON дописывается в инкрементальном режиме, пока файл меньше OUTPUT_MAX_BYTES"""
+    if incremental and os.path.exists(path) and os.path.getsize(path) <= OUTPUT_MAX_BYTES:
+        return open(path, "a", encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+
+def write_stage(items, jobs: list, incremental: bool) -> dict:
+    """Пишет статьи в NDJSON (одна статья — одна строка), сбрасывая файл после каждой.
+
+    Возвращает {номер задания: [id записанных статей]}.
+    """
+    written = defaultdict(list)
+    outputs = {}
+    try:
+        if not incremental:
+            # Полный режим: каждый цикл файлы пишутся заново, даже пустые
+            outputs = {index: open_output(job[1], False) for index, job in enumerate(jobs)}
+        for index, art in items:
+            f = outputs.get(index)
+            if f is None:
+                f = outputs[index] = open_output(jobs[index][1], incremental)
+            f.write(json.dumps(art, ensure_ascii=False) + "\n")
+            f.flush()
+            written[index].append(str(art["id"]))
+    finally:
+        for f in outputs.values():
+            f.close()
+    return written
+
+
+def normalize_files(jobs: list, deadline: float = None, incremental: bool = INCREMENTAL):
+    """Обрабатывает несколько JSON-файлов за один цикл: [(input_path, output_path, source), ...].
+
+    Статьи идут по конвейеру генераторов и пишутся в NDJSON по мере готовности.
+    Усечённые статьи всех файлов обогащаются вместе, с общими лимитами и общим дедлайном.
+    incremental=True — нормализуются только статьи, которых ещё не было (по article_id),
+    и дописываются в конец выходного файла; неизменившиеся входные файлы не читаются.
+    """
+    init_stores()
+    if deadline is None:
+        deadline = time.monotonic() + ENRICH_CYCLE_DEADLINE
+    incremental = incremental and PROCESSED_INDEX is not None
+
+    # Отметки файлов снимаются до чтения, сохраняются после записи результата
+    marks = [PROCESSED_INDEX.file_mark(job[0]) if incremental else None for job in jobs]
+    stats = {"truncated": 0, "enriched": 0, "timed_out": 0, "failed": 0, "duplicates": 0}
+    with _timings_lock:
+        PARSE_TIMINGS.clear()
+    started = time.monotonic()
+
+    items = load_stage(jobs, marks, incremental)
+    items = filter_stage(items, jobs, incremental)
+    items = normalize_stage(items, jobs)
+    items = enrich_stage(items, deadline, stats)
+    items = language_stage(items)
+    items = keyword_stage(items)
+    items = fingerprint_stage(items, stats)
+    try:
+        written = write_stage(items, jobs, incremental)
+    finally:
+        if FINGERPRINTS is not None:
+            FINGERPRINTS.flush()
+        KEYWORDS.save()
+
+    if stats["truncated"]:
+        print(f"✨ Обогащено {stats['enriched']}/{stats['truncated']} за {time.monotonic() - started:.1f} сек "
+              f"(не успели: {stats['timed_out']}, ошибок: {stats['failed']})")
+        with _timings_lock:
+            for pid, (pages, seconds) in sorted(PARSE_TIMINGS.items()):
+                print(f"⚙️ Воркер {pid}: {pages} стр. за {seconds:.2f} сек")
+        if CONTENT_CACHE is not None:
+            cache = CONTENT_CACHE.stats()
+            print(f"🗄️ Кэш текста: {cache['hits']} попаданий, {cache['misses']} промахов, "
+                  f"{cache['entries']} записей ({cache['bytes'] / 1024 / 1024:.1f} МБ)")
+    if stats["duplicates"]:
+        print(f"🧬 Дубликатов по отпечаткам: {stats['duplicates']}")
+
+    for index, (_, output_path, source) in enumerate(jobs):
+        ids = written.get(index, [])
+        if ids:
+            print(f"💾 [{source}] +{len(ids)} новостей → {output_path}")
+        elif incremental:
+            print(f"⏭️ [{source}] новых новостей нет")
+        if incremental:
+            # Отмечаем обработанными только после записи: при сбое статьи обработаются снова
+            PROCESSED_INDEX.add(source, ids)
+            PROCESSED_INDEX.mark_file(source, marks[index])
+
+
+def normalize_file(input_path: str, output_path: str, source: str, deadline: float = None,
+                   incremental: bool = INCREMENTAL):
     """Обрабатывает один JSON-файл"""
-    articles = load_articles(input_path)
-    normalized = [normalize_article(a, source) for a in articles]
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(normalized, f, ensure_ascii=False, indent=2)
-    print(f"💾 [{source}] {len(normalized)} новостей → {output_path}")
+    normalize_files([(input_path, output_path, source)], deadline, incremental)
 
 
 def main(cycles: int = 2, delay: int = 5):
     """Запускает циклическую нормализацию"""
     sources = {
-        "newsapi": ("news_newsapi_latest.json", "newsapi.json"),
-        "polygon": ("news_polygon_latest.json", "polygon.json"),
-        "finnhub": ("news_finnhub_latest.json", "finnhub.json"),
-        "marketaux": ("news_marketaux_latest.json", "marketaux.json"),
-        "newsdata": ("news_newsdata_latest.json", "newsdata.json"),
+        "newsapi": ("news_newsapi_latest.json", "newsapi.ndjson"),
+        "polygon": ("news_polygon_latest.json", "polygon.ndjson"),
+        "finnhub": ("news_finnhub_latest.json", "finnhub.ndjson"),
+        "marketaux": ("news_marketaux_latest.json", "marketaux.ndjson"),
+        "newsdata": ("news_newsdata_latest.json", "newsdata.ndjson"),
     }
 
     for cycle in range(1, cycles + 1):
         print(f"\n🔁 ЦИКЛ {cycle}/{cycles} ({datetime.now(timezone.utc).strftime('%H:%M:%S')})")
-        for source, (input_name, output_name) in sources.items():
-            input_path = os.path.join(PARSER_DIR, input_name)
-            output_path = os.path.join(DATABASE_DIR, output_name)
-            normalize_file(input_path, output_path, source)
+        jobs = [
+            (os.path.join(PARSER_DIR, input_name), os.path.join(DATABASE_DIR, output_name), source)
+            for source, (input_name, output_name) in sources.items()
+        ]
+        normalize_files(jobs, deadline=time.monotonic() + ENRICH_CYCLE_DEADLINE)
         if cycle < cycles:
             print(f"⏳ Пауза {delay} сек...\n")
             time.sleep(delay)
+    shutdown_parse_pool()
     print("\n✅ Все файлы сохранены в data/normalized/")
 
 
+# Запуск из src: python -m normalizer.news_normalizer
 # if __name__ == "__main__":
 #     main()
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+"""Что нормализатор уже обработал: id статей и отметки входных файлов
+
+Инкрементальный режим нормализует только статьи, id которых ещё нет в индексе,
+а файл news_*_latest.json, не менявшийся с прошлого цикла (mtime и размер), не читает вовсе.
+Id хранятся ttl_hours — дольше статья в "последних" у провайдера не живёт.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional, Set, Tuple
+
+
+class ProcessedIndex:
+    def __init__(self, path: str, ttl_hours: float = 168):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS processed_articles (
+                source TEXT,
+                article_id TEXT,
+                processed_at REAL,
+                PRIMARY KEY (source, article_id)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS file_marks (
+                source TEXT PRIMARY KEY,
+                mtime_ns INTEGER,
+                size INTEGER
+            )
+        """)
+        self.conn.commit()
+        self.purge_expired()
+
+    def purge_expired(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM processed_articles WHERE processed_at < ?", (time.time() - self.ttl,))
+            self.conn.commit()
+
+    @staticmethod
+    def file_mark(path: str) -> Optional[Tuple[int, int]]:
+        """(mtime_ns, size) файла; снимать до чтения, сохранять после записи результата"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def unchanged(self, source: str, mark: Optional[Tuple[int, int]]) -> bool:
+        """Файл тот же, что был обработан в прошлый раз"""
+        if mark is None:
+            return False
+        with self.lock:
+            row = self.conn.execute("SELECT mtime_ns, size FROM file_marks WHERE source = ?", (source,)).fetchone()
+        return row is not None and tuple(row) == mark
+
+    def mark_file(self, source: str, mark: Optional[Tuple[int, int]]):
+        if mark is None:
+            return
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO file_marks (source, mtime_ns, size) VALUES (?, ?, ?)",
+                              (source, *mark))
+            self.conn.commit()
+
+    def filter_new(self, source: str, article_ids: Iterable[str]) -> Set[str]:
+        """Id, которых ещё нет в индексе"""
+        ids = {str(i) for i in article_ids}
+        if not ids:
+            return set()
+        known = set()
+        pending = list(ids)
+        with self.lock:
+            # Порциями: у SQLite ограничено число параметров в запросе
+            for start in range(0, len(pending), 500):
+                chunk = pending[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT article_id FROM processed_articles WHERE source = ? "
+                    f"AND article_id IN ({', '.join('?' * len(chunk))})",
+                    (source, *chunk),
+                )
+                known.update(row[0] for row in rows)
+        return ids - known
+
+    def add(self, source: str, article_ids: Iterable[str]):
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO processed_articles (source, article_id, processed_at) VALUES (?, ?, ?)",
+                [(source, str(i), now) for i in article_ids],
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
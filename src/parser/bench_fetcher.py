@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Офлайн-бенчмарк пути загрузки: SurgicalNewsFetcher против MockProviderServer
+
+Пример:
+    python bench_fetcher.py --cycles 20 --latency 0.3 --error-rate 0.1 --payload-multiplier 4
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from mock_server import MockProviderServer
+from news_fetcher import SurgicalNewsFetcher
+from rate_limiter import ProviderScheduler
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_benchmark(cycles: int = 10, latency: float = 0.05, jitter: float = 0.02, error_rate: float = 0.0,
+                  payload_multiplier: int = 1, slow_provider: str = None, slow_latency: float = 2.0,
+                  verbose: bool = False) -> dict:
+    settings = {p: {"latency": latency, "jitter": jitter, "error_rate": error_rate,
+                    "payload_multiplier": payload_multiplier}
+                for p in ["newsapi", "polygon", "finnhub", "marketaux", "newsdata"]}
+    if slow_provider:
+        settings[slow_provider]["latency"] = slow_latency
+
+    cycle_times, articles, errors = [], 0, 0
+    output = None if verbose else io.StringIO()
+
+    with tempfile.TemporaryDirectory() as data_dir, MockProviderServer(settings=settings, seed=42) as server:
+        with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+            fetcher = SurgicalNewsFetcher(data_dir=data_dir)
+            server.point_clients(fetcher.clients)
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            for cycle in range(cycles):
+                # Лимиты провайдеров в бенчмарке не нужны: перед каждым циклом bucket'ы снова полные.
+                # Планировщик тем и пагинация списывают дополнительные запросы в долг, и с общими
+                # на все циклы bucket'ами такие провайдеры переставали опрашиваться
+                fetcher.scheduler = ProviderScheduler({}, list(fetcher.clients))
+                t0 = time.perf_counter()
+                results = fetcher.run_cycle()
+                cycle_times.append(time.perf_counter() - t0)
+                if len(results) != len(fetcher.clients):
+                    raise RuntimeError(f"cycle {cycle}: polled {sorted(results)} of {sorted(fetcher.clients)}")
+                for result in results.values():
+                    articles += len(result.get("raw_data", {}).get("articles", []))
+                    errors += "error" in result
+            wall = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            fetcher.close()
+
+        requests_served = sum(s["requests"] for s in server.stats.values())
+        bytes_served = sum(s["bytes"] for s in server.stats.values())
+
+    return {
+        "cycles": cycles,
+        "wall_s": round(wall, 3),
+        "cycle_p50_s": round(statistics.median(cycle_times), 3),
+        "cycle_p95_s": round(percentile(cycle_times, 0.95), 3),
+        "cycle_max_s": round(max(cycle_times), 3),
+        "requests": requests_served,
+        "requests_per_s": round(requests_served / wall, 1) if wall else 0.0,
+        "articles": articles,
+        "articles_per_s": round(articles / wall, 1) if wall else 0.0,
+        "errors": errors,
+        "mb_received": round(bytes_served / 1e6, 2),
+        "peak_traced_mb": round(peak / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline fetch-path benchmark")
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--payload-multiplier", type=int, default=1)
+    parser.add_argument("--slow-provider", default=None, help="провайдер с отдельной (большой) задержкой")
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    print("⏱️ Running fetch benchmark against mock providers...")
+    report = run_benchmark(args.cycles, args.latency, args.jitter, args.error_rate,
+                           args.payload_multiplier, args.slow_provider, args.slow_latency, args.verbose)
+    for key, value in report.items():
+        print(f"  {key:>16}: {value}")
+
+
+if __name__ == "__main__":
+    main()
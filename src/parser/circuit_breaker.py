@@ -0,0 +1,81 @@
+"""Circuit breaker на провайдера: closed → open → half-open → closed"""
+import threading
+import time
+from typing import Any, Callable, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """После failure_threshold ошибок подряд провайдер отключается на cooldown секунд.
+
+    По истечении cooldown пропускается один пробный запрос (half-open): успех закрывает
+    breaker, ошибка снова открывает его с удвоенным cooldown (но не больше max_cooldown).
+    """
+
+    def __init__(self, failure_threshold: int = 3, base_cooldown: float = 30.0,
+                 max_cooldown: float = 900.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.cooldown = base_cooldown
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.last_error = None
+
+    def allow_request(self) -> bool:
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self.probe_in_flight = False
+
+    def record_failure(self, error: str = None):
+        with self.lock:
+            self.failures += 1
+            self.last_error = error
+            if self.state == HALF_OPEN:
+                self._trip(min(self.cooldown * 2, self.max_cooldown))
+            elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                self._trip(self.base_cooldown)
+
+    def _trip(self, cooldown: float):
+        self.state = OPEN
+        self.cooldown = cooldown
+        self.opened_at = self.clock()
+        self.probe_in_flight = False
+        self.trips += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(0.0, self.cooldown - (self.clock() - self.opened_at))
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "trips": self.trips,
+                "cooldown": self.cooldown,
+                "retry_in": round(retry_in, 1),
+                "last_error": self.last_error,
+            }
@@ -1,16 +1,22 @@
 """FinnHub Client - без изменений"""
 import requests
 
+from .http_session import get_shared_session
+from .json_stream import get_json
+
 class FinnHubClient:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, session: requests.Session = None):
         self.api_key = api_key
+        self.session = session or get_shared_session()
         self.base_url = "https://finnhub.io/api/v1"
 
-    def general_news(self, category: str = "general"):
+    def general_news(self, category: str = "general", min_id: int = None, stream: bool = False):
         url = f"{self.base_url}/news"
         params = {'category': category, 'token': self.api_key}
+        if min_id:
+            params['minId'] = min_id
 
-        response = requests.get(url, params=params, timeout=7)
-        response.raise_for_status()
-        result = response.json()
+        if stream:
+            return get_json(self.session, url, params, timeout=7, stream=True)  # ответ — массив статей
+        result = get_json(self.session, url, params, timeout=7)
         return result if isinstance(result, list) else []
@@ -0,0 +1,41 @@
+"""Общий HTTP-транспорт для клиентов: пул соединений, keep-alive, сжатие"""
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+    "User-Agent": "RADAR-news-fetcher/1.0",
+}
+
+_shared_session: Optional[requests.Session] = None
+_shared_lock = threading.Lock()
+
+
+def create_session(pool_connections: int = 10, pool_maxsize: int = 10,
+                   max_retries: int = 0) -> requests.Session:
+    """Сессия с пулом keep-alive соединений.
+
+    pool_connections — сколько хостов держать в пуле,
+    pool_maxsize — сколько соединений на один хост (не меньше числа потоков опроса).
+    """
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                          max_retries=max_retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_shared_session() -> requests.Session:
+    """Сессия по умолчанию для клиентов, которым не передали свою"""
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
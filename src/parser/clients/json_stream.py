@@ -0,0 +1,68 @@
+"""Декодирование JSON-ответов провайдеров без лишних копий
+
+response.json() сначала превращает тело в str, потом целиком в объекты Python.
+Здесь два пути:
+  * load_json — orjson прямо по байтам тела (если установлен), иначе response.json();
+  * iter_json_items — потоковый разбор массива статей через ijson по мере чтения
+    сокета: статьи отдаются по одной, и в памяти не бывает всего ответа сразу.
+    Для него запрос должен быть сделан с stream=True. Без ijson тело декодируется
+    целиком и статьи отдаются из готового списка.
+"""
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def load_json(response: requests.Response) -> Any:
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def iter_json_items(response: requests.Response, key: Optional[str] = None,
+                    streamed: bool = True) -> Iterator[Dict]:
+    """Элементы массива по ключу верхнего уровня key (None — сам ответ является массивом).
+
+    streamed — запрос сделан с stream=True и тело еще не читалось; это знает вызывающий
+    (get_json), а не внутренние флаги requests. Иначе тело уже в response.content
+    и разбирается целиком.
+    """
+    try:
+        if ijson is not None and streamed:
+            response.raw.decode_content = True  # gzip/deflate разжимает urllib3
+            prefix = f"{key}.item" if key else "item"
+            yield from ijson.items(response.raw, prefix, use_float=True)
+            return
+
+        data = load_json(response)
+        items = data.get(key) if key and isinstance(data, dict) else data
+        yield from (items if isinstance(items, list) else [])
+    finally:
+        response.close()
+
+
+def get_json(session: requests.Session, url: str, params: Dict[str, Any] = None, timeout: float = 7,
+             stream_key: Optional[str] = None, stream: bool = False) -> Any:
+    """GET с проверкой статуса; при stream=True возвращает итератор элементов массива stream_key.
+
+    Статус проверяется сразу, до разбора тела, поэтому HTTP-ошибки всплывают в момент запроса.
+    """
+    response = session.get(url, params=params, timeout=timeout, stream=stream)
+    try:
+        response.raise_for_status()
+    except Exception:
+        response.close()
+        raise
+    if stream:
+        return iter_json_items(response, stream_key, streamed=True)
+    return load_json(response)
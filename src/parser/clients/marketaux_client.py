@@ -1,14 +1,20 @@
 import requests
 
+from .http_session import get_shared_session
+from .json_stream import get_json
+
 
 class MarketAuxClient:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, session: requests.Session = None):
         self.api_key = api_key
+        self.session = session or get_shared_session()
         self.base_url = "https://api.marketaux.com/v1"
 
-    def get_latest_news(self, limit: int = 50):
+    def get_latest_news(self, limit: int = 50, published_after: str = None, search: str = None,
+                        stream: bool = False):
         """
         Получение последних финансовых новостей с MarketAux
+        stream=True — генератор статей, разбираемых по мере чтения ответа
         """
         url = f"{self.base_url}/news/all"
 
@@ -22,33 +28,31 @@ class MarketAuxClient:
             'sort': 'published_at',
             'sort_order': 'desc'
         }
-
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                articles = data.get('data', [])
-
-                # Преобразуем в формат, совместимый с остальными клиентами
-                formatted_articles = []
-                for article in articles:
-                    formatted_article = {
-                        'title': article.get('title', ''),
-                        'description': article.get('description', ''),
-                        'url': article.get('url', ''),
-                        'publishedAt': article.get('published_at', ''),
-                        'source': {'name': article.get('source', '')},
-                        'content': article.get('snippet', '')
-                    }
-                    formatted_articles.append(formatted_article)
-
-                return formatted_articles
-            else:
-                print(f"MarketAux API Error: {response.status_code}")
-                return []
-        except Exception as e:
-            print(f"MarketAux Client Error: {e}")
-            return []
+        if published_after:
+            params['published_after'] = published_after  # формат Y-m-dTH:i:s
+        if search:
+            params['search'] = search  # "фраза" | слово — OR через |
+
+        # Ошибки запроса и HTTP-статусы пробрасываются, как у остальных клиентов:
+        # иначе circuit breaker не видит отказов провайдера
+        if stream:
+            return (self._format_article(a) for a in get_json(self.session, url, params, timeout=10,
+                                                              stream_key='data', stream=True))
+        data = get_json(self.session, url, params, timeout=10)
+
+        # Преобразуем в формат, совместимый с остальными клиентами
+        return [self._format_article(article) for article in data.get('data', [])]
+
+    @staticmethod
+    def _format_article(article: dict) -> dict:
+        return {
+            'title': article.get('title', ''),
+            'description': article.get('description', ''),
+            'url': article.get('url', ''),
+            'publishedAt': article.get('published_at', ''),
+            'source': {'name': article.get('source', '')},
+            'content': article.get('snippet', '')
+        }
 
     def get_market_news(self, market: str = "stocks", size: int = 50):
         """
@@ -1,20 +1,24 @@
 """NewsAPI Client - без изменений"""
 import requests
 
+from .http_session import get_shared_session
+from .json_stream import get_json
+
 class NewsApiClient:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, session: requests.Session = None):
         self.api_key = api_key
+        self.session = session or get_shared_session()
         self.base_url = "https://newsapi.org/v2"
 
     def get_everything(self, q: str = "finance", language: str = "en",
-                      from_param: str = None, to: str = None, page_size: int = 15):
+                      from_param: str = None, to: str = None, page_size: int = 15, page: int = None,
+                      stream: bool = False):
+        """stream=True — вместо ответа целиком итератор по статьям (см. json_stream)"""
         url = f"{self.base_url}/everything"
         params = {
             'apiKey': self.api_key, 'q': q, 'language': language, 
-            'pageSize': page_size, 'from': from_param, 'to': to
+            'pageSize': page_size, 'from': from_param, 'to': to, 'page': page
         }
         params = {k: v for k, v in params.items() if v is not None}
 
-        response = requests.get(url, params=params, timeout=7)
-        response.raise_for_status()
-        return response.json()
+        return get_json(self.session, url, params, timeout=7, stream_key='articles', stream=stream)
@@ -1,15 +1,23 @@
 """NewsData Client - без изменений"""
 import requests
 
+from .http_session import get_shared_session
+from .json_stream import get_json
+
 class NewsDataClient:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, session: requests.Session = None):
         self.api_key = api_key
+        self.session = session or get_shared_session()
         self.base_url = "https://newsdata.io/api/1"
 
-    def latest_news(self, category: str = "business", size: int = 8):
+    def latest_news(self, category: str = "business", size: int = 8, page: str = None, q: str = None,
+                    stream: bool = False):
+        """stream=True — итератор по results без nextPage"""
         url = f"{self.base_url}/latest"
         params = {'apikey': self.api_key, 'category': category, 'size': size}
+        if q:
+            params['q'] = q  # до 100 символов, OR между словами
+        if page:
+            params['page'] = page  # токен nextPage из предыдущего ответа
 
-        response = requests.get(url, params=params, timeout=7)
-        response.raise_for_status()
-        return response.json()
+        return get_json(self.session, url, params, timeout=7, stream_key='results', stream=stream)
@@ -1,15 +1,24 @@
 """Polygon Client - без изменений"""
 import requests
 
+from .http_session import get_shared_session
+from .json_stream import get_json
+
 class PolygonClient:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, session: requests.Session = None):
         self.api_key = api_key
+        self.session = session or get_shared_session()
         self.base_url = "https://api.polygon.io"
 
-    def get_market_news(self, limit: int = 8):
+    def get_market_news(self, limit: int = 8, published_utc_gt: str = None, stream: bool = False):
+        """stream=True — итератор по results без next_url (для запроса одной страницы)"""
         url = f"{self.base_url}/v2/reference/news"
         params = {'apikey': self.api_key, 'limit': limit}
+        if published_utc_gt:
+            params['published_utc.gt'] = published_utc_gt
+
+        return get_json(self.session, url, params, timeout=7, stream_key='results', stream=stream)
 
-        response = requests.get(url, params=params, timeout=7)
-        response.raise_for_status()
-        return response.json()
+    def get_next_page(self, next_url: str):
+        """Следующая страница по next_url из предыдущего ответа (ключ в нем не передается)"""
+        return get_json(self.session, next_url, {'apikey': self.api_key}, timeout=7)
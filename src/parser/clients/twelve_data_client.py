@@ -1,66 +1,155 @@
 """Twelve Data Client - ИСПРАВЛЕНА СИНТАКСИЧЕСКАЯ ОШИБКА
 Использует только БЕСПЛАТНЫЕ endpoints
 """
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
 import requests
 
-class TwelveDataClient:
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.base_url = "https://api.twelvedata.com"
+from .http_session import get_shared_session
+from .json_stream import load_json
 
-    def get_latest_news(self, symbol: str = "AAPL", size: int = 10):
-        """
-        ОКОНЧАТЕЛЬНО ИСПРАВЛЕНО: Используем БЕСПЛАТНЫЕ endpoints
-        Получаем данные по популярным акциям как "новости о движениях"
-        """
-        print(f"🔍 TWELVE DATA: Запрос цен топ акций как 'новости'")
+# Список популярных символов для получения данных
+DEFAULT_SYMBOLS = ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", "META", "NVDA", "JPM"]
 
-        # Список популярных символов для получения данных
-        symbols = [
-            "AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", "META", "NVDA", "JPM",][:size]
 
-        news_items = []
+class PriceCache:
+    """Короткоживущий кеш котировок, общий для всех экземпляров клиента"""
 
-        for symbol in symbols:
-            try:
-                url = f"{self.base_url}/price"
-                params = {
-                    'symbol': symbol,
-                    'apikey': self.api_key
-                }
+    def __init__(self, ttl: float = 15.0):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.items: Dict[str, tuple] = {}
 
-                print(f"🔗 TWELVE DATA: Запрос цены для {symbol}")
+    def get_many(self, symbols: List[str]):
+        """Возвращает (найденные котировки, символы которых нет в кеше)"""
+        now = time.monotonic()
+        hits, missing = {}, []
+        with self.lock:
+            for symbol in symbols:
+                entry = self.items.get(symbol)
+                if entry and now - entry[0] < self.ttl:
+                    hits[symbol] = entry[1]
+                else:
+                    missing.append(symbol)
+        return hits, missing
 
-                response = requests.get(url, params=params, timeout=5)
+    def set_many(self, prices: Dict[str, Dict]):
+        now = time.monotonic()
+        with self.lock:
+            for symbol, quote in prices.items():
+                self.items[symbol] = (now, quote)
 
+    def clear(self):
+        with self.lock:
+            self.items.clear()
 
-                print(f"📡 {symbol}: status_code={response.status_code}")
-                if response.status_code != 200:
-                    print(f"❌ {symbol}: {response.text[:100]}")
 
-                if response.status_code == 200:
-                    result = response.json()
+shared_price_cache = PriceCache()
 
-                    # ← И ЭТИ СТРОКИ:
-                    print(f"📊 {symbol}: response={result}")
 
-                    if 'price' in result:
-                        # ... остальной код
+class TwelveDataClient:
+    def __init__(self, api_key: str, session: requests.Session = None, batch_size: int = 120,
+                 max_workers: int = 8, cache: Optional[PriceCache] = None):
+        self.api_key = api_key
+        self.session = session or get_shared_session()
+        self.base_url = "https://api.twelvedata.com"
+        self.batch_size = batch_size    # символов в одном запросе /price
+        self.max_workers = max_workers  # параллельных запросов, если батчей несколько
+        self.cache = cache or shared_price_cache
+
+    def get_prices(self, symbols: List[str]) -> Dict[str, Dict]:
+        """Котировки по списку символов: кеш → батч-запросы → поштучно для неудавшихся батчей"""
+        prices, missing = self.cache.get_many(symbols)
+        if not missing:
+            return prices
+
+        chunks = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        fetched: Dict[str, Dict] = {}
+        failed: List[str] = []
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+            for chunk, batch in zip(chunks, pool.map(self._fetch_batch, chunks)):
+                if batch is None:
+                    failed.extend(chunk)
+                else:
+                    fetched.update(batch)
+
+        if failed:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(failed))) as pool:
+                for symbol, quote in zip(failed, pool.map(self._fetch_single, failed)):
+                    if quote:
+                        fetched[symbol] = quote
+
+        self.cache.set_many(fetched)
+        prices.update(fetched)
+        return prices
+
+    def _fetch_batch(self, symbols: List[str]) -> Optional[Dict[str, Dict]]:
+        """Один multi-symbol запрос /price; None — батч не удался целиком"""
+        if len(symbols) == 1:
+            quote = self._fetch_single(symbols[0])
+            return {symbols[0]: quote} if quote else {}
+        try:
+            response = self.session.get(
+                f"{self.base_url}/price",
+                params={'symbol': ",".join(symbols), 'apikey': self.api_key},
+                timeout=5,
+            )
+            if response.status_code != 200:
+                print(f"❌ TWELVE DATA batch: status_code={response.status_code} {response.text[:100]}")
+                return None
+            result = load_json(response)
+            if result.get("status") == "error":
+                print(f"❌ TWELVE DATA batch: {result.get('message', '')[:100]}")
+                return None
+            # Для нескольких символов ответ имеет вид {"AAPL": {"price": ...}, ...}
+            return {s: q for s, q in result.items() if isinstance(q, dict) and 'price' in q}
+        except Exception as e:
+            print(f"💥 TWELVE DATA batch ошибка: {e}")
+            return None
+
+    def _fetch_single(self, symbol: str) -> Optional[Dict]:
+        try:
+            response = self.session.get(
+                f"{self.base_url}/price", params={'symbol': symbol, 'apikey': self.api_key}, timeout=5
+            )
+            if response.status_code == 200:
+                result = load_json(response)
+                if 'price' in result:
+                    return result
+            else:
+                print(f"❌ {symbol}: {response.text[:100]}")
+        except Exception as e:
+            print(f"💥 TWELVE DATA {symbol} ошибка: {e}")
+        return None
+
+    def get_latest_news(self, symbol: str = "AAPL", size: int = 10, symbols: List[str] = None):
+        """
+        ОКОНЧАТЕЛЬНО ИСПРАВЛЕНО: Используем БЕСПЛАТНЫЕ endpoints
+        Получаем данные по популярным акциям как "новости о движениях"
+        """
+        symbols = (symbols or DEFAULT_SYMBOLS)[:size]
+        print(f"🔍 TWELVE DATA: Запрос цен {len(symbols)} акций как 'новости'")
 
-                        # Создаем "новость" из данных о цене
-                        news_item = {
-                            'title': f"{symbol} Current Price Update",
-                            'description': f"Current price: ${result['price']}. Last updated price data for {symbol}.",
-                            'symbol': symbol,
-                            'price': result['price'],
-                            'datetime': result.get('datetime', 'N/A'),
-                            'source': 'twelve_data_price'
-                        }
-                        news_items.append(news_item)
+        prices = self.get_prices(symbols)
 
-            except Exception as e:
-                print(f"💥 TWELVE DATA {symbol} ошибка: {e}")
+        news_items = []
+        for symbol in symbols:
+            quote = prices.get(symbol)
+            if not quote:
                 continue
+            # Создаем "новость" из данных о цене
+            news_items.append({
+                'title': f"{symbol} Current Price Update",
+                'description': f"Current price: ${quote['price']}. Last updated price data for {symbol}.",
+                'symbol': symbol,
+                'price': quote['price'],
+                'datetime': quote.get('datetime', 'N/A'),
+                'source': 'twelve_data_price'
+            })
 
         if news_items:
             print(f"✅ TWELVE DATA Успех: {len(news_items)} ценовых 'новостей'")
@@ -120,3 +120,72 @@ SEARCH_CONFIG = {
         "size": 10
     }
 }
+
+# ============= НАСТРОЙКИ ЦИКЛА ОПРОСА =============
+FETCH_SETTINGS = {
+    "max_workers": None,     # потоков для параллельного опроса (None = по числу клиентов)
+    "bucket_capacity": 1,    # сколько запросов подряд допускает token bucket провайдера
+    "cursor_file": "fetch_cursors.json",  # high-water mark каждого провайдера
+    "cycle_deadline": 12,    # сек на цикл опроса, опоздавшие ответы отбрасываются
+    "page_workers": 6,       # потоков для параллельной загрузки дополнительных страниц
+    "stream_json": True      # разбирать ответы потоком (ijson) вместо загрузки целиком
+}
+
+# ============= HTTP ТРАНСПОРТ =============
+HTTP_SETTINGS = {
+    "pool_connections": 10,  # хостов в пуле keep-alive соединений
+    "pool_maxsize": 10,      # соединений на один хост
+    "max_retries": 0
+}
+
+# ============= ЖУРНАЛ СЫРЫХ ОТВЕТОВ =============
+SNAPSHOT_SETTINGS = {
+    "dir": "snapshots",                   # snapshots/<api>/<offset>.ndjson.gz
+    "segment_max_bytes": 8 * 1024 * 1024,  # ротация сегмента по размеру
+    "compression": "gzip",                # "gzip" или "zstd" (нужен пакет zstandard)
+    "fsync": False,
+    "write_latest": True                  # news_{api}_latest.json для нормализатора
+}
+
+# ============= ИНДЕКС ВИДЕННЫХ URL =============
+SEEN_INDEX_SETTINGS = {
+    "enabled": True,
+    "path": "seen_urls.sqlite3",  # точный индекс (SQLite) рядом с парсером
+    "ttl_hours": 72,              # через сколько URL снова считается новым
+    "capacity": 200000,           # расчетный размер Bloom-фильтра
+    "error_rate": 0.001
+}
+
+# ============= CIRCUIT BREAKER =============
+BREAKER_SETTINGS = {
+    "failure_threshold": 3,  # ошибок подряд до отключения провайдера
+    "base_cooldown": 30,     # сек до первой пробы
+    "max_cooldown": 900      # потолок экспоненциального cooldown
+}
+
+# ============= МЕТРИКИ ЗАГРУЗЧИКА =============
+METRICS_SETTINGS = {
+    "file": "fetcher_metrics.prom",  # текстовый формат Prometheus, обновляется после каждого запроса
+    "port": None                     # порт HTTP-эндпоинта /metrics (None — не поднимать)
+}
+
+# ============= ПОСТРАНИЧНАЯ ЗАГРУЗКА =============
+# Останавливается раньше, если страница неполная, нет курсора или достигнут high-water mark
+PAGINATION_SETTINGS = {
+    "newsapi": {"max_pages": 2, "concurrency": 2},  # бесплатный план отдает максимум 100 статей
+    "polygon": {"max_pages": 4},                    # next_url
+    "newsdata": {"max_pages": 3}                    # nextPage
+}
+
+# ============= ПЛАНИРОВЩИК ТЕМАТИЧЕСКИХ ЗАПРОСОВ =============
+# Провайдеры из queries_per_cycle вместо одного SEARCH_CONFIG-запроса получают по запросу
+# на тему из FINANCIAL_KEYWORDS; темы выбираются по недавнему выходу новых статей.
+# Каждый запрос (и каждая его дополнительная страница по PAGINATION_SETTINGS) списывается
+# из квоты провайдера (RATE_LIMITS).
+QUERY_PLANNER_SETTINGS = {
+    "enabled": True,
+    "state_file": "query_planner.json",
+    "queries_per_cycle": {"newsapi": 3, "newsdata": 2, "marketaux": 1},  # потолок; меньше, если суточная квота на исходе
+    "smoothing": 0.3,      # вес последнего цикла в EWMA выхода темы
+    "exploration": 1.0     # бонус темам, которые давно не спрашивали
+}
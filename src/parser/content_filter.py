@@ -0,0 +1,165 @@
+"""Фильтр контента, один раз скомпилированный из CONTENT_FILTERS / FILTER_SETTINGS"""
+import heapq
+import re
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+from urllib.parse import urlsplit
+
+from cursors import article_mark, article_timestamp
+
+# newsdata отдает язык словом, остальные — кодом
+LANGUAGE_ALIASES = {
+    "english": "en",
+    "russian": "ru",
+}
+
+
+def compile_keywords(keywords: Iterable[str]) -> Optional[Pattern]:
+    """Одна регулярка на весь список: совпадение по целым словам, без учета регистра"""
+    words = sorted({kw.strip().lower() for kw in keywords if kw and kw.strip()}, key=len, reverse=True)
+    if not words:
+        return None
+    return re.compile(r"\b(?:" + "|".join(re.escape(w) for w in words) + r")\b", re.IGNORECASE)
+
+
+def article_host(article: Dict) -> str:
+    url = article.get("url") or article.get("article_url") or article.get("link") or ""
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def article_source_name(article: Dict) -> str:
+    source = article.get("source") or article.get("publisher") or article.get("source_id") or ""
+    if isinstance(source, dict):
+        source = source.get("name") or source.get("id") or ""
+    return str(source).lower()
+
+
+class ContentFilter:
+    """Все правила фильтрации за один проход по статье.
+
+    priority_score: каждое приоритетное слово в заголовке дает 0.7, в описании — 0.35
+    (максимум 1.0); статья с score >= min_priority_score помечается как приоритетная.
+    При sort_by_priority держим только max_results лучших статей в куче, поэтому
+    поток статей не нужно материализовать целиком.
+    """
+
+    def __init__(self, filters: Dict, settings: Dict):
+        self.settings = settings
+        self.enabled = settings.get("apply_filters", True)
+        self.exclude_re = compile_keywords(filters.get("exclude_keywords", []))
+        self.priority_re = compile_keywords(filters.get("priority_keywords", []))
+
+        self.min_title_len = filters.get("min_title_length", 15)
+        self.max_title_len = filters.get("max_title_length", 0) or None
+        self.min_desc_len = filters.get("min_description_length", 20)
+        self.allowed_languages = {lang.lower() for lang in filters.get("allowed_languages", [])}
+
+        # "promo.com" — домен (совпадение с хостом или его поддоменом), "casino" — слово
+        sources = [s.lower() for s in filters.get("exclude_sources", [])]
+        self.exclude_domains = {s for s in sources if "." in s}
+        self.exclude_source_re = compile_keywords(s for s in sources if "." not in s)
+
+        self.mark_priority = settings.get("mark_priority", True)
+        self.remove_duplicates = settings.get("remove_duplicates", True)
+        self.sort_by_priority = settings.get("sort_by_priority", True)
+        self.min_priority_score = settings.get("min_priority_score", 0.7)
+        self.max_results = settings.get("max_results") or None
+        self.time_window = timedelta(hours=settings["time_window_hours"]) if settings.get("time_window_hours") else None
+
+    def apply(self, articles: Iterable[Dict], dropped: Optional[List[Tuple]] = None) -> List[Dict]:
+        """Статьи, прошедшие фильтры, не больше max_results.
+
+        В dropped (если передан) попадают отметки (article_mark) статей, которые прошли
+        фильтры, но не влезли в max_results: курсор нельзя сдвигать дальше них.
+        """
+        if not self.enabled:
+            kept = []
+            for art in articles:
+                if self.max_results and len(kept) >= self.max_results:
+                    if dropped is None:
+                        break
+                    dropped.append(article_mark(art))
+                else:
+                    kept.append(art)
+            return kept
+
+        cutoff = datetime.now(timezone.utc) - self.time_window if self.time_window else None
+        seen = set()
+        order = count()
+        heap = []
+        kept = []
+
+        for art in articles:
+            score = self._score(art, cutoff, seen)
+            if score is None:
+                continue
+            if self.mark_priority:
+                art["priority_score"] = score
+                art["is_priority"] = score >= self.min_priority_score
+
+            if not self.sort_by_priority:
+                if self.max_results and len(kept) >= self.max_results:
+                    if dropped is None:
+                        break
+                    dropped.append(article_mark(art))
+                else:
+                    kept.append(art)
+                continue
+
+            # Ключ кучи: больший score лучше, при равенстве — кто пришел раньше
+            entry = (score, -next(order), art)
+            if self.max_results and len(heap) >= self.max_results:
+                evicted = heapq.heappushpop(heap, entry)
+                if dropped is not None:
+                    dropped.append(article_mark(evicted[2]))
+            else:
+                heapq.heappush(heap, entry)
+
+        if not self.sort_by_priority:
+            return kept
+        return [art for _, _, art in sorted(heap, reverse=True)]
+
+    def _score(self, art: Dict, cutoff: Optional[datetime], seen: set) -> Optional[float]:
+        """priority_score статьи или None, если статья не проходит фильтры"""
+        title = art.get("title") or art.get("headline") or ""
+        desc = art.get("description") or art.get("summary") or ""
+
+        if len(title) < self.min_title_len:
+            return None
+        if self.max_title_len and len(title) > self.max_title_len:
+            return None
+        if desc and len(desc) < self.min_desc_len:
+            return None
+        if self.exclude_re and self.exclude_re.search(title):
+            return None
+
+        if self.allowed_languages:
+            language = str(art.get("language") or "").lower()
+            if language and LANGUAGE_ALIASES.get(language, language) not in self.allowed_languages:
+                return None
+
+        if self.exclude_domains or self.exclude_source_re:
+            host = article_host(art)
+            if host and any(host == d or host.endswith("." + d) for d in self.exclude_domains):
+                return None
+            if self.exclude_source_re and self.exclude_source_re.search(f"{host} {article_source_name(art)}"):
+                return None
+
+        if cutoff:
+            published = article_timestamp(art)
+            if published and published < cutoff:
+                return None
+
+        if self.remove_duplicates:
+            key = (art.get("url") or art.get("article_url") or art.get("link") or title).strip().lower()
+            if key in seen:
+                return None
+            seen.add(key)
+
+        if not self.priority_re:
+            return 0.0
+        title_hits = len(set(m.group(0).lower() for m in self.priority_re.finditer(title)))
+        desc_hits = len(set(m.group(0).lower() for m in self.priority_re.finditer(desc)))
+        return min(1.0, 0.7 * title_hits + 0.35 * desc_hits)
@@ -0,0 +1,180 @@
+"""High-water mark по каждому провайдеру для инкрементального опроса"""
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Поля с датой публикации в ответах разных API
+TIMESTAMP_FIELDS = ("publishedAt", "published_utc", "published_at", "pubDate", "datetime")
+
+# У finnhub id растет монотонно — по нему курсор точнее, чем по времени
+ID_CURSOR_APIS = {"finnhub"}
+
+CURSOR_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Разбирает дату из любого формата провайдеров в aware-datetime (UTC)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.fromtimestamp(value, tz=timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    if not isinstance(value, str):
+        return None
+
+    text = value.strip().replace(" ", "T", 1)
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    # fromisoformat в 3.10 не понимает больше 6 знаков дробной части
+    if "." in text:
+        head, _, tail = text.partition(".")
+        digits = len(tail) - len(tail.lstrip("0123456789"))
+        text = head + "." + tail[:min(digits, 6)] + tail[digits:]
+    try:
+        dt = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def article_timestamp(article: Dict) -> Optional[datetime]:
+    for field in TIMESTAMP_FIELDS:
+        if field in article:
+            ts = parse_timestamp(article.get(field))
+            if ts:
+                return ts
+    return None
+
+
+def article_key(article: Dict) -> str:
+    return str(article.get("url") or article.get("article_url") or article.get("link")
+               or article.get("id") or article.get("title") or "")
+
+
+def article_mark(article: Dict) -> Tuple:
+    """Легкая отметка статьи для advance_marks: (timestamp без микросекунд, ключ, id)"""
+    ts = article_timestamp(article)
+    return ts.replace(microsecond=0) if ts else None, article_key(article), article.get("id")
+
+
+def cap_marks(marks: List[Tuple], dropped: List[Tuple]) -> List[Tuple]:
+    """Отметки, по которым курсор можно сдвинуть, не перескочив отброшенные статьи.
+
+    dropped — отметки статей, которые прошли фильтры, но не вошли в результат (max_results):
+    курсор останавливается на самой старой из них, чтобы в следующем цикле они пришли снова.
+    """
+    if not dropped:
+        return marks
+    keys = {key for _, key, _ in dropped}
+    oldest = min((ts for ts, _, _ in dropped if ts), default=None)
+    lowest_id = min((art_id for _, _, art_id in dropped if isinstance(art_id, int)), default=None)
+    return [
+        (ts, key, art_id) for ts, key, art_id in marks
+        if key not in keys
+        and (oldest is None or ts is None or ts <= oldest)
+        and (lowest_id is None or not isinstance(art_id, int) or art_id < lowest_id)
+    ]
+
+
+class CursorStore:
+    """Хранит high-water mark каждого провайдера в JSON-файле.
+
+    Для временных курсоров запоминаются ключи статей ровно на границе: API отдают
+    границу включительно, и без этого статьи с той же секундой приходили бы повторно.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.cursors: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.cursors = json.load(f)
+            except Exception as e:
+                print(f"⚠️ Cursor file {path} unreadable, starting fresh: {e}")
+
+    def get(self, api_name: str) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self.cursors.get(api_name, {}))
+
+    def filter_new(self, api_name: str, articles: Iterable[Dict]) -> List[Dict]:
+        """Оставляет только статьи новее курсора"""
+        return list(self.iter_new(api_name, articles))
+
+    def iter_new(self, api_name: str, articles: Iterable[Dict], marks: List[Tuple] = None) -> Iterator[Dict]:
+        """Ленивый filter_new для потока статей.
+
+        В marks (если передан) складываются легкие отметки свежих статей для advance_marks,
+        чтобы курсор можно было сдвинуть, не держа сами статьи в памяти.
+        """
+        cursor = self.get(api_name)
+        last_id = cursor.get("id")
+        published = parse_timestamp(cursor.get("published"))
+        boundary = set(cursor.get("boundary", []))
+
+        for art in articles:
+            ts = article_mark(art)[0]
+            if cursor:
+                if api_name in ID_CURSOR_APIS:
+                    if isinstance(art.get("id"), int) and last_id is not None and art["id"] <= last_id:
+                        continue
+                elif ts is not None and published is not None:
+                    if ts < published or (ts == published and article_key(art) in boundary):
+                        continue
+            if marks is not None:
+                marks.append(article_mark(art))
+            yield art
+
+    def advance(self, api_name: str, articles: List[Dict]):
+        """Сдвигает курсор на самую свежую из полученных статей и сохраняет файл"""
+        self.advance_marks(api_name, [article_mark(art) for art in articles])
+
+    def advance_marks(self, api_name: str, marks: List[Tuple]):
+        """advance по отметкам (timestamp без микросекунд, ключ, id) из iter_new"""
+        if not marks:
+            return
+        with self.lock:
+            cursor = dict(self.cursors.get(api_name, {}))
+
+            if api_name in ID_CURSOR_APIS:
+                ids = [art_id for _, _, art_id in marks if isinstance(art_id, int)]
+                if ids:
+                    cursor["id"] = max(ids + [cursor.get("id", 0)])
+
+            stamped = [(ts, key) for ts, key, _ in marks if ts]
+            if stamped:
+                newest = max(ts for ts, _ in stamped)
+                previous = parse_timestamp(cursor.get("published"))
+                if previous is None or newest > previous:
+                    cursor["published"] = newest.strftime(CURSOR_TIME_FORMAT)
+                    cursor["boundary"] = []
+                if newest == parse_timestamp(cursor.get("published")):
+                    edge = {key for ts, key in stamped if ts == newest}
+                    cursor["boundary"] = sorted(edge | set(cursor.get("boundary", [])))
+
+            self.cursors[api_name] = cursor
+            self._save()
+
+    def reset(self, api_name: str = None):
+        with self.lock:
+            if api_name:
+                self.cursors.pop(api_name, None)
+            else:
+                self.cursors.clear()
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.cursors, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️ Cursor save error: {e}")
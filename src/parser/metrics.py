@@ -0,0 +1,147 @@
+"""Метрики загрузчика: латентность, объем ответов и "выход" свежих статей по провайдерам
+
+Доступны как Python API (snapshot()), как текст в формате Prometheus (render_prometheus())
+и как файл/HTTP-эндпоинт с этим текстом.
+"""
+import bisect
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COUNTERS = {
+    "requests_total": "HTTP-ответы API провайдера (каждая страница и тема — отдельный запрос)",
+    "pages_total": "Страниц получено при постраничной загрузке",
+    "errors_total": "Запросы, завершившиеся ошибкой",
+    "skipped_total": "Циклы, пропущенные из-за открытого circuit breaker'а или дедлайна",
+    "bytes_received_total": "Байт получено от провайдера (по проводу)",
+    "articles_returned_total": "Статей вернул API",
+    "articles_fresh_total": "Статей новее high-water mark",
+    "articles_filtered_total": "Статей осталось после фильтров контента",
+    "articles_new_total": "Новых статей (не виденных раньше)",
+    "articles_duplicate_total": "Статей отброшено индексом виденных URL",
+}
+
+
+class ProviderStats:
+    def __init__(self):
+        self.counters = {name: 0 for name in COUNTERS}
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+
+
+class FetcherMetrics:
+    """Потокобезопасный сборщик метрик по провайдерам"""
+
+    def __init__(self, providers: Iterable[str] = ()):
+        self.lock = threading.Lock()
+        self.providers: Dict[str, ProviderStats] = {p: ProviderStats() for p in providers}
+        self._server = None
+
+    def _stats(self, api_name: str) -> ProviderStats:
+        if api_name not in self.providers:
+            self.providers[api_name] = ProviderStats()
+        return self.providers[api_name]
+
+    def inc(self, api_name: str, counter: str, value: float = 1):
+        with self.lock:
+            self._stats(api_name).counters[counter] += value
+
+    def observe_request(self, api_name: str, seconds: float, ok: bool = True):
+        """Время получения ответа провайдера за цикл; сами HTTP-запросы считает requests_total"""
+        with self.lock:
+            stats = self._stats(api_name)
+            if not ok:
+                stats.counters["errors_total"] += 1
+            stats.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            stats.latency_sum += seconds
+            stats.latency_count += 1
+
+    def observe_articles(self, api_name: str, returned: int, fresh: int, filtered: int, new: int, duplicates: int):
+        with self.lock:
+            counters = self._stats(api_name).counters
+            counters["articles_returned_total"] += returned
+            counters["articles_fresh_total"] += fresh
+            counters["articles_filtered_total"] += filtered
+            counters["articles_new_total"] += new
+            counters["articles_duplicate_total"] += duplicates
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Текущие значения по каждому провайдеру.
+
+        new_per_second — новых статей на секунду суммарного времени ожидания API:
+        по нему видно, какой провайдер выгоднее опрашивать чаще.
+        """
+        with self.lock:
+            result = {}
+            for api_name, stats in self.providers.items():
+                data = dict(stats.counters)
+                data["latency_seconds_sum"] = round(stats.latency_sum, 4)
+                data["latency_seconds_avg"] = round(stats.latency_sum / stats.latency_count, 4) if stats.latency_count else 0.0
+                data["latency_histogram"] = {
+                    **{str(b): c for b, c in zip(LATENCY_BUCKETS, stats.bucket_counts)},
+                    "+Inf": stats.bucket_counts[-1],
+                }
+                data["new_per_second"] = round(stats.counters["articles_new_total"] / stats.latency_sum, 3) if stats.latency_sum else 0.0
+                result[api_name] = data
+            return result
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self.lock:
+            items = sorted(self.providers.items())
+            for name, help_text in COUNTERS.items():
+                metric = f"radar_fetch_{name}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for api_name, stats in items:
+                    lines.append(f'{metric}{{provider="{api_name}"}} {stats.counters[name]}')
+
+            metric = "radar_fetch_latency_seconds"
+            lines.append(f"# HELP {metric} Время получения ответа провайдера за цикл (все страницы и темы)")
+            lines.append(f"# TYPE {metric} histogram")
+            for api_name, stats in items:
+                cumulative = 0
+                for bound, bucket in zip(LATENCY_BUCKETS + ("+Inf",), stats.bucket_counts):
+                    cumulative += bucket
+                    lines.append(f'{metric}_bucket{{provider="{api_name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{provider="{api_name}"}} {stats.latency_sum:.6f}')
+                lines.append(f'{metric}_count{{provider="{api_name}"}} {stats.latency_count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Атомарно пишет метрики в файл (например, для node_exporter textfile collector)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """Поднимает /metrics в фоновом потоке"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+        print(f"📈 Metrics on http://{host}:{self._server.server_address[1]}/metrics")
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""Локальный stand-in для API провайдеров: отдает записанные news_*_latest.json
+
+Каждый провайдер живет под своим префиксом: http://127.0.0.1:<port>/<provider>/...,
+путь после префикса игнорируется. Для каждого можно задать задержку, долю ошибок
+и размер ответа. По умолчанию id/url/даты статей переписываются на каждый запрос,
+чтобы курсоры и индекс виденных URL пропускали их как новые.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from typing import Any, Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+PROVIDERS = ["newsapi", "polygon", "finnhub", "marketaux", "newsdata", "twelve_data"]
+
+# Путь, который клиент дописывает к base_url, и суффикс base_url для мока
+CLIENT_PATHS = {
+    "newsapi": "/v2",
+    "polygon": "",
+    "finnhub": "/api/v1",
+    "marketaux": "/v1",
+    "newsdata": "/api/1",
+    "twelve_data": "",
+}
+
+DEFAULT_PROVIDER_SETTINGS = {
+    "latency": 0.05,            # средняя задержка ответа, сек
+    "jitter": 0.02,             # +- к задержке
+    "error_rate": 0.0,          # доля ответов 503
+    "payload_multiplier": 1,    # во сколько раз размножить статьи из образца
+    "fresh": True,              # переписывать id/url/даты, чтобы статьи были "новыми"
+    "pages": 1,                 # сколько страниц отдавать (newsapi page, polygon next_url, newsdata nextPage)
+}
+
+
+def load_samples(samples_dir: str) -> Dict[str, List[Dict]]:
+    samples = {}
+    for provider in PROVIDERS:
+        path = os.path.join(samples_dir, f"news_{provider}_latest.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                samples[provider] = json.load(f).get("raw_data", {}).get("articles", [])
+        except (OSError, ValueError):
+            samples[provider] = []
+    return samples
+
+
+class MockProviderServer:
+    """ThreadingHTTPServer в фоновом потоке; использовать как контекстный менеджер"""
+
+    def __init__(self, samples_dir: str = None, settings: Dict[str, Dict[str, Any]] = None,
+                 host: str = "127.0.0.1", port: int = 0, seed: int = None):
+        self.samples = load_samples(samples_dir or os.path.dirname(os.path.abspath(__file__)))
+        self.settings = {p: dict(DEFAULT_PROVIDER_SETTINGS) for p in PROVIDERS}
+        for provider, overrides in (settings or {}).items():
+            self.settings[provider].update(overrides)
+        self.random = random.Random(seed)
+        self.sequence = count(1)
+        self.lock = threading.Lock()
+        self.stats = {p: {"requests": 0, "errors": 0, "bytes": 0} for p in PROVIDERS}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def base_url(self, provider: str) -> str:
+        return f"{self.url}/{provider}{CLIENT_PATHS[provider]}"
+
+    def point_clients(self, clients: Dict[str, Any]):
+        """Перенаправляет клиентов SurgicalNewsFetcher на мок"""
+        for provider, client in clients.items():
+            client.base_url = self.base_url(provider)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-providers", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- обработка запросов ----------
+
+    def _handle(self, request: BaseHTTPRequestHandler):
+        parts = urlsplit(request.path)
+        provider = parts.path.strip("/").split("/")[0]
+        if provider not in self.settings:
+            self._send(request, provider, 404, {"error": "unknown provider"})
+            return
+
+        cfg = self.settings[provider]
+        delay = max(0.0, cfg["latency"] + self.random.uniform(-cfg["jitter"], cfg["jitter"]))
+        time.sleep(delay)
+
+        if self.random.random() < cfg["error_rate"]:
+            self._send(request, provider, 503, {"status": "error", "message": "mock outage"})
+            return
+
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self._send(request, provider, 200, self._payload(provider, query))
+
+    def _send(self, request: BaseHTTPRequestHandler, provider: str, status: int, body: Any):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        with self.lock:
+            stats = self.stats.setdefault(provider, {"requests": 0, "errors": 0, "bytes": 0})
+            stats["requests"] += 1
+            stats["errors"] += status != 200
+            stats["bytes"] += len(data)
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    def _articles(self, provider: str) -> List[Dict]:
+        cfg = self.settings[provider]
+        sample = self.samples.get(provider) or []
+        articles = [dict(a) for a in sample] * max(1, int(cfg["payload_multiplier"]))
+        if not cfg["fresh"]:
+            return articles
+
+        now = datetime.now(timezone.utc)
+        for art in articles:
+            n = next(self.sequence)
+            for field in ("url", "article_url", "link"):
+                if art.get(field):
+                    art[field] = f"{art[field]}?mock={n}"
+            if "id" in art:
+                art["id"] = n if isinstance(art["id"], int) else f"mock-{n}"
+            if "article_id" in art:
+                art["article_id"] = f"mock-{n}"
+            if "datetime" in art:
+                art["datetime"] = int(now.timestamp())
+            for field in ("publishedAt", "published_utc"):
+                if field in art:
+                    art[field] = now.strftime("%Y-%m-%dT%H:%M:%SZ")
+            if "pubDate" in art:
+                art["pubDate"] = now.strftime("%Y-%m-%d %H:%M:%S")
+        return articles
+
+    def _payload(self, provider: str, query: Dict[str, str]) -> Any:
+        if provider == "twelve_data":
+            symbols = [s for s in query.get("symbol", "AAPL").split(",") if s]
+            quotes = {s: {"price": f"{self.random.uniform(10, 500):.5f}"} for s in symbols}
+            return quotes[symbols[0]] if len(symbols) == 1 else quotes
+
+        pages = max(1, int(self.settings[provider]["pages"]))
+        if provider == "newsapi":
+            page = int(query.get("page", 1))
+            articles = self._articles(provider) if page <= pages else []
+            return {"status": "ok", "totalResults": len(articles) * pages, "articles": articles}
+
+        articles = self._articles(provider)
+        page = int(query.get("cursor") or query.get("page") or 1)
+        has_next = page < pages
+        if provider == "polygon":
+            payload = {"status": "OK", "count": len(articles), "results": articles}
+            if has_next:
+                payload["next_url"] = f"{self.base_url(provider)}/v2/reference/news?cursor={page + 1}"
+            return payload
+        if provider == "finnhub":
+            return articles
+        if provider == "marketaux":
+            # В образце уже приведенный клиентом формат — возвращаем "сырой" вид API
+            return {"data": [{
+                "title": a.get("title"),
+                "description": a.get("description"),
+                "url": a.get("url"),
+                "published_at": a.get("publishedAt"),
+                "source": (a.get("source") or {}).get("name", ""),
+                "snippet": a.get("content"),
+            } for a in articles]}
+        if provider == "newsdata":
+            return {"status": "success", "totalResults": len(articles) * pages, "results": articles,
+                    "nextPage": str(page + 1) if has_next else None}
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock news providers server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=DEFAULT_PROVIDER_SETTINGS["latency"])
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--payload-multiplier", type=int, default=1)
+    args = parser.parse_args()
+
+    overrides = {"latency": args.latency, "error_rate": args.error_rate,
+                 "payload_multiplier": args.payload_multiplier}
+    server = MockProviderServer(settings={p: overrides for p in PROVIDERS}, port=args.port)
+    print(f"🧪 Mock providers on {server.url}")
+    for provider in PROVIDERS:
+        print(f"  - {provider}: {server.base_url(provider)}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped.")
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
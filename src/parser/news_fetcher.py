@@ -1,30 +1,94 @@
 #!/usr/bin/env python3
-import time
 import json
 import os
+import time
+import asyncio
 import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 
 from clients.newsapi_client import NewsApiClient
 from clients.polygon_client import PolygonClient
 from clients.finnhub_client import FinnHubClient
 from clients.marketaux_client import MarketAuxClient
 from clients.newsdata_client import NewsDataClient
+from clients.http_session import create_session
 
-from config import API_KEYS, RATE_LIMITS, CONTENT_FILTERS, FILTER_SETTINGS, SEARCH_CONFIG
+from config import API_KEYS, RATE_LIMITS, CONTENT_FILTERS, FILTER_SETTINGS, SEARCH_CONFIG, FETCH_SETTINGS, HTTP_SETTINGS, \
+    SNAPSHOT_SETTINGS, SEEN_INDEX_SETTINGS, BREAKER_SETTINGS, METRICS_SETTINGS, PAGINATION_SETTINGS, \
+    FINANCIAL_KEYWORDS, QUERY_PLANNER_SETTINGS
+from rate_limiter import ProviderScheduler
+from cursors import CursorStore, article_key, cap_marks
+from snapshot_log import SnapshotStore
+from content_filter import ContentFilter
+from seen_index import SeenUrlIndex
+from circuit_breaker import CircuitBreaker
+from metrics import FetcherMetrics
+from pagination import numbered_pages, cursor_pages
+from query_planner import QueryPlanner
 
 
 class SurgicalNewsFetcher:
-    def __init__(self):
+    def __init__(self, data_dir: str = None):
+        """data_dir — куда писать результаты и состояние (курсоры, журнал, индекс URL);
+        по умолчанию каталог парсера"""
         print("🚀 News Fetcher starting...")
         self.clients = {}
         self.request_counts = {api: 0 for api in ["newsapi", "polygon", "finnhub", "marketaux", "newsdata"]}
         self.last_requests = {api: datetime.min for api in self.request_counts}
         self.fixed_filenames = {api: f"news_{api}_latest.json" for api in self.request_counts}
 
-        self.parser_dir = os.path.dirname(__file__)
+        self.parser_dir = data_dir or os.path.dirname(os.path.abspath(__file__))
+        self.session = create_session(**HTTP_SETTINGS)
+        self.content_filter = ContentFilter(CONTENT_FILTERS, FILTER_SETTINGS)
+        self.seen_index = None
+        if SEEN_INDEX_SETTINGS["enabled"]:
+            self.seen_index = SeenUrlIndex(
+                os.path.join(self.parser_dir, SEEN_INDEX_SETTINGS["path"]),
+                ttl_hours=SEEN_INDEX_SETTINGS["ttl_hours"],
+                capacity=SEEN_INDEX_SETTINGS["capacity"],
+                error_rate=SEEN_INDEX_SETTINGS["error_rate"],
+            )
+        self.cursors = CursorStore(os.path.join(self.parser_dir, FETCH_SETTINGS["cursor_file"]))
+        self.snapshots = SnapshotStore(
+            os.path.join(self.parser_dir, SNAPSHOT_SETTINGS["dir"]),
+            segment_max_bytes=SNAPSHOT_SETTINGS["segment_max_bytes"],
+            compression=SNAPSHOT_SETTINGS["compression"],
+            fsync=SNAPSHOT_SETTINGS["fsync"],
+        )
         self._init_clients()
+        self.planner = None
+        if QUERY_PLANNER_SETTINGS["enabled"]:
+            self.planner = QueryPlanner(
+                FINANCIAL_KEYWORDS, RATE_LIMITS,
+                queries_per_cycle={api: n for api, n in QUERY_PLANNER_SETTINGS["queries_per_cycle"].items()
+                                   if api in self.clients},
+                state_path=os.path.join(self.parser_dir, QUERY_PLANNER_SETTINGS["state_file"]),
+                smoothing=QUERY_PLANNER_SETTINGS["smoothing"],
+                exploration=QUERY_PLANNER_SETTINGS["exploration"],
+            )
+        # Темы, запрошенные в текущем цикле провайдера, и темы, по которым нашлась каждая статья
+        # (ключ — article_key); провайдер не опрашивается параллельно сам с собой
+        self._active_topics: Dict[str, Tuple[List[str], Dict[Any, List[str]]]] = {}
+        # Клиенты синхронные (requests), поэтому параллелим их через пул потоков
+        self.executor = ThreadPoolExecutor(
+            max_workers=FETCH_SETTINGS.get("max_workers") or max(len(self.clients), 1),
+            thread_name_prefix="fetch",
+        )
+        # Отдельный пул для дополнительных страниц, чтобы они не ждали в очереди за провайдерами
+        self.page_executor = ThreadPoolExecutor(
+            max_workers=FETCH_SETTINGS.get("page_workers", 6), thread_name_prefix="page"
+        )
+        self.breakers = {api: CircuitBreaker(**BREAKER_SETTINGS) for api in self.clients}
+        self.metrics = FetcherMetrics(self.clients)
+        self.session.hooks["response"].append(self._record_response)
+        if METRICS_SETTINGS.get("port"):
+            self.metrics.serve(METRICS_SETTINGS["port"])
+        self.scheduler = ProviderScheduler(
+            RATE_LIMITS, list(self.clients), capacity=FETCH_SETTINGS.get("bucket_capacity", 1)
+        )
         print(f"✅ Clients ready: {len(self.clients)}")
 
     def _init_clients(self):
@@ -40,100 +104,486 @@ class SurgicalNewsFetcher:
             try:
                 key = API_KEYS.get(api_name, "")
                 if key and not key.startswith("YOUR_"):
-                    self.clients[api_name] = ClientClass(key)
+                    self.clients[api_name] = ClientClass(key, session=self.session)
                     print(f"  - {api_name.upper()} client initialized")
             except Exception as e:
                 print(f"⚠️ {api_name.upper()} init failed: {e}")
 
     def can_make_request(self, api_name: str) -> bool:
-        now = datetime.now()
-        last = self.last_requests[api_name]
-        return (now - last).total_seconds() >= RATE_LIMITS.get(api_name, 60)
+        return self.scheduler.buckets[api_name].available() >= 1
 
-    def apply_content_filters(self, articles: List[Dict], api_name: str) -> List[Dict]:
-        """Базовые фильтры контента"""
-        if not articles:
-            return []
+    def breaker_states(self) -> Dict[str, Dict[str, Any]]:
+        """Состояние circuit breaker'а и число срабатываний по каждому провайдеру"""
+        return {api: breaker.snapshot() for api, breaker in self.breakers.items()}
 
-        exclude_keywords = [kw.lower() for kw in CONTENT_FILTERS.get("exclude_keywords", [])]
-        min_title_len = CONTENT_FILTERS.get("min_title_length", 15)
-        min_desc_len = CONTENT_FILTERS.get("min_description_length", 20)
+    def topic_yields(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Выход новых статей по темам запросов для каждого провайдера"""
+        return self.planner.snapshot() if self.planner else {}
 
-        filtered = []
-        for art in articles:
-            title = art.get("title") or art.get("headline") or ""
-            desc = art.get("description") or art.get("summary") or ""
+    def quota_left(self) -> Dict[str, Dict[str, float]]:
+        """Остаток токенов в bucket'е каждого провайдера"""
+        return self.scheduler.quota()
 
-            if len(title) < min_title_len or any(kw in title.lower() for kw in exclude_keywords):
-                continue
-            if desc and len(desc) < min_desc_len:
+    def apply_content_filters(self, articles: Iterable[Dict], api_name: str,
+                              dropped: Optional[List[Tuple]] = None) -> List[Dict]:
+        """Фильтры контента и приоритизация (см. ContentFilter); принимает и поток статей"""
+        return self.content_filter.apply(articles, dropped)
+
+    async def _request_articles(self, api_name: str) -> List[Dict]:
+        """Запрос к API провайдера с учетом его high-water mark.
+
+        Корутина на цикле событий движка: пагинация и запросы по темам идут здесь же,
+        а сами синхронные HTTP-запросы — в пулах потоков.
+        """
+        cursor = self.cursors.get(api_name)
+        since = cursor.get("published")
+
+        if self.planner and api_name in self.planner.providers():
+            return await self._request_planned(api_name, since)
+
+        if PAGINATION_SETTINGS.get(api_name, {}).get("max_pages", 1) > 1:
+            return await self._collect_pages(api_name, since)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._request_latest, api_name, cursor)
+
+    def _request_latest(self, api_name: str, cursor: Dict[str, Any]) -> List[Dict]:
+        """Один запрос свежих статей провайдера (без пагинации и тем)"""
+        since = cursor.get("published")
+        # При stream_json клиенты отдают итератор статей, разбираемых по мере чтения ответа
+        stream = FETCH_SETTINGS.get("stream_json", False)
+        if api_name == "newsapi":
+            config = SEARCH_CONFIG["newsapi"]
+            data = self.clients[api_name].get_everything(
+                q=config["query"], language=config["language"], page_size=config["page_size"],
+                from_param=since, stream=stream
+            )
+            articles = data if stream else data.get("articles", [])
+        elif api_name == "polygon":
+            data = self.clients[api_name].get_market_news(
+                limit=SEARCH_CONFIG["polygon"]["limit"], published_utc_gt=f"{since}Z" if since else None,
+                stream=stream
+            )
+            articles = data if stream else data.get("results", [])
+        elif api_name == "finnhub":
+            articles = self.clients[api_name].general_news(SEARCH_CONFIG["finnhub"]["category"],
+                                                           min_id=cursor.get("id"), stream=stream)
+        elif api_name == "marketaux":
+            articles = self.clients[api_name].get_latest_news(limit=SEARCH_CONFIG["marketaux"]["limit"],
+                                                              published_after=since, stream=stream)
+        elif api_name == "newsdata":
+            data = self.clients[api_name].latest_news(size=SEARCH_CONFIG["newsdata"]["size"], stream=stream)
+            articles = data if stream else data.get("results", [])
+        else:
+            articles = []
+        return articles
+
+    def _request_query(self, api_name: str, query: str, since: str) -> List[Dict]:
+        """Один тематический запрос к провайдеру.
+
+        Ответ разбирается целиком здесь, в потоке пула: статьи тем потом сливаются
+        на цикле событий, где читать сокет нельзя.
+        """
+        client = self.clients[api_name]
+        if api_name == "newsapi":
+            config = SEARCH_CONFIG["newsapi"]
+            data = client.get_everything(q=query, language=config["language"], page_size=config["page_size"],
+                                         from_param=since)
+            return data.get("articles", [])
+        if api_name == "newsdata":
+            data = client.latest_news(size=SEARCH_CONFIG["newsdata"]["size"], q=query)
+            return data.get("results", [])
+        if api_name == "marketaux":
+            return client.get_latest_news(limit=SEARCH_CONFIG["marketaux"]["limit"], published_after=since,
+                                          search=query)
+        raise ValueError(f"Topic queries are not supported for {api_name}")
+
+    async def _request_planned(self, api_name: str, since: str) -> List[Dict]:
+        """Запросы по темам из плана параллельно; результат слит и очищен от повторов по URL.
+
+        Темы, по которым нашлась каждая статья, хранятся в _active_topics, а не в самой
+        статье: в сохраняемый результат они не попадают.
+        """
+        plan = self.planner.plan(api_name)
+        found: Dict[Any, List[str]] = {}
+        self._active_topics[api_name] = ([topic for topic, _ in plan], found)
+        bucket = self.scheduler.buckets.get(api_name)
+        if bucket and len(plan) > 1:
+            # Первый запрос оплачен токеном цикла, остальные — из квоты провайдера
+            bucket.consume(len(plan) - 1)
+
+        if PAGINATION_SETTINGS.get(api_name, {}).get("max_pages", 1) > 1:
+            # Каждая тема листается тем же итератором страниц, что и обычный запрос
+            requests = [self._collect_pages(api_name, since, query) for _, query in plan]
+        else:
+            loop = asyncio.get_running_loop()
+            requests = [loop.run_in_executor(self.page_executor, self._request_query, api_name, query, since)
+                        for _, query in plan]
+        # Ошибка темы возвращается вместо ее статей и не отменяет остальные темы
+        outcomes = await asyncio.gather(*requests, return_exceptions=True)
+
+        merged: Dict[str, Dict] = {}
+        errors = []
+        for (topic, _), articles in zip(plan, outcomes):
+            if isinstance(articles, Exception):
+                print(f"⚠️ {api_name} topic '{topic}' failed: {articles}")
+                errors.append(articles)
                 continue
-            filtered.append(art)
-        return filtered
+            for art in articles:
+                key = article_key(art) or id(art)
+                if key not in merged:
+                    merged[key] = art
+                found.setdefault(key, []).append(topic)
+        if len(errors) == len(plan):
+            raise errors[0]
+        return list(merged.values())
+
+    def _page_iterator(self, api_name: str, since: str, run, stop_when, query: str = None):
+        """Async-итератор страниц провайдера (NewsAPI — номерные, polygon/newsdata — курсорные).
+
+        query — тематический запрос планировщика вместо запроса из SEARCH_CONFIG.
+        """
+        settings = PAGINATION_SETTINGS[api_name]
+        client = self.clients[api_name]
+        bucket = self.scheduler.buckets.get(api_name)
+
+        def charge():
+            # Каждая дополнительная страница — запрос из квоты провайдера
+            if bucket:
+                bucket.consume(1)
+            if self.planner and api_name in self.planner.providers():
+                self.planner.spend(api_name)
+
+        if api_name == "newsapi":
+            config = SEARCH_CONFIG["newsapi"]
+
+            def fetch_page(page: int) -> List[Dict]:
+                if page > 1:
+                    charge()
+                data = client.get_everything(q=query or config["query"], language=config["language"],
+                                             page_size=config["page_size"], from_param=since, page=page)
+                return data.get("articles", [])
+
+            return numbered_pages(fetch_page, run, settings["max_pages"], config["page_size"],
+                                  settings.get("concurrency", 2), stop_when)
+
+        if api_name == "polygon":
+            def fetch_first():
+                data = client.get_market_news(limit=SEARCH_CONFIG["polygon"]["limit"],
+                                              published_utc_gt=f"{since}Z" if since else None)
+                return data.get("results", []), data.get("next_url")
+
+            def fetch_next(next_url: str):
+                charge()
+                data = client.get_next_page(next_url)
+                return data.get("results", []), data.get("next_url")
+
+            return cursor_pages(fetch_first, fetch_next, run, settings["max_pages"], stop_when)
+
+        if api_name == "newsdata":
+            size = SEARCH_CONFIG["newsdata"]["size"]
+
+            def fetch_first():
+                data = client.latest_news(size=size, q=query)
+                return data.get("results", []), data.get("nextPage")
+
+            def fetch_next(token: str):
+                charge()
+                data = client.latest_news(size=size, page=token, q=query)
+                return data.get("results", []), data.get("nextPage")
+
+            return cursor_pages(fetch_first, fetch_next, run, settings["max_pages"], stop_when)
+
+        raise ValueError(f"Pagination is not supported for {api_name}")
+
+    async def _collect_pages(self, api_name: str, since: str, query: str = None) -> List[Dict]:
+        """Собирает страницы до max_pages или до high-water mark"""
+        loop = asyncio.get_running_loop()
+
+        def run(fn, *args):
+            return loop.run_in_executor(self.page_executor, fn, *args)
+
+        def reached_watermark(page: List[Dict]) -> bool:
+            # Страницы идут от новых к старым: как только в странице есть уже виденное — дальше старое
+            return len(self.cursors.filter_new(api_name, page)) < len(page)
+
+        articles, pages = [], 0
+        async for page in self._page_iterator(api_name, since, run, reached_watermark, query):
+            articles.extend(page)
+            pages += 1
+        self.metrics.inc(api_name, "pages_total", pages)
+        return articles
+
+    def fetch_api(self, api_name: str, deadline: float = None) -> Dict[str, Any]:
+        """Основная логика получения данных — синхронный вызов вне цикла событий.
+
+        deadline — момент time.monotonic(), после которого ответ считается опоздавшим
+        и отбрасывается (курсор, индекс виденных URL и выход тем при этом не трогаются).
+        """
+        return asyncio.run(self.fetch_api_async(api_name, deadline))
+
+    async def _fetch(self, api_name: str, deadline: float = None) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Запрос и разбор ответа без изменения состояния.
 
-    def fetch_api(self, api_name: str) -> Dict[str, Any]:
-        """Основная логика получения данных"""
+        Возвращает (результат, отложенные изменения состояния для commit_fetch);
+        при ошибке или пропуске вместо изменений None.
+        """
         result = {"source": api_name, "timestamp": datetime.utcnow().isoformat(), "raw_data": {}}
 
+        breaker = self.breakers[api_name]
+        if not breaker.allow_request():
+            print(f"⛔ {api_name.upper()} circuit open, retry in {breaker.snapshot()['retry_in']}s")
+            result["error"] = "circuit open"
+            result["skipped"] = True
+            self.metrics.inc(api_name, "skipped_total")
+            return result, None
+
+        requested = False
+        topics = None
+        started = time.monotonic()
         try:
             print(f"🔹 Fetching {api_name.upper()}...", end=" ")
 
-            if api_name == "newsapi":
-                config = SEARCH_CONFIG["newsapi"]
-                data = self.clients[api_name].get_everything(
-                    q=config["query"], language=config["language"], page_size=config["page_size"]
-                )
-                articles = data.get("articles", [])
-            elif api_name == "polygon":
-                data = self.clients[api_name].get_market_news(limit=SEARCH_CONFIG["polygon"]["limit"])
-                articles = data.get("results", [])
-            elif api_name == "finnhub":
-                data = self.clients[api_name].general_news(SEARCH_CONFIG["finnhub"]["category"])
-                articles = data
-            elif api_name == "marketaux":
-                data = self.clients[api_name].get_latest_news(limit=SEARCH_CONFIG["marketaux"]["limit"])
-                articles = data if isinstance(data, list) else []
-            elif api_name == "newsdata":
-                data = self.clients[api_name].latest_news(size=SEARCH_CONFIG["newsdata"]["size"])
-                articles = data.get("results", [])
-
-            filtered = self.apply_content_filters(articles, api_name)
-            result["raw_data"] = {"articles": filtered}
-            print(f"OK ({len(filtered)} articles)")
+            try:
+                articles = await self._request_articles(api_name)
+            finally:
+                topics = self._active_topics.pop(api_name, None)
+
+            # Потоковый ответ еще дочитывается из сокета, поэтому разбираем его в пуле потоков.
+            # Время ответа и дедлайн проверяются, когда тело прочитано до конца
+            loop = asyncio.get_running_loop()
+            pending = await loop.run_in_executor(self.executor, self._process, api_name, articles, result)
+            pending["topics"] = topics
+            self.metrics.observe_request(api_name, time.monotonic() - started)
+            requested = True
+
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("cycle deadline exceeded")
+
+            breaker.record_success()
+            return result, pending
         except Exception as e:
+            if not requested:
+                self.metrics.observe_request(api_name, time.monotonic() - started, ok=False)
             print(f"❌ ERROR: {e}")
+            result["raw_data"] = {}
             result["error"] = str(e)
+            breaker.record_failure(str(e))
+            if requested:  # ответ прочитан целиком, но опоздал к дедлайну
+                self.metrics.inc(api_name, "errors_total")
+            return result, None
+
+    def _process(self, api_name: str, articles: Iterable[Dict], result: Dict[str, Any]) -> Dict[str, Any]:
+        """Пайплайн разбора ответа; статьи кладет в result, изменения состояния возвращает"""
+        # Статьи идут по пайплайну по одной (ответ может еще дочитываться из сокета):
+        # дельта относительно high-water mark -> фильтры контента с ограниченной кучей.
+        # Курсор сдвигается только в commit_fetch, когда результат точно сохраняется.
+        returned = 0
+        marks = []
+
+        def counted(stream):
+            nonlocal returned
+            for art in stream:
+                returned += 1
+                yield art
+
+        fresh = self.cursors.iter_new(api_name, counted(articles), marks)
+        skipped = Counter()
+        if self.seen_index is not None:
+            # Повторы (с прошлых циклов и от других провайдеров) не уходят на скрапинг и эмбеддинги;
+            # отсеиваем их до лимита max_results, чтобы место в нем досталось новым статьям
+            fresh = self.seen_index.iter_unseen(fresh, skipped)
+        dropped = []
+        filtered = self.apply_content_filters(fresh, api_name, dropped)
+        fresh_count = len(marks)
+        # Не влезшие в max_results статьи должны прийти снова: курсор останавливается перед ними
+        marks = cap_marks(marks, dropped)
+        result["raw_data"] = {"articles": filtered}
+        return {"marks": marks, "duplicates": skipped["duplicates"],
+                "returned": returned, "new": fresh_count, "passed": len(filtered)}
+
+    def commit_fetch(self, api_name: str, result: Dict[str, Any], pending: Dict[str, Any]):
+        """Сдвигает курсор, запоминает URL и выход тем — только для результата, который сохраняется"""
+        filtered = result["raw_data"]["articles"]
+        duplicates = pending["duplicates"]
+        self.cursors.advance_marks(api_name, pending["marks"])
+        if self.seen_index is not None:
+            # Тот же URL мог прийти от другого провайдера, пока этот ответ разбирался
+            filtered, raced = self.seen_index.remember(filtered, api_name)
+            duplicates += raced
+            result["raw_data"]["articles"] = filtered
+        if pending["topics"] is not None:
+            topics, found = pending["topics"]
+            self.planner.record(api_name, topics, [found.get(article_key(art) or id(art), []) for art in filtered])
+        self.metrics.observe_articles(api_name, pending["returned"], pending["new"], pending["passed"],
+                                      len(filtered), duplicates)
+        print(f"OK ({len(filtered)} articles, {duplicates} seen before)")
 
+    def _reject_late(self, api_name: str, result: Dict[str, Any]):
+        """Опоздавший ответ: состояние не меняется, провайдер получает ошибку в breaker"""
+        print(f"⏱️ {api_name.upper()} missed the cycle deadline")
+        self.breakers[api_name].record_failure("cycle deadline exceeded")
+        self.metrics.inc(api_name, "errors_total")
+        result["raw_data"] = {}
+        result["error"] = "cycle deadline exceeded"
+
+    async def fetch_api_async(self, api_name: str, deadline: float = None) -> Dict[str, Any]:
+        """Получение данных провайдера для asyncio-движка.
+
+        Задача _fetch только запрашивает и разбирает ответ; состояние меняет эта корутина
+        и только если ответ пришел до дедлайна и пойдет в сохранение.
+        """
+        task = asyncio.ensure_future(self._fetch(api_name, deadline))
+        try:
+            if deadline is None:
+                result, pending = await task
+            else:
+                result, pending = await asyncio.wait_for(asyncio.shield(task),
+                                                         timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            # Запрос доработает сам, но его результат уже никто не примет
+            print(f"⏱️ {api_name.upper()} missed the cycle deadline")
+            self.metrics.inc(api_name, "skipped_total")
+            return {"source": api_name, "timestamp": datetime.utcnow().isoformat(), "raw_data": {},
+                    "error": "cycle deadline exceeded", "skipped": True}
+
+        if pending is not None:
+            if deadline is not None and time.monotonic() > deadline:
+                self._reject_late(api_name, result)
+            else:
+                self.commit_fetch(api_name, result, pending)
         return result
 
     def save_result(self, api_name: str, result: Dict[str, Any]):
-        """Сохраняет результат в parser/"""
+        """Дописывает результат в журнал провайдера и атомарно обновляет news_{api}_latest.json"""
+        try:
+            offset = self.snapshots.append(api_name, result)
+            print(f"💾 {api_name} snapshot #{offset}")
+        except Exception as e:
+            print(f"⚠️ Snapshot error {api_name}: {e}")
+
+        if not SNAPSHOT_SETTINGS["write_latest"]:
+            return
         try:
             path = os.path.join(self.parser_dir, self.fixed_filenames[api_name])
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
             print(f"💾 Saved {path}")
         except Exception as e:
             print(f"⚠️ Save error {api_name}: {e}")
 
-    def run_cycle(self):
-        for api in self.clients:
-            if self.can_make_request(api):
-                data = self.fetch_api(api)
-                self.save_result(api, data)
-                self.last_requests[api] = datetime.now()
-                time.sleep(0.5)
+    def _record_response(self, response, *args, **kwargs):
+        """Хук сессии requests: считает HTTP-запросы и байты ответа по провайдеру"""
+        api_name = next((api for api, client in self.clients.items()
+                         if response.url.startswith(client.base_url)), None)
+        if api_name is None:
+            return
+        self.metrics.inc(api_name, "requests_total")
+        size = response.headers.get("Content-Length")
+        if size and size.isdigit():
+            self.metrics.inc(api_name, "bytes_received_total", int(size))
+        elif kwargs.get("stream"):
+            # Потоковый ответ без Content-Length: читать тело здесь нельзя, считаем по мере чтения
+            self._count_streamed_bytes(api_name, response.raw)
+        else:
+            self.metrics.inc(api_name, "bytes_received_total", len(response.content))
+
+    def _count_streamed_bytes(self, api_name: str, raw):
+        """Подменяет raw.read: после каждого чтения добавляет байты, пришедшие по проводу (raw.tell())"""
+        read = raw.read
+        counted = 0
+
+        def counting_read(*args, **kwargs):
+            nonlocal counted
+            data = read(*args, **kwargs)
+            received = raw.tell()
+            if received > counted:
+                self.metrics.inc(api_name, "bytes_received_total", received - counted)
+                counted = received
+            return data
+
+        raw.read = counting_read
+
+    def write_metrics(self):
+        if not METRICS_SETTINGS.get("file"):
+            return
+        try:
+            self.metrics.write_prometheus(os.path.join(self.parser_dir, METRICS_SETTINGS["file"]))
+        except Exception as e:
+            print(f"⚠️ Metrics write error: {e}")
+
+    async def _fetch_and_save(self, api_name: str, deadline: float = None) -> Dict[str, Any]:
+        if deadline is None:
+            deadline = time.monotonic() + FETCH_SETTINGS["cycle_deadline"]
+        result = await self.fetch_api_async(api_name, deadline)
+        if not result.get("skipped"):
+            self.save_result(api_name, result)
+        self.last_requests[api_name] = datetime.now()
+        self.write_metrics()
+        return result
+
+    async def run_cycle_async(self) -> Dict[str, Dict[str, Any]]:
+        """Опрашивает все доступные провайдеры одновременно.
+
+        Цикл длится столько, сколько самый медленный провайдер, а не сумму всех.
+        """
+        due = [api for api in self.clients if self.scheduler.try_acquire(api)]
+        if not due:
+            return {}
+        # Общий дедлайн на цикл: деградировавший провайдер не задерживает остальных
+        deadline = time.monotonic() + FETCH_SETTINGS["cycle_deadline"]
+        results = await asyncio.gather(*(self._fetch_and_save(api, deadline) for api in due))
+        return dict(zip(due, results))
+
+    def run_cycle(self) -> Dict[str, Dict[str, Any]]:
+        return asyncio.run(self.run_cycle_async())
+
+    async def run_forever(self):
+        """Опрос по расписанию: спим ровно до ближайшего дедлайна в куче.
+
+        Каждый провайдер запускается отдельной задачей, как только у него есть токен,
+        и возвращается в кучу после завершения запроса.
+        """
+        wakeup = asyncio.Event()
+        in_flight = set()
+
+        def on_done(task: asyncio.Task, api_name: str):
+            in_flight.discard(task)
+            self.scheduler.reschedule(api_name)
+            wakeup.set()
+
+        while True:
+            for api in self.scheduler.pop_due():
+                task = asyncio.create_task(self._fetch_and_save(api))
+                task.add_done_callback(lambda t, name=api: on_done(t, name))
+                in_flight.add(task)
+
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=self.scheduler.time_until_next())
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.page_executor.shutdown(wait=False)
+        self.session.close()
+        self.metrics.close()
+        if self.seen_index is not None:
+            self.seen_index.close()
 
 
 def main():
     fetcher = SurgicalNewsFetcher()
     print("\n🔁 Fetch cycle started. Ctrl+C to stop.\n")
     try:
-        while True:
-            fetcher.run_cycle()
-            time.sleep(5)
+        asyncio.run(fetcher.run_forever())
     except KeyboardInterrupt:
         print("\n🛑 Stopped.")
+    finally:
+        fetcher.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+"""Постраничная загрузка как async-итератор страниц
+
+Два вида пагинации у наших API:
+  * номерные страницы (NewsAPI `page`) — страницы независимы, их можно качать параллельно
+    окном из `concurrency` запросов, отдавая потребителю строго по порядку;
+  * курсорные (polygon `next_url`, newsdata `nextPage`) — следующую страницу можно
+    запросить только по ответу предыдущей, поэтому качаем ее заранее, пока потребитель
+    разбирает текущую.
+
+Сами запросы синхронные (requests) и выполняются через `run(fn, *args)`, который
+должен вернуть awaitable — обычно loop.run_in_executor с пулом потоков.
+Ошибка на первой странице пробрасывается, на последующих — пагинация просто
+останавливается, а уже полученные страницы остаются в силе.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+Page = List[Dict[str, Any]]
+Runner = Callable[..., Awaitable[Any]]
+StopCondition = Callable[[Page], bool]
+
+
+async def numbered_pages(fetch_page: Callable[[int], Page], run: Runner, max_pages: int,
+                         page_size: int, concurrency: int = 2,
+                         stop_when: Optional[StopCondition] = None) -> AsyncIterator[Page]:
+    """Страницы 1..max_pages; останавливается на неполной странице или по stop_when"""
+    pending: Dict[int, asyncio.Future] = {}
+    next_page = 1
+
+    def launch():
+        nonlocal next_page
+        while len(pending) < max(1, concurrency) and next_page <= max_pages:
+            pending[next_page] = asyncio.ensure_future(run(fetch_page, next_page))
+            next_page += 1
+
+    current = 1
+    try:
+        launch()
+        while current in pending:
+            try:
+                page = await pending.pop(current)
+            except Exception as e:
+                if current == 1:
+                    raise
+                print(f"⚠️ page {current} failed, stopping pagination: {e}")
+                return
+            yield page
+            if len(page) < page_size or (stop_when and stop_when(page)):
+                return
+            current += 1
+            launch()
+    finally:
+        for future in pending.values():
+            future.cancel()
+
+
+async def cursor_pages(fetch_first: Callable[[], Tuple[Page, Optional[str]]],
+                       fetch_next: Callable[[str], Tuple[Page, Optional[str]]], run: Runner,
+                       max_pages: int, stop_when: Optional[StopCondition] = None) -> AsyncIterator[Page]:
+    """Страницы по курсору; следующая запрашивается до того, как потребитель разберет текущую"""
+    future = asyncio.ensure_future(run(fetch_first))
+    pages = 0
+    try:
+        while future is not None:
+            try:
+                page, cursor = await future
+            except Exception as e:
+                if pages == 0:
+                    raise
+                print(f"⚠️ page {pages + 1} failed, stopping pagination: {e}")
+                return
+            future = None
+            pages += 1
+            if cursor and pages < max_pages and not (stop_when and stop_when(page)):
+                future = asyncio.ensure_future(run(fetch_next, cursor))
+            yield page
+    finally:
+        if future is not None:
+            future.cancel()
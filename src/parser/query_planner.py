@@ -0,0 +1,175 @@
+"""Планировщик тематических запросов по корзинам FINANCIAL_KEYWORDS
+
+Вместо одного фиксированного OR-запроса провайдер получает за цикл несколько запросов
+по разным темам (market_movers, central_banks, ...). Какие темы спрашивать, решает
+"выход" — сколько новых статей в среднем приносит запрос по теме (EWMA). Чтобы не
+забывать про темы, которые давно не спрашивали, к выходу добавляется UCB-бонус.
+
+Суточная квота провайдера — 86400 / RATE_LIMITS[api] запросов; запросы одного цикла
+списываются из его token bucket'а, так что больше запросов за цикл означает более
+редкие циклы, а не перерасход квоты. Сколько тем спросить в цикле, planner решает по
+остатку квоты на сегодня (UTC): queries_per_cycle — потолок, а если квота уже потрачена
+быстрее расчетного (доп. страницы, перезапуски), запросов в цикле становится меньше.
+"""
+import json
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Синтаксис запросов у провайдеров: разделитель OR и максимальная длина строки
+QUERY_SYNTAX = {
+    "newsapi": {"separator": " OR ", "max_length": 500},
+    "newsdata": {"separator": " OR ", "max_length": 100},
+    "marketaux": {"separator": " | ", "max_length": 500},
+}
+
+
+def build_query(keywords: Iterable[str], separator: str, max_length: int) -> str:
+    """OR-запрос из ключевых слов (фразы в кавычках), обрезанный по длине на границе слова"""
+    query = ""
+    for kw in keywords:
+        term = f'"{kw}"' if " " in kw else kw
+        candidate = f"{query}{separator}{term}" if query else term
+        if len(candidate) > max_length:
+            break
+        query = candidate
+    return query
+
+
+class QueryPlanner:
+    def __init__(self, keywords: Dict[str, List[str]], rate_limits: Dict[str, float],
+                 queries_per_cycle: Dict[str, int], state_path: str = None,
+                 smoothing: float = 0.3, exploration: float = 1.0, clock: Callable[[], float] = time.time):
+        self.rate_limits = rate_limits
+        self.queries_per_cycle = queries_per_cycle
+        self.state_path = state_path
+        self.smoothing = smoothing        # вес последнего наблюдения в EWMA
+        self.exploration = exploration    # сила UCB-бонуса для редко спрашиваемых тем
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self.queries = {
+            api: {topic: build_query(words, **syntax) for topic, words in keywords.items()}
+            for api, syntax in QUERY_SYNTAX.items() if api in queries_per_cycle
+        }
+        # stats[api][topic] = {"calls": n, "yield": ewma новых статей на запрос}
+        self.stats: Dict[str, Dict[str, Dict[str, float]]] = {
+            api: {topic: {"calls": 0, "yield": 0.0} for topic in keywords} for api in self.queries
+        }
+        # Запросов к провайдеру за текущие сутки (UTC): {"day": номер суток, "spent": {api: n}}
+        self.usage = {"day": self._today(), "spent": {}}
+        self._load()
+
+    def providers(self) -> List[str]:
+        return list(self.queries)
+
+    def daily_budget(self, api_name: str) -> int:
+        """Запросов в сутки при опросе с максимальной частотой из RATE_LIMITS"""
+        return int(86400 // self.rate_limits.get(api_name, 60))
+
+    def _today(self) -> int:
+        return int(self.clock() // 86400)
+
+    def _spent_today(self) -> Dict[str, int]:
+        today = self._today()
+        if self.usage["day"] != today:
+            self.usage = {"day": today, "spent": {}}
+        return self.usage["spent"]
+
+    def spend(self, api_name: str, n: int = 1):
+        """Учитывает запросы к провайдеру сверх плана (дополнительные страницы)"""
+        with self.lock:
+            spent = self._spent_today()
+            spent[api_name] = spent.get(api_name, 0) + n
+
+    def allowance(self, api_name: str) -> int:
+        """Запросов на этот цикл: остаток суточной квоты поровну на оставшиеся циклы.
+
+        Циклов до конца суток — столько, сколько позволит token bucket, если каждый
+        тратит queries_per_cycle запросов; но не меньше одного запроса на цикл —
+        сам цикл уже оплачен токеном планировщика.
+        """
+        limit = max(1, self.queries_per_cycle.get(api_name, 1))
+        with self.lock:
+            remaining = self.daily_budget(api_name) - self._spent_today().get(api_name, 0)
+        seconds_left = 86400 - self.clock() % 86400
+        cycles_left = max(1, math.ceil(seconds_left / (self.rate_limits.get(api_name, 60) * limit)))
+        return max(1, min(limit, remaining // cycles_left))
+
+    def plan(self, api_name: str) -> List[Tuple[str, str]]:
+        """Темы и запросы на этот цикл: [(topic, query), ...]; запросы сразу учитываются в квоте"""
+        count = self.allowance(api_name)
+        with self.lock:
+            stats = self.stats[api_name]
+            total_calls = sum(s["calls"] for s in stats.values())
+
+            def score(topic: str) -> float:
+                s = stats[topic]
+                if s["calls"] == 0:
+                    return math.inf  # каждую тему хотя бы раз пробуем
+                bonus = self.exploration * math.sqrt(math.log(total_calls + 1) / s["calls"])
+                return s["yield"] + bonus
+
+            ranked = sorted(stats, key=score, reverse=True)[:count]
+            spent = self._spent_today()
+            spent[api_name] = spent.get(api_name, 0) + len(ranked)
+            return [(topic, self.queries[api_name][topic]) for topic in ranked]
+
+    def record(self, api_name: str, topics: List[str], found_by: List[List[str]]):
+        """Обновляет выход тем по статьям, дошедшим до конца пайплайна загрузчика.
+
+        found_by — по одному списку на каждую такую статью: темы, по которым она нашлась.
+        """
+        per_topic = {topic: 0 for topic in topics}
+        for article_topics in found_by:
+            for topic in article_topics:
+                if topic in per_topic:
+                    per_topic[topic] += 1
+
+        with self.lock:
+            for topic, new_count in per_topic.items():
+                s = self.stats[api_name][topic]
+                s["yield"] = new_count if s["calls"] == 0 else (
+                    self.smoothing * new_count + (1 - self.smoothing) * s["yield"]
+                )
+                s["calls"] += 1
+            self._save()
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        with self.lock:
+            return {
+                api: {topic: {"calls": s["calls"], "yield": round(s["yield"], 2)} for topic, s in topics.items()}
+                for api, topics in self.stats.items()
+            }
+
+    def _load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Query planner state unreadable, starting fresh: {e}")
+            return
+        if "stats" in saved:
+            usage = saved.get("usage") or {}
+            if usage.get("day") == self.usage["day"]:
+                self.usage["spent"] = dict(usage.get("spent", {}))
+            saved = saved["stats"]
+        for api, topics in saved.items():
+            for topic, s in topics.items():
+                if topic in self.stats.get(api, {}):
+                    self.stats[api][topic] = {"calls": s.get("calls", 0), "yield": s.get("yield", 0.0)}
+
+    def _save(self):
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stats": self.stats, "usage": self.usage}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            print(f"⚠️ Query planner save error: {e}")
@@ -0,0 +1,110 @@
+"""Token bucket на каждый провайдер + планировщик по куче дедлайнов"""
+import heapq
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class TokenBucket:
+    """Классический token bucket: один токен = один запрос к API.
+
+    interval — сколько секунд восстанавливается один токен (значение из RATE_LIMITS),
+    capacity — сколько запросов можно сделать подряд после простоя.
+    """
+
+    def __init__(self, interval: float, capacity: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.interval = max(float(interval), 1e-6)
+        self.capacity = float(capacity)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        # Токены списываются и из цикла событий, и из потоков пагинации
+        self.lock = threading.RLock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed / self.interval)
+            self.updated = now
+
+    def available(self, now: Optional[float] = None) -> float:
+        with self.lock:
+            self._refill(self.clock() if now is None else now)
+            return self.tokens
+
+    def try_acquire(self, n: float = 1.0, now: Optional[float] = None) -> bool:
+        with self.lock:
+            if self.available(now) >= n:
+                self.tokens -= n
+                return True
+            return False
+
+    def consume(self, n: float = 1.0, now: Optional[float] = None):
+        """Списывает токены без проверки — баланс может уйти в минус (долг),
+        и следующий опрос провайдера сдвинется на соответствующее время"""
+        with self.lock:
+            self._refill(self.clock() if now is None else now)
+            self.tokens -= n
+
+    def time_until_available(self, n: float = 1.0, now: Optional[float] = None) -> float:
+        missing = n - self.available(now)
+        return max(0.0, missing * self.interval)
+
+
+class ProviderScheduler:
+    """Планировщик опроса: куча (дедлайн, провайдер) поверх token bucket'ов.
+
+    Провайдер, выданный из pop_due(), не возвращается в кучу до вызова reschedule(),
+    поэтому один и тот же API не опрашивается повторно, пока предыдущий запрос в полете.
+    """
+
+    def __init__(self, rate_limits: Dict[str, float], providers: List[str],
+                 capacity: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.buckets = {
+            name: TokenBucket(rate_limits.get(name, 60), capacity, clock) for name in providers
+        }
+        self._heap = []
+        now = clock()
+        for name in providers:
+            heapq.heappush(self._heap, (now, name))
+
+    def try_acquire(self, name: str) -> bool:
+        return self.buckets[name].try_acquire()
+
+    def reschedule(self, name: str):
+        """Ставит провайдера в очередь на момент появления следующего токена"""
+        now = self.clock()
+        deadline = now + self.buckets[name].time_until_available(now=now)
+        heapq.heappush(self._heap, (deadline, name))
+
+    def pop_due(self) -> List[str]:
+        """Забирает из кучи всех провайдеров с наступившим дедлайном и списывает их токены"""
+        now = self.clock()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, name = heapq.heappop(self._heap)
+            if self.buckets[name].try_acquire(now=now):
+                due.append(name)
+            else:
+                self.reschedule(name)
+        return due
+
+    def time_until_next(self) -> Optional[float]:
+        """Сколько спать до ближайшего дедлайна (None — очередь пуста)"""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    def quota(self) -> Dict[str, Dict[str, float]]:
+        """Остаток квоты по каждому провайдеру"""
+        now = self.clock()
+        return {
+            name: {
+                "tokens": round(bucket.available(now), 3),
+                "capacity": bucket.capacity,
+                "interval": bucket.interval,
+                "next_in": round(bucket.time_until_available(now=now), 3),
+            }
+            for name, bucket in self.buckets.items()
+        }
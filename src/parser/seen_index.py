@@ -0,0 +1,189 @@
+"""Персистентный индекс уже виденных URL (общий для всех провайдеров)
+
+Bloom-фильтр в памяти отвечает "точно не видели" без обращения к диску;
+на "возможно видели" проверяем точный индекс в SQLite с TTL.
+"""
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Параметры, которые не меняют статью, а только помечают источник перехода
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "mc_cid", "mc_eid", "ref", "ref_src",
+    "cmpid", "ocid", "guccounter", "guce_referrer", "guce_referrer_sig", "taid", "ito",
+    "soc_src", "soc_trk", "sr_share",
+}
+TRACKING_PREFIXES = ("utm_", "at_", "__")
+
+
+def canonicalize_url(url: str) -> str:
+    """Канонический вид URL: без схемы, www, трекинговых параметров, фрагмента и хвостового '/'"""
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path.rstrip("/") or ""
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    )
+    canonical = host + path
+    if query:
+        canonical += "?" + urlencode(query)
+    return canonical
+
+
+def url_hash(canonical_url: str) -> str:
+    return hashlib.blake2b(canonical_url.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class BloomFilter:
+    """Bloom-фильтр на bytearray с double hashing"""
+
+    def __init__(self, capacity: int = 200_000, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class SeenUrlIndex:
+    """Bloom-фильтр + точный индекс в SQLite с временем жизни записей"""
+
+    def __init__(self, path: str, ttl_hours: float = 72, capacity: int = 200_000, error_rate: float = 0.001):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen_urls (
+                url_hash TEXT PRIMARY KEY,
+                url TEXT,
+                provider TEXT,
+                first_seen REAL
+            )
+        """)
+        self.conn.commit()
+        self.purge_expired()
+
+    def purge_expired(self):
+        """Удаляет просроченные записи и пересобирает Bloom-фильтр"""
+        with self.lock:
+            self.conn.execute("DELETE FROM seen_urls WHERE first_seen < ?", (time.time() - self.ttl,))
+            self.conn.commit()
+            self.bloom = BloomFilter(self.capacity, self.error_rate)
+            for (key,) in self.conn.execute("SELECT url_hash FROM seen_urls"):
+                self.bloom.add(key)
+            self.last_purge = time.time()
+
+    def _is_seen(self, key: str, now: float) -> bool:
+        if key not in self.bloom:
+            return False
+        row = self.conn.execute("SELECT first_seen FROM seen_urls WHERE url_hash = ?", (key,)).fetchone()
+        return bool(row) and row[0] >= now - self.ttl
+
+    def seen(self, url: str) -> bool:
+        with self.lock:
+            return self._is_seen(url_hash(canonicalize_url(url)), time.time())
+
+    def filter_unseen(self, articles: Iterable[Dict], provider: str) -> Tuple[List[Dict], int]:
+        """Отбрасывает уже виденные статьи, новые запоминает. Возвращает (новые, число повторов)"""
+        skipped = Counter()
+        fresh, duplicates = self.remember(list(self.iter_unseen(articles, skipped)), provider)
+        return fresh, duplicates + skipped["duplicates"]
+
+    def iter_unseen(self, articles: Iterable[Dict], skipped: Counter = None) -> Iterator[Dict]:
+        """Ленивый filter_unseen без записи: повторы пропускаются и считаются в skipped["duplicates"].
+
+        Новые статьи запоминает remember — когда результат точно будет сохранен.
+        """
+        if time.time() - self.last_purge > self.ttl / 4:
+            self.purge_expired()
+
+        batch_keys = set()
+        for art in articles:
+            key = self._key(art)
+            if key is not None:
+                with self.lock:
+                    repeated = key[0] in batch_keys or self._is_seen(key[0], time.time())
+                if repeated:
+                    if skipped is not None:
+                        skipped["duplicates"] += 1
+                    continue
+                batch_keys.add(key[0])
+            yield art
+
+    def remember(self, articles: List[Dict], provider: str) -> Tuple[List[Dict], int]:
+        """Запоминает URL статей. Те, что за это время успел запомнить другой провайдер,
+        выбрасываются. Возвращает (новые, число повторов)"""
+        kept, new_rows, duplicates = [], [], 0
+        with self.lock:
+            now = time.time()
+            batch_keys = set()
+            for art in articles:
+                key = self._key(art)
+                if key is None:
+                    kept.append(art)
+                    continue
+                if key[0] in batch_keys or self._is_seen(key[0], now):
+                    duplicates += 1
+                    continue
+                batch_keys.add(key[0])
+                kept.append(art)
+                new_rows.append((key[0], key[1], provider, now))
+
+            if new_rows:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO seen_urls (url_hash, url, provider, first_seen) VALUES (?, ?, ?, ?)",
+                    new_rows,
+                )
+                self.conn.commit()
+                for key, *_ in new_rows:
+                    self.bloom.add(key)
+        return kept, duplicates
+
+    @staticmethod
+    def _key(art: Dict) -> Optional[Tuple[str, str]]:
+        """(хэш, канонический URL) статьи или None, если URL нет"""
+        url = art.get("url") or art.get("article_url") or art.get("link")
+        if not url:
+            return None
+        canonical = canonicalize_url(url)
+        return url_hash(canonical), canonical
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM seen_urls").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,239 @@
+"""Append-only журнал сырых ответов провайдеров (NDJSON, сжатые сегменты)
+
+Структура на диске:
+    snapshots/<api>/<base_offset>.ndjson.gz   (или .ndjson.zst)
+
+Каждый вызов append() пишет один самостоятельный gzip/zstd-фрейм одним write() в режиме
+O_APPEND, поэтому читатель всегда видит либо весь фрейм, либо недописанный хвост,
+который просто пропускается. Offset — сквозной номер записи в журнале провайдера;
+имя сегмента — offset его первой записи.
+
+Для чтения с произвольного offset по каждому сегменту держится индекс фреймов в памяти
+(offset первой записи фрейма -> позиция фрейма в файле). Он строится одним проходом
+при первом обращении к сегменту (для последнего — при открытии журнала), дополняется
+при append() и дочитывается, если сегмент дописал другой процесс. read() распаковывает
+сегмент только начиная с фрейма, в котором лежит нужный offset.
+"""
+import bisect
+import json
+import os
+import threading
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstd опционален, по умолчанию gzip
+    zstandard = None
+
+EXTENSIONS = {"gzip": ".ndjson.gz", "zstd": ".ndjson.zst"}
+
+
+class SnapshotLog:
+    """Журнал одного провайдера с ротацией сегментов по размеру"""
+
+    def __init__(self, directory: str, segment_max_bytes: int = 8 * 1024 * 1024,
+                 compression: str = "gzip", fsync: bool = False):
+        if compression == "zstd" and zstandard is None:
+            print("⚠️ zstandard не установлен — журнал пишется в gzip")
+            compression = "gzip"
+        if compression not in EXTENSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.compression = compression
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        # base_offset сегмента -> индекс его фреймов (см. _index_segment)
+        self._index: Dict[int, Dict[str, Any]] = {}
+        os.makedirs(directory, exist_ok=True)
+
+        segments = self.segments()
+        if segments:
+            base, path = segments[-1]
+            self._segment_base = base
+            self.next_offset = base + self._recover_segment(base, path)
+        else:
+            self._segment_base = 0
+            self.next_offset = 0
+
+    # ---------- запись ----------
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """Добавляет запись, возвращает ее offset"""
+        return self.append_many([record])[0]
+
+    def append_many(self, records: List[Dict[str, Any]]) -> List[int]:
+        if not records:
+            return []
+        payload = "".join(
+            json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in records
+        ).encode("utf-8")
+        frame = self._compress(payload)
+
+        with self.lock:
+            path = self._segment_path(self._segment_base)
+            if os.path.exists(path) and os.path.getsize(path) >= self.segment_max_bytes:
+                self._segment_base = self.next_offset
+                path = self._segment_path(self._segment_base)
+
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                position = os.fstat(fd).st_size
+                os.write(fd, frame)
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+            first = self.next_offset
+            self.next_offset += len(records)
+            index = self._index.setdefault(self._segment_base, {"offsets": [], "positions": [],
+                                                                 "end": 0, "next": self._segment_base})
+            if index["end"] == position:  # иначе сегмент дописан кем-то еще — дочитается при чтении
+                index["offsets"].append(first)
+                index["positions"].append(position)
+                index["end"] = position + len(frame)
+                index["next"] = self.next_offset
+        return list(range(first, first + len(records)))
+
+    # ---------- чтение ----------
+
+    def segments(self) -> List[Tuple[int, str]]:
+        """Список (base_offset, путь) в порядке возрастания offset"""
+        ext = EXTENSIONS[self.compression]
+        result = []
+        for name in os.listdir(self.directory):
+            if name.endswith(ext) and name[:-len(ext)].isdigit():
+                result.append((int(name[:-len(ext)]), os.path.join(self.directory, name)))
+        return sorted(result)
+
+    def read(self, offset: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Итерирует (offset, запись) начиная с заданного offset"""
+        segments = self.segments()
+        for i, (base, path) in enumerate(segments):
+            next_base = segments[i + 1][0] if i + 1 < len(segments) else None
+            if next_base is not None and next_base <= offset:
+                continue
+            yield from self._read_segment(base, path, offset)
+
+    def tail(self, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Возвращает новые записи и offset, с которого читать в следующий раз"""
+        records = []
+        next_offset = offset
+        for position, record in self.read(offset):
+            records.append(record)
+            next_offset = position + 1
+            if limit is not None and len(records) >= limit:
+                break
+        return records, next_offset
+
+    # ---------- внутреннее ----------
+
+    def _segment_path(self, base: int) -> str:
+        return os.path.join(self.directory, f"{base:012d}{EXTENSIONS[self.compression]}")
+
+    def _compress(self, payload: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(payload)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 = gzip-заголовок
+        return compressor.compress(payload) + compressor.flush()
+
+    def _decompressor(self):
+        if self.compression == "zstd":
+            return zstandard.ZstdDecompressor().decompressobj()
+        return zlib.decompressobj(31)
+
+    def _frames(self, data: bytes) -> Iterator[Tuple[int, bytes]]:
+        """Итерирует целые фреймы: (позиция конца фрейма, распакованные байты)"""
+        position = 0
+        while position < len(data):
+            decompressor = self._decompressor()
+            try:
+                chunk = decompressor.decompress(data[position:])
+            except Exception:
+                return  # битый фрейм — дальше читать нечего
+            if not decompressor.eof:
+                return  # недописанный хвост: фрейм появится целиком позже
+            position = len(data) - len(decompressor.unused_data)
+            yield position, chunk
+
+    def _index_segment(self, base: int, path: str) -> Dict[str, Any]:
+        """Индекс фреймов сегмента: offsets[i] — offset первой записи i-го фрейма,
+        positions[i] — его позиция в файле, end — до какого байта сегмент проиндексирован,
+        next — offset записи, следующей за проиндексированными.
+
+        Уже проиндексированная часть не перечитывается: сегменты только дописываются.
+        Возвращает копию, которую можно читать без блокировки.
+        """
+        with self.lock:
+            index = self._index.setdefault(base, {"offsets": [], "positions": [], "end": 0, "next": base})
+            if os.path.getsize(path) > index["end"]:
+                with open(path, "rb") as f:
+                    f.seek(index["end"])
+                    data = f.read()
+                start = 0
+                for frame_end, chunk in self._frames(data):
+                    index["offsets"].append(index["next"])
+                    index["positions"].append(index["end"] + start)
+                    index["next"] += sum(1 for line in chunk.splitlines() if line)
+                    start = frame_end
+                index["end"] += start
+            return {"offsets": list(index["offsets"]), "positions": list(index["positions"]),
+                    "end": index["end"]}
+
+    def _read_segment(self, base: int, path: str, offset: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(offset, запись) сегмента начиная с offset; распаковка — с фрейма, где лежит offset"""
+        try:
+            index = self._index_segment(base, path)
+        except FileNotFoundError:
+            return
+        if not index["offsets"]:
+            return
+        frame = max(bisect.bisect_right(index["offsets"], offset) - 1, 0)
+        with open(path, "rb") as f:
+            f.seek(index["positions"][frame])
+            data = f.read(index["end"] - index["positions"][frame])
+
+        position = index["offsets"][frame]
+        for _, chunk in self._frames(data):
+            for line in chunk.splitlines():
+                if not line:
+                    continue
+                if position >= offset:
+                    yield position, json.loads(line)
+                position += 1
+
+    def _recover_segment(self, base: int, path: str) -> int:
+        """Обрезает недописанный после сбоя хвост сегмента и строит его индекс,
+        возвращает число записей в нем"""
+        size = os.path.getsize(path)
+        index = self._index_segment(base, path)
+        if index["end"] < size:
+            print(f"⚠️ Snapshot {path}: отброшено {size - index['end']} байт недописанного хвоста")
+            with open(path, "r+b") as f:
+                f.truncate(index["end"])
+        return self._index[base]["next"] - base
+
+
+class SnapshotStore:
+    """Набор журналов по провайдерам в одном каталоге"""
+
+    def __init__(self, root: str, **log_options):
+        self.root = root
+        self.log_options = log_options
+        self.logs: Dict[str, SnapshotLog] = {}
+        self.lock = threading.Lock()
+
+    def log(self, api_name: str) -> SnapshotLog:
+        with self.lock:
+            if api_name not in self.logs:
+                self.logs[api_name] = SnapshotLog(os.path.join(self.root, api_name), **self.log_options)
+            return self.logs[api_name]
+
+    def append(self, api_name: str, record: Dict[str, Any]) -> int:
+        return self.log(api_name).append(record)
+
+    def tail(self, api_name: str, offset: int = 0, limit: Optional[int] = None):
+        return self.log(api_name).tail(offset, limit)
@@ -0,0 +1,184 @@
+"""Общие фикстуры: подмена тяжёлых зависимостей нормализатора и загрузчика в базу"""
+import importlib
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+class FakeNewspaperArticle:
+    """newspaper.Article: текст не находит, страницу разбирают остальные экстракторы"""
+
+    def __init__(self, url):
+        self.url = url
+
+    def download(self, input_html=None):
+        self.html = input_html
+
+    def parse(self):
+        self.text, self.authors, self.publish_date = "", [], None
+
+
+NORMALIZER_STATE = ["CONTENT_CACHE_PATH", "DOMAIN_STATS_PATH", "PROCESSED_INDEX_PATH",
+                    "FINGERPRINTS_PATH", "KEYWORDS_DF_PATH"]
+NORMALIZER_STORES = ["CONTENT_CACHE", "DOMAIN_STATS", "PROCESSED_INDEX", "FINGERPRINTS", "KEYWORDS"]
+
+
+@pytest.fixture
+def normalizer(monkeypatch, tmp_path):
+    """Модуль news_normalizer с поддельным newspaper, состоянием в tmp_path и разбором в потоках"""
+    monkeypatch.setitem(sys.modules, "newspaper", _module("newspaper", Article=FakeNewspaperArticle))
+    module = importlib.import_module("normalizer.news_normalizer")
+    for name in NORMALIZER_STATE:
+        monkeypatch.setattr(module, name, str(tmp_path / "state" / os.path.basename(getattr(module, name))))
+    for name in NORMALIZER_STORES:
+        monkeypatch.setattr(module, name, None)
+    monkeypatch.setattr(module, "PARSE_WORKERS", 1)
+    yield module
+    for name in NORMALIZER_STORES:
+        store = getattr(module, name)
+        if hasattr(store, "close"):
+            store.close()
+
+
+def _cosine_similarity(a, b):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return a @ b.T
+
+
+class FakeEncoder:
+    """SentenceTransformer: мешок слов в 16 измерениях, одинаковые тексты — одинаковые векторы"""
+
+    calls = 0
+
+    def __init__(self, name):
+        pass
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False):
+        FakeEncoder.calls += 1
+
+        def one(text):
+            vector = np.zeros(16)
+            for word in text.lower().split():
+                vector[sum(map(ord, word)) % 16] += 1
+            return vector / (np.linalg.norm(vector) or 1)
+
+        return np.array([one(t) for t in texts]) if isinstance(texts, list) else one(texts)
+
+
+def _pipeline(kind, model=None):
+    if kind == "zero-shot-classification":
+        return lambda texts, labels: [{"labels": [labels[0]]} for _ in texts]
+    return lambda texts: [{"label": "neutral", "score": 0.5} for _ in texts]
+
+
+class FakeCursor:
+    """Курсор над словарём {id: строка news_articles}: понимает только запросы loads2.
+
+    broken — id статей, на которых INSERT падает; racing — id, которые между проверкой
+    и вставкой успел добавить другой загрузчик (ON CONFLICT DO NOTHING их не вернёт).
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.updates = []
+        self.result = []
+        self.broken = set()
+        self.racing = set()
+
+    def execute(self, sql, params=None):
+        query = " ".join(sql.split())
+        if query.startswith("SELECT id FROM news_articles WHERE id = ANY"):
+            self.result = [{"id": i} for i in params[0] if i in self.table]
+        elif "WHERE id = ANY(%s) AND embedding IS NOT NULL" in query:
+            self.result = [dict(self.table[i]) for i in params[0] if i in self.table]
+        elif "MAX(is_duplicate)" in query:
+            groups = [row["is_duplicate"] for row in self.table.values()]
+            self.result = [{"new_group": max(groups + [-1]) + 1}]
+        elif query.startswith("UPDATE news_articles SET is_duplicate"):
+            self.updates.append(params)
+            self.table[params[1]]["is_duplicate"] = params[0]
+        elif "published_at >= NOW()" in query:
+            self.result = [dict(row) for row in self.table.values()]
+        else:
+            raise AssertionError(f"Неожиданный запрос: {query}")
+
+    def insert(self, rows):
+        """INSERT ... ON CONFLICT (id) DO NOTHING RETURNING id"""
+        failed = [row["id"] for row in rows if row["id"] in self.broken]
+        if failed:
+            raise ValueError(f"invalid input for {failed[0]}")
+        returned = []
+        for row in rows:
+            if row["id"] not in self.table and row["id"] not in self.racing:
+                self.table[row["id"]] = dict(row)
+                returned.append({"id": row["id"]})
+        return returned
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def _execute_values(cursor, sql, rows, template=None, page_size=100, fetch=False):
+    returned = cursor.insert(rows)
+    return returned if fetch else None
+
+
+@pytest.fixture
+def database_modules(monkeypatch):
+    """Поддельные psycopg2, sentence_transformers, sklearn и transformers: loads2 и main
+    из src/database импортируются без них"""
+    fakes = {
+        "psycopg2": _module("psycopg2", connect=lambda **kwargs: None),
+        "psycopg2.extras": _module("psycopg2.extras", RealDictCursor=object, execute_values=_execute_values),
+        "sentence_transformers": _module("sentence_transformers", SentenceTransformer=FakeEncoder),
+        "sklearn": _module("sklearn"),
+        "sklearn.metrics": _module("sklearn.metrics"),
+        "sklearn.metrics.pairwise": _module("sklearn.metrics.pairwise", cosine_similarity=_cosine_similarity),
+        "transformers": _module("transformers", pipeline=_pipeline),
+    }
+    for name, module in fakes.items():
+        monkeypatch.setitem(sys.modules, name, module)
+    for name in ("loads2", "main"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    yield fakes
+    for name in ("loads2", "main"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+
+
+@pytest.fixture
+def loads2(database_modules):
+    """Модуль loads2 с таблицей news_articles в словаре вместо PostgreSQL"""
+    module = importlib.import_module("loads2")
+    module.conn = FakeConnection()
+    module.cursor = FakeCursor({})
+    module.model = FakeEncoder("fake")
+    module.classifier = _pipeline("zero-shot-classification")
+    module.sentiment_analyzer = _pipeline("sentiment-analysis")
+    FakeEncoder.calls = 0
+    return module
@@ -0,0 +1,101 @@
+"""Общие для нормализатора и анализатора: определение языка и ключевые слова по TF-IDF"""
+import pytest
+
+from news_analyzer.utils import language
+from news_analyzer.utils.keywords import KeywordExtractor
+from news_analyzer.utils.text_processing import TextProcessor
+
+RUSSIAN = "Центральный банк сохранил ключевую ставку, рубль укрепился на фоне высоких цен на нефть"
+ENGLISH = "The central bank kept its key rate on hold and said that inflation has slowed in the third quarter"
+UKRAINIAN = "Національний банк зберіг облікову ставку, гривня зміцнилася на тлі високих цін на нафту"
+
+
+class TestLanguage:
+    """Гистограмма письменностей и статистический детектор только для неоднозначных текстов"""
+
+    @pytest.mark.parametrize("text, expected", [
+        (RUSSIAN, "ru"),
+        (ENGLISH, "en"),
+        ("日本銀行は金融政策決定会合で政策金利を据え置くことを決めました", "ja"),
+        ("한국은행은 기준금리를 동결하고 물가 상승률이 둔화되고 있다고 밝혔습니다", "ko"),
+        ("中国人民银行宣布维持贷款市场报价利率不变以支持经济稳定增长", "zh"),
+    ])
+    def test_script_decides_without_detector(self, monkeypatch, text, expected):
+        monkeypatch.setattr(language, "detect", lambda sample: pytest.fail("детектор не нужен"))
+        assert language._by_script(text) == expected
+
+    def test_ambiguous_text_goes_to_detector(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(language, "detect", lambda sample: calls.append(sample) or "uk")
+        assert language._by_script(UKRAINIAN) is None
+        assert language._identify(UKRAINIAN) == "uk"
+        assert calls == [UKRAINIAN]
+
+    def test_without_detector_ambiguous_text_is_unknown(self, monkeypatch):
+        monkeypatch.setattr(language, "detect", None)
+        assert language._identify("Der Zentralbankrat hat den Leitzins unverändert gelassen") is None
+
+    def test_short_and_empty_text(self):
+        assert language.detect_language("") is None
+        assert language._by_script("ok") is None
+
+    def test_repeated_text_is_memoized(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(language, "detect", lambda sample: calls.append(sample) or "uk")
+        text = UKRAINIAN + " (повтор)"
+        assert language.detect_languages([text, text]) == ["uk", "uk"]
+        assert language.detect_language(text) == "uk"
+        assert len(calls) == 1
+
+
+class TestKeywordExtractor:
+    """TF-IDF с накопительной таблицей частот и затуханием старых документов"""
+
+    def test_common_words_rank_below_rare(self):
+        extractor = KeywordExtractor(half_life=1000)
+        texts = [f"market update stocks {word}" for word in ("oil", "gold", "bitcoin", "wheat")]
+        keywords = extractor.extract(texts, top_k=1)
+        assert keywords == [["oil"], ["gold"], ["bitcoin"], ["wheat"]]
+
+    def test_old_frequencies_halve_every_half_life_documents(self):
+        extractor = KeywordExtractor(half_life=10)
+        extractor.extract(["tariff news"] * 10)
+        assert extractor.df["tariff"] / extractor.documents == pytest.approx(1.0)
+
+        extractor.extract([f"other story {i}" for i in range(10)])
+        # 10 старых документов весят вдвое меньше 10 новых: доля слова 10 / (10 + 2 * 10)
+        assert extractor.df["tariff"] / extractor.documents == pytest.approx(1 / 3)
+
+    def test_word_common_in_recent_stream_stops_being_keyword(self):
+        extractor = KeywordExtractor(half_life=20)
+        extractor.extract([f"tariff {word}" for word in ("steel", "cars", "grain", "chips")] * 10)
+        assert extractor.extract(["tariff copper"], top_k=1) == [["copper"]]
+
+    def test_empty_texts_do_not_change_table(self):
+        extractor = KeywordExtractor()
+        assert extractor.extract(["", "the and for"]) == [[], []]
+        assert extractor.documents == 0
+
+    def test_table_survives_restart(self, tmp_path):
+        path = str(tmp_path / "keyword_df.json")
+        extractor = KeywordExtractor(path, half_life=10)
+        extractor.extract(["tariff news"] * 10 + [f"other story {i}" for i in range(10)])
+        share = extractor.df["tariff"] / extractor.documents
+        extractor.save()
+
+        reloaded = KeywordExtractor(path, half_life=10)
+        assert reloaded.df["tariff"] / reloaded.documents == pytest.approx(share)
+
+
+class TestTextProcessor:
+    """Ключевые слова анализатора: самые частые слова одного текста, без накопленного состояния"""
+
+    def test_keywords_depend_only_on_text(self):
+        processor = TextProcessor()
+        text = "Нефть дорожает: нефть и газ растут, газ дорожает вслед за нефтью"
+        first = processor.extract_keywords(text, top_k=2)
+        assert first == ["нефть", "дорожает"]
+        for _ in range(5):
+            processor.extract_keywords("нефть " * 20)
+        assert processor.extract_keywords(text, top_k=2) == first
+        assert processor.keyword_extractor.documents == 0
@@ -0,0 +1,210 @@
+"""Группы дубликатов: SimHash с LSH-полосами в нормализаторе и группы is_duplicate в базе"""
+import json
+import random
+
+import pytest
+
+from conftest import FakeEncoder
+from normalizer import fingerprints
+from normalizer.fingerprints import FingerprintIndex, hamming, normalize_text, simhash
+
+# Текст длиной с обычную статью: на коротких текстах каждое слово сдвигает много бит SimHash
+_rng = random.Random(1)
+STORY = " ".join(_rng.choice([f"word{i}" for i in range(300)]) for _ in range(400))
+
+
+@pytest.fixture
+def index(tmp_path):
+    fingerprints = FingerprintIndex(str(tmp_path / "fingerprints.sqlite3"), max_distance=3)
+    yield fingerprints
+    fingerprints.close()
+
+
+class TestSimHash:
+    """Отпечатки текста и поиск кандидатов по полосам"""
+
+    def test_short_text_has_no_simhash(self):
+        assert simhash(normalize_text("Fed holds rates")) is None
+
+    def test_small_edit_keeps_simhash_close(self):
+        original = simhash(normalize_text(STORY))
+        edited = simhash(normalize_text(STORY + " Reuters"))
+        assert hamming(original, edited) <= 3
+        assert hamming(original, simhash(normalize_text(" ".join(reversed(STORY.split()))))) > 3
+
+    def test_any_value_within_max_distance_is_found(self, index):
+        rng = random.Random(7)
+        for _ in range(200):
+            value = rng.getrandbits(64)
+            index._index(f"exact-{value}", value, "group")
+            flipped = value
+            for bit in rng.sample(range(64), 3):
+                flipped ^= 1 << bit
+            assert index._near(flipped) == "group"
+
+    def test_value_beyond_max_distance_is_not_a_duplicate(self, index):
+        index._index("exact", 0, "group")
+        # По биту в каждой из четырёх полос: ни одна полоса не совпадает целиком
+        assert index._near(sum(1 << shift for shift, _ in index.band_layout)) is None
+
+    def test_reprint_joins_first_article_group(self, index):
+        assert index.assign("a", "Fed holds rates", STORY) == (index.articles["a"][0], "a", False)
+        _, group, duplicate = index.assign("b", "Fed holds rates", STORY + " Reuters")
+        assert (group, duplicate) == ("a", True)
+        _, group, duplicate = index.assign("c", "Apple earnings", "Apple reported record iPhone sales " * 5)
+        assert (group, duplicate) == ("c", False)
+
+    def test_groups_survive_reload(self, tmp_path, index):
+        index.assign("a", "Fed holds rates", STORY)
+        index.flush()
+        reloaded = FingerprintIndex(str(tmp_path / "fingerprints.sqlite3"), max_distance=3)
+        _, group, duplicate = reloaded.assign("b", "Fed holds rates", STORY + " Reuters")
+        reloaded.close()
+        assert (group, duplicate) == ("a", True)
+
+    @pytest.mark.parametrize("max_distance", [0, 4, 6, 10])
+    def test_bands_cover_all_bits(self, tmp_path, max_distance):
+        index = FingerprintIndex(str(tmp_path / "fingerprints.sqlite3"), max_distance=max_distance)
+        widths = [bits for _, bits in index.band_layout]
+        assert len(widths) == max_distance + 1 and sum(widths) == 64 and max(widths) - min(widths) <= 1
+        assert [shift for shift, _ in index.band_layout] == [sum(widths[:i]) for i in range(len(widths))]
+
+        # Бит в старшей полосе тоже различает отпечатки
+        rng = random.Random(max_distance)
+        for _ in range(50):
+            value = rng.getrandbits(64)
+            index._index(f"exact-{value}", value, str(value))
+            flipped = value
+            for bit in rng.sample(range(64), max_distance):
+                flipped ^= 1 << bit
+            assert index._near(flipped) == str(value)
+        index.close()
+
+    @pytest.mark.parametrize("max_distance", [-1, 64])
+    def test_max_distance_must_leave_a_band(self, tmp_path, max_distance):
+        with pytest.raises(ValueError):
+            FingerprintIndex(str(tmp_path / "fingerprints.sqlite3"), max_distance=max_distance)
+
+    def test_expired_articles_leave_memory_and_disk(self, tmp_path, monkeypatch):
+        now = [1_700_000_000.0]
+        monkeypatch.setattr(fingerprints.time, "time", lambda: now[0])
+        index = FingerprintIndex(str(tmp_path / "fingerprints.sqlite3"), ttl_hours=1)
+        index.assign("a", "Fed holds rates", STORY)
+        index.flush()
+        now[0] += 1800
+        index.assign("b", "Apple earnings", "Apple reported record iPhone sales " * 5)
+        now[0] += 1801
+        index.flush()
+
+        assert set(index.articles) == {"b"} and len(index.exact) == 1
+        assert not any(group == "a" for table in index.tables for bucket in table.values() for _, group in bucket)
+        _, group, duplicate = index.assign("c", "Fed holds rates", STORY)
+        assert (group, duplicate) == ("c", False)
+        index.close()
+
+        reloaded = FingerprintIndex(str(tmp_path / "fingerprints.sqlite3"), ttl_hours=1)
+        assert set(reloaded.articles) == {"b", "c"}
+        reloaded.close()
+
+    def test_normalizer_marks_reprints(self, normalizer, tmp_path):
+        input_path, output_path = tmp_path / "news_newsapi_latest.json", tmp_path / "newsapi.ndjson"
+        articles = [{"url": f"https://example.com/{i}", "title": "Fed holds rates", "language": "en",
+                     "content": STORY + suffix} for i, suffix in enumerate(["", " Reuters"])]
+        input_path.write_text(json.dumps({"raw_data": {"articles": articles}}), encoding="utf-8")
+        normalizer.normalize_files([(str(input_path), str(output_path), "newsapi")], incremental=False)
+
+        first, reprint = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+        assert first["duplicate_group"] == first["id"]
+        assert reprint["duplicate_group"] == first["id"] and reprint["content_hash"] != first["content_hash"]
+
+
+class TestBuildRows:
+    """Группы is_duplicate при загрузке пачки в базу"""
+
+    @staticmethod
+    def stored(loads2, article_id, text, group=-1):
+        loads2.cursor.table[article_id] = {
+            "id": article_id, "is_duplicate": group, "embedding": FakeEncoder("fake").encode(text).tolist(),
+            "category": "macro", "sentiment": "neutral", "sentiment_score": 0, "relevance_score": 0.5,
+            "source_name": None,
+        }
+
+    def test_similar_batch_articles_share_one_group_with_stored_article(self, loads2):
+        self.stored(loads2, "x", "fed holds rates steady")
+        rows = loads2.build_rows([
+            {"id": "a", "title": "fed holds rates steady"},
+            {"id": "b", "title": "fed holds rates steady"},
+            {"id": "c", "title": "fed holds rates steady"},
+        ])
+        groups = {row["id"]: row["is_duplicate"] for row in rows}
+        assert groups == {"a": 0, "b": 0, "c": 0}
+        assert loads2.cursor.table["x"]["is_duplicate"] == 0
+        assert loads2.cursor.updates == [(0, "x")]
+
+    def test_similar_articles_within_batch_get_new_group(self, loads2):
+        self.stored(loads2, "x", "bitcoin jumps", group=4)
+        rows = loads2.build_rows([
+            {"id": "a", "title": "apple earnings beat"},
+            {"id": "b", "title": "apple earnings beat"},
+            {"id": "c", "title": "oil prices slide"},
+        ])
+        groups = {row["id"]: row["is_duplicate"] for row in rows}
+        assert groups["a"] == groups["b"] == 5
+        assert groups["c"] == -1
+        assert loads2.cursor.updates == []
+
+    def test_reprints_reuse_representative_without_models(self, loads2):
+        self.stored(loads2, "x", "fed holds rates steady")
+        FakeEncoder.calls = 0
+        rows = loads2.build_rows([
+            {"id": "a", "title": "fed holds rates steady", "duplicate_group": "x"},
+            {"id": "b", "title": "apple earnings beat"},
+            {"id": "c", "title": "apple earnings beat again", "duplicate_group": "b"},
+        ])
+        groups = {row["id"]: row["is_duplicate"] for row in rows}
+        assert groups["a"] == loads2.cursor.table["x"]["is_duplicate"] == 0
+        assert groups["b"] == groups["c"] == 1
+        assert rows[0]["embedding"] == loads2.cursor.table["x"]["embedding"]
+        # эмбеддинг считается только для b и для запроса "finance news"
+        assert FakeEncoder.calls == 2
+
+
+class TestInsertArticles:
+    """Пачка статей — один INSERT и один commit; при ошибке пачки статьи загружаются по одной"""
+
+    def test_batch_outcomes_in_input_order(self, loads2):
+        loads2.cursor.table["b"] = {"id": "b", "is_duplicate": -1, "embedding": [1.0] * 16}
+        outcomes = loads2.insert_articles([
+            {"id": "a", "title": "fed holds rates steady"},
+            {"id": "b", "title": "apple earnings beat"},
+            {"id": "a", "title": "fed holds rates steady"},
+            {"id": 7, "title": "oil prices slide"},
+        ])
+        assert [(o["id"], o["status"]) for o in outcomes] == [("a", "inserted"), ("b", "exists"),
+                                                              ("a", "exists"), ("7", "inserted")]
+        assert loads2.conn.commits == 1 and set(loads2.cursor.table) == {"a", "b", "7"}
+
+    def test_article_added_by_another_loader_is_not_counted(self, loads2):
+        loads2.cursor.racing = {"b"}
+        outcomes = loads2.insert_articles([{"id": "a", "title": "fed holds rates"}, {"id": "b", "title": "oil"}])
+        assert [o["status"] for o in outcomes] == ["inserted", "exists"]
+
+    def test_failed_batch_is_retried_row_by_row(self, loads2):
+        loads2.cursor.broken = {"b"}
+        outcomes = loads2.insert_articles([
+            {"id": "a", "title": "fed holds rates steady"},
+            {"id": "b", "title": "apple earnings beat"},
+            {"id": "c", "title": "oil prices slide"},
+        ])
+        assert [o["status"] for o in outcomes] == ["inserted", "error", "inserted"]
+        assert outcomes[1]["error"] == "invalid input for b"
+        assert loads2.conn.rollbacks == 2 and loads2.conn.commits == 2
+        assert set(loads2.cursor.table) == {"a", "c"}
+
+    def test_single_article_helper(self, loads2):
+        assert loads2.insert_article({"id": "a", "title": "fed holds rates"})
+        assert not loads2.insert_article({"id": "a", "title": "fed holds rates"})
+        loads2.cursor.broken = {"b"}
+        with pytest.raises(RuntimeError):
+            loads2.insert_article({"id": "b", "title": "oil"})
+        assert loads2.insert_articles([]) == []
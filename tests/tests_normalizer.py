@@ -0,0 +1,485 @@
+"""Нормализатор: параллельное обогащение усечённых статей, кэш скачанного текста, экстракторы,
+статистика доменов, инкрементальный режим,
+разбор страниц в пуле процессов и NDJSON на выходе"""
+import asyncio
+import importlib
+import importlib.util
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import pytest
+
+from normalizer import content_cache, domain_stats
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+from normalizer.content_cache import ContentCache
+from normalizer.domain_stats import DomainStats
+from normalizer.processed_index import ProcessedIndex
+
+
+def truncated(i, domain="a.com", **fields):
+    return {"id": f"id-{i}", "title": f"Headline {i}", "url": f"https://{domain}/news/{i}",
+            "description": f"Short description {i}...", "content": f"Short description {i}...", **fields}
+
+
+def full(i, **fields):
+    return {"title": f"Headline {i}", "url": f"https://example.com/full/{i}", "language": "en",
+            "content": f"Story {i}. {PARAGRAPH} " * 3 + f"End of story {i}.", **fields}
+
+
+def write_input(path, articles):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"source": "newsapi", "raw_data": {"articles": articles}}, f)
+
+
+def read_output(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+PARAGRAPH = "The central bank kept its key rate on hold and said that inflation has slowed in the third quarter."
+ARTICLE_HTML = "<html><body><article>" + f"<p>{PARAGRAPH}</p>" * 5 + "</article></body></html>"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class PageServer:
+    """Подмена fetch_html: страницы по URL, запоминает загрузки"""
+
+    def __init__(self, pages=None, status=None):
+        self.pages = pages or {}
+        self.status = status or {}
+        self.calls = []
+
+    def __call__(self, url, route=None):
+        self.calls.append((url, route))
+        if url in self.pages:
+            return {"html": self.pages[url], "route": route or "direct", "failure": None, "blocked": False}
+        code = self.status.get(url, 404)
+        return {"html": None, "route": "direct", "failure": f"HTTP {code}", "blocked": code in (401, 403)}
+
+
+class ConcurrencyProbe:
+    """Подмена enrich_from_url: считает одновременные загрузки всего и по доменам"""
+
+    def __init__(self, normalizer, delays=None):
+        self.normalizer = normalizer
+        self.delays = delays or {}
+        self.lock = threading.Lock()
+        self.active = Counter()
+        self.peak = Counter()
+
+    def __call__(self, article, deadline=None):
+        domain = self.normalizer.article_domain(article["url"])
+        with self.lock:
+            for key in (domain, "*"):
+                self.active[key] += 1
+                self.peak[key] = max(self.peak[key], self.active[key])
+        time.sleep(self.delays.get(domain, 0.05))
+        with self.lock:
+            for key in (domain, "*"):
+                self.active[key] -= 1
+        article["content"] = "full text " * 40
+        return article
+
+
+class TestEnrichment:
+    """Общий лимит, лимит на домен и дедлайн цикла"""
+
+    def test_limits_total_and_per_domain_downloads(self, normalizer, monkeypatch):
+        probe = ConcurrencyProbe(normalizer)
+        monkeypatch.setattr(normalizer, "enrich_from_url", probe)
+        monkeypatch.setattr(normalizer, "ENRICH_CONCURRENCY", 3)
+        monkeypatch.setattr(normalizer, "ENRICH_PER_DOMAIN", 2)
+        # Два сайта на три общих слота: одному из них достанутся оба своих слота
+        articles = [truncated(i, domain) for i in range(4) for domain in ("a.com", "b.com")]
+
+        stats = asyncio.run(normalizer.enrich_articles_async(articles, time.monotonic() + 10))
+        assert stats == {"enriched": 8, "timed_out": 0, "failed": 0}
+        assert all(art["content"].startswith("full text") for art in articles)
+        assert probe.peak["*"] == 3
+        assert max(probe.peak["a.com"], probe.peak["b.com"]) == 2
+
+    def test_articles_late_for_deadline_keep_description(self, normalizer, monkeypatch):
+        probe = ConcurrencyProbe(normalizer, delays={"slow.com": 1.0})
+        monkeypatch.setattr(normalizer, "enrich_from_url", probe)
+        articles = [truncated(1, "fast.com"), truncated(2, "slow.com")]
+
+        stats = asyncio.run(normalizer.enrich_articles_async(articles, time.monotonic() + 0.3))
+        assert stats == {"enriched": 1, "timed_out": 1, "failed": 0}
+        assert articles[0]["content"].startswith("full text")
+        # Опоздавший поток работает над копией и не меняет статью после дедлайна
+        time.sleep(1.0)
+        assert articles[1]["content"] == "Short description 2..."
+
+    def test_errors_are_counted_per_article(self, normalizer, monkeypatch):
+        def enrich(article, deadline=None):
+            if "bad.com" in article["url"]:
+                raise RuntimeError("boom")
+            return dict(article, content="full text " * 40)
+
+        monkeypatch.setattr(normalizer, "enrich_from_url", enrich)
+        articles = [truncated(1, "bad.com"), truncated(2, "good.com")]
+        stats = asyncio.run(normalizer.enrich_articles_async(articles, time.monotonic() + 5))
+        assert stats == {"enriched": 1, "timed_out": 0, "failed": 1}
+
+
+class TestContentCache:
+    """Текст статьи по каноническому URL между циклами, с TTL и LRU по объёму"""
+
+    def test_roundtrip_by_canonical_url(self, tmp_path):
+        cache = ContentCache(str(tmp_path / "cache.sqlite3"))
+        cache.put("https://www.example.com/a?utm_source=x", "text", author="Jane", published_at="2025-01-01",
+                  language="en")
+        assert cache.get("http://example.com/a") == {"content": "text", "author": "Jane",
+                                                     "published_at": "2025-01-01", "language": "en"}
+        assert cache.get("https://example.com/b") is None
+        assert cache.stats() == {"entries": 1, "bytes": 4, "hits": 1, "misses": 1}
+        cache.close()
+
+        reopened = ContentCache(str(tmp_path / "cache.sqlite3"))
+        assert reopened.get("https://example.com/a")["content"] == "text"
+        reopened.close()
+
+    def test_entries_expire_after_ttl(self, tmp_path, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(content_cache.time, "time", clock)
+        cache = ContentCache(str(tmp_path / "cache.sqlite3"), ttl_hours=1)
+        cache.put("https://example.com/a", "text")
+        clock.now += 3599
+        assert cache.get("https://example.com/a")
+        clock.now += 2
+        assert cache.get("https://example.com/a") is None
+        cache.evict()
+        assert cache.stats()["entries"] == 0
+        cache.close()
+
+    def test_least_recently_read_are_evicted_over_max_bytes(self, tmp_path, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(content_cache.time, "time", clock)
+        cache = ContentCache(str(tmp_path / "cache.sqlite3"), max_bytes=250, evict_every=1)
+        for name in ("a", "b"):
+            clock.now += 1
+            cache.put(f"https://example.com/{name}", "x" * 100)
+        clock.now += 1
+        assert cache.get("https://example.com/a")
+        clock.now += 1
+        cache.put("https://example.com/c", "x" * 100)
+
+        assert cache.get("https://example.com/b") is None
+        assert cache.get("https://example.com/a") and cache.get("https://example.com/c")
+        cache.close()
+
+    def test_enrich_uses_cache_instead_of_download(self, normalizer, monkeypatch):
+        normalizer.init_stores()
+        pages = PageServer({"https://example.com/a": ARTICLE_HTML})
+        monkeypatch.setattr(normalizer, "fetch_html", pages)
+
+        first = normalizer.enrich_from_url(truncated(1, url="https://example.com/a", language="en"))
+        assert first["content"].startswith(PARAGRAPH) and len(pages.calls) == 1
+
+        again = normalizer.enrich_from_url(truncated(2, url="https://example.com/a?utm_medium=rss",
+                                                     keywords=["stale"]))
+        assert len(pages.calls) == 1
+        assert again["content"] == first["content"] and again["language"] == "en"
+        assert again["keywords"] == []  # ключевые слова пересчитает keyword_stage
+
+
+@pytest.fixture
+def extractors(normalizer):
+    return importlib.import_module("normalizer.extractors")
+
+
+class TestExtractors:
+    """Одна загрузка страницы и цепочка экстракторов над ней"""
+
+    NOISY_HTML = ("<html><body><nav><p>Home, Markets, World, Opinion, Subscribe to our newsletter today</p></nav>"
+                  f"<div class='story-body'>{f'<p>{PARAGRAPH}</p>' * 3}</div>"
+                  "<footer><p>Copyright, all rights reserved, terms of use, privacy policy and cookies</p></footer>"
+                  "</body></html>")
+
+    def test_first_long_enough_result_wins(self, extractors):
+        assert extractors.extract_article("https://example.com/a", ARTICLE_HTML)[0] == "paragraphs"
+        name, result = extractors.extract_article("https://example.com/a", ARTICLE_HTML, prefer="readability")
+        assert name == "readability" and result["text"].count(PARAGRAPH) == 5
+
+    def test_readability_drops_navigation_and_footer(self, extractors):
+        _, paragraphs = extractors.extract_article("https://example.com/a", self.NOISY_HTML, prefer="paragraphs")
+        _, readability = extractors.extract_article("https://example.com/a", self.NOISY_HTML, prefer="readability")
+        assert "Copyright" in paragraphs["text"]
+        assert readability["text"] == "\n".join([PARAGRAPH] * 3)
+
+    def test_short_pages_return_longest_result(self, extractors):
+        name, result = extractors.extract_article("https://example.com/a", f"<p>{PARAGRAPH}</p>")
+        assert name == "paragraphs" and result == {"text": PARAGRAPH}
+        assert extractors.extract_article("https://example.com/a", "") == (None, None)
+
+    def test_newspaper_result_with_metadata(self, extractors, monkeypatch):
+        class Article(extractors.Article):
+            def parse(self):
+                self.text, self.authors, self.publish_date = PARAGRAPH * 3, ["Jane Doe"], datetime(2025, 1, 2)
+
+        monkeypatch.setattr(extractors, "Article", Article)
+        name, result = extractors.extract_article("https://example.com/a", ARTICLE_HTML)
+        assert name == "newspaper"
+        assert result["authors"] == ["Jane Doe"] and result["publish_date"] == "2025-01-02T00:00:00"
+
+    def test_enrich_downloads_page_once(self, normalizer, monkeypatch):
+        pages = PageServer({"https://example.com/a": ARTICLE_HTML})
+        monkeypatch.setattr(normalizer, "fetch_html", pages)
+        article = normalizer.enrich_from_url(truncated(1, url="https://example.com/a", language="en"))
+        assert pages.calls == [("https://example.com/a", None)]
+        assert article["content"] == "\n".join([PARAGRAPH] * 5)
+
+        missing = normalizer.enrich_from_url(truncated(2, url="https://example.com/gone"))
+        assert missing["content"] == "Short description 2..."
+
+
+class TestDomainStats:
+    """Домены, с которых текст не достать, пропускаются; удачным сразу даётся рабочий путь"""
+
+    def test_bad_domain_is_skipped_until_retry(self, tmp_path, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(domain_stats.time, "time", clock)
+        stats = DomainStats(str(tmp_path / "domains.sqlite3"), min_attempts=3, retry_after_hours=6)
+        for _ in range(2):
+            stats.record("paywall.com", ok=False, latency=0.5, blocked=True)
+        assert not stats.plan("paywall.com")["skip"]
+        stats.record("paywall.com", ok=False, latency=0.5, blocked=True)
+        assert stats.plan("paywall.com")["skip"] and stats.bad_domains() == ["paywall.com"]
+
+        clock.now += 6 * 3600
+        assert not stats.plan("paywall.com")["skip"]  # одна пробная загрузка
+        assert stats.plan("paywall.com")["skip"]
+        stats.close()
+
+    def test_good_domain_gets_working_route_and_extractor(self, tmp_path):
+        path = str(tmp_path / "domains.sqlite3")
+        stats = DomainStats(path)
+        stats.record("example.com", ok=True, latency=1.0, route="scraperapi", extractor="readability")
+        stats.record("example.com", ok=False, latency=2.0, short=True)
+        assert stats.plan("example.com") == {"skip": False, "route": "scraperapi", "extractor": "readability"}
+        stats.close()
+
+        row = DomainStats(path).get("example.com")
+        assert (row["attempts"], row["successes"], row["short"]) == (2, 1, 1)
+        assert row["avg_latency"] == pytest.approx(0.3 * 2.0 + 0.7 * 1.0)
+
+    def test_enrich_stops_downloading_from_blocking_domain(self, normalizer, monkeypatch):
+        normalizer.init_stores()
+        pages = PageServer(status={f"https://paywall.com/news/{i}": 403 for i in range(5)})
+        monkeypatch.setattr(normalizer, "fetch_html", pages)
+
+        for i in range(5):
+            article = normalizer.enrich_from_url(truncated(i, "paywall.com"))
+            assert article["content"] == f"Short description {i}..."
+        assert len(pages.calls) == 3
+        assert normalizer.DOMAIN_STATS.get("paywall.com")["blocked"] == 3
+
+    def test_enrich_prefers_known_extractor(self, normalizer, monkeypatch):
+        normalizer.init_stores()
+        normalizer.DOMAIN_STATS.record("example.com", ok=True, latency=0.1, route="direct", extractor="readability")
+        monkeypatch.setattr(normalizer, "fetch_html", PageServer({"https://example.com/a": ARTICLE_HTML}))
+        normalizer.enrich_from_url(truncated(1, url="https://example.com/a", language="en"))
+        assert normalizer.DOMAIN_STATS.get("example.com")["extractor"] == "readability"
+
+
+class TestIncremental:
+    """Нормализуются только новые статьи, неизменившиеся файлы не читаются"""
+
+    def test_article_id_is_stable(self, normalizer):
+        assert normalizer.article_id({"id": 7, "url": "https://example.com/a"}, "finnhub") == 7
+        assert normalizer.article_id({"url": "https://example.com/a"}, "newsapi") == \
+            normalizer.generate_hash("https://example.com/a")
+        untitled = {"title": "Headline", "published_at": "2025-01-01"}
+        assert normalizer.article_id(untitled, "newsapi") == normalizer.article_id(dict(untitled), "newsapi")
+        assert normalizer.article_id(untitled, "newsapi") != normalizer.article_id(untitled, "polygon")
+
+    def test_processed_index(self, tmp_path):
+        index = ProcessedIndex(str(tmp_path / "processed.sqlite3"))
+        index.add("newsapi", ["a", "b"])
+        assert index.filter_new("newsapi", ["a", "c"]) == {"c"}
+        assert index.filter_new("polygon", ["a"]) == {"a"}
+
+        input_path = tmp_path / "input.json"
+        input_path.write_text("[]")
+        mark = index.file_mark(str(input_path))
+        assert not index.unchanged("newsapi", mark)
+        index.mark_file("newsapi", mark)
+        assert index.unchanged("newsapi", mark) and not index.unchanged("newsapi", None)
+        assert index.file_mark(str(tmp_path / "missing.json")) is None
+        index.close()
+
+    def test_only_new_articles_are_appended(self, normalizer, tmp_path):
+        input_path, output_path = str(tmp_path / "news_newsapi_latest.json"), str(tmp_path / "newsapi.ndjson")
+        jobs = [(input_path, output_path, "newsapi")]
+        write_input(input_path, [full(1), full(2), full(1)])  # повтор внутри цикла берётся один раз
+        normalizer.normalize_files(jobs, incremental=True)
+        first = read_output(output_path)
+        assert [a["title"] for a in first] == ["Headline 1", "Headline 2"]
+
+        normalizer.normalize_files(jobs, incremental=True)  # файл не менялся
+        assert read_output(output_path) == first
+
+        write_input(input_path, [full(3), full(1), full(2)])
+        os.utime(input_path, ns=(0, 10 ** 18))
+        normalizer.normalize_files(jobs, incremental=True)
+        output = read_output(output_path)
+        assert output[:2] == first and [a["title"] for a in output[2:]] == ["Headline 3"]
+        assert output[2]["id"] == normalizer.generate_hash(full(3)["url"])
+
+    def test_full_mode_rewrites_output(self, normalizer, tmp_path):
+        input_path, output_path = str(tmp_path / "news_newsapi_latest.json"), str(tmp_path / "newsapi.ndjson")
+        jobs = [(input_path, output_path, "newsapi")]
+        write_input(input_path, [full(1), full(1), full(2)])
+        for _ in range(2):
+            normalizer.normalize_files(jobs, incremental=False)
+            assert [a["title"] for a in read_output(output_path)] == ["Headline 1", "Headline 1", "Headline 2"]
+
+
+class FakePool:
+    """ProcessPoolExecutor: future не завершается или пул падает"""
+
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.futures = []
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        future = Future()
+        if self.broken:
+            future.set_exception(BrokenProcessPool("worker died"))
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class TestParsePool:
+    """Разбор в пуле процессов ждётся не дольше дедлайна цикла"""
+
+    def test_single_worker_parses_in_thread(self, normalizer):
+        assert normalizer.start_parse_pool() is None
+        parsed = normalizer.run_parse_page("https://example.com/a", ARTICLE_HTML)
+        assert parsed["extractor"] == "paragraphs" and parsed["worker"] == os.getpid()
+        assert normalizer.PARSE_TIMINGS[os.getpid()][0] >= 1
+
+    def test_result_late_for_deadline_is_abandoned(self, normalizer, monkeypatch):
+        pool = FakePool()
+        monkeypatch.setattr(normalizer, "_parse_pool", pool)
+        started = time.monotonic()
+        assert normalizer.run_parse_page("https://example.com/a", ARTICLE_HTML, deadline=started + 0.2) is None
+        assert time.monotonic() - started < 1 and pool.futures[0].cancelled()
+
+    def test_broken_pool_falls_back_to_thread(self, normalizer, monkeypatch):
+        pool = FakePool(broken=True)
+        monkeypatch.setattr(normalizer, "_parse_pool", pool)
+        parsed = normalizer.run_parse_page("https://example.com/a", ARTICLE_HTML, deadline=time.monotonic() + 5)
+        assert parsed["extractor"] == "paragraphs"
+        assert pool.shut_down and normalizer._parse_pool is None
+
+    def test_late_parse_is_not_blamed_on_domain(self, normalizer, monkeypatch):
+        normalizer.init_stores()
+        monkeypatch.setattr(normalizer, "_parse_pool", FakePool())
+        monkeypatch.setattr(normalizer, "fetch_html", PageServer({"https://example.com/a": ARTICLE_HTML}))
+        article = normalizer.enrich_from_url(truncated(1, url="https://example.com/a"), deadline=time.monotonic())
+        assert article["content"] == "Short description 1..."
+        assert normalizer.DOMAIN_STATS.get("example.com") is None
+
+
+@pytest.fixture
+def news_loader():
+    """NewsLoader прямо из файла: пакет news_analyzer.core тянет за собой LLM-клиент"""
+    spec = importlib.util.spec_from_file_location(
+        "news_loader", os.path.join(SRC_DIR, "news_analyzer", "core", "news_loader.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.NewsLoader()
+
+
+def news_line(i):
+    return json.dumps({"id": i, "title": f"Headline {i}", "url": f"https://example.com/{i}", "source": "newsapi",
+                       "category": "markets", "source_credibility": 3, "collected_at": "2025-01-01T00:00:00"})
+
+
+class TestNdjsonOutput:
+    """Конвейер генераторов пишет NDJSON построчно, читатели не разбирают недописанную строку"""
+
+    def test_each_article_is_visible_as_soon_as_written(self, normalizer, tmp_path):
+        output_path = str(tmp_path / "newsapi.ndjson")
+        seen_by_reader = []
+
+        def items():
+            for i in range(3):
+                if i:
+                    with open(output_path, encoding="utf-8") as f:
+                        seen_by_reader.append(len(f.readlines()))
+                yield 0, {"id": f"id-{i}", "title": f"Headline {i}"}
+
+        written = normalizer.write_stage(items(), [("input.json", output_path, "newsapi")], incremental=False)
+        assert written == {0: ["id-0", "id-1", "id-2"]}
+        assert seen_by_reader == [1, 2]
+        assert [a["id"] for a in read_output(output_path)] == ["id-0", "id-1", "id-2"]
+
+    def test_incremental_appends_until_max_bytes(self, normalizer, tmp_path, monkeypatch):
+        output_path = str(tmp_path / "newsapi.ndjson")
+        jobs = [("input.json", output_path, "newsapi")]
+        normalizer.write_stage(iter([(0, {"id": "a"})]), jobs, incremental=True)
+        normalizer.write_stage(iter([(0, {"id": "b"})]), jobs, incremental=True)
+        assert [a["id"] for a in read_output(output_path)] == ["a", "b"]
+
+        monkeypatch.setattr(normalizer, "OUTPUT_MAX_BYTES", 10)
+        normalizer.write_stage(iter([(0, {"id": "c"})]), jobs, incremental=True)
+        assert [a["id"] for a in read_output(output_path)] == ["c"]
+
+    def test_full_mode_truncates_outputs_without_articles(self, normalizer, tmp_path):
+        output_path = tmp_path / "newsapi.ndjson"
+        output_path.write_text('{"id": "old"}\n', encoding="utf-8")
+        assert normalizer.write_stage(iter([]), [("input.json", str(output_path), "newsapi")], False) == {}
+        assert output_path.read_text(encoding="utf-8") == ""
+
+    def test_pipeline_is_lazy(self, normalizer, tmp_path):
+        input_path = str(tmp_path / "news_newsapi_latest.json")
+        write_input(input_path, [full(i) for i in range(3)])
+        normalizer.init_stores()
+        jobs = [(input_path, str(tmp_path / "newsapi.ndjson"), "newsapi")]
+        items = normalizer.normalize_stage(normalizer.load_stage(jobs, [None], incremental=False), jobs)
+        index, first = next(items)
+        assert index == 0 and first["title"] == "Headline 0" and first["source"] == "newsapi"
+        assert [art["title"] for _, art in items] == ["Headline 1", "Headline 2"]
+
+    def test_news_loader_skips_line_still_being_written(self, news_loader, tmp_path, capsys):
+        path = tmp_path / "newsapi.ndjson"
+        path.write_text(news_line(1) + "\n\n" + news_line(2) + "\n" + news_line(3)[:40], encoding="utf-8")
+        assert [item.id for item in news_loader.iter_ndjson(str(path))] == [1, 2]
+        assert "ещё дописывается" in capsys.readouterr().out
+
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(news_line(3)[40:] + "\n")
+        assert [item.id for item in news_loader.load_json(str(path)).news] == [1, 2, 3]
+
+    def test_database_loader_skips_line_still_being_written(self, database_modules, tmp_path, capsys):
+        main = importlib.import_module("main")
+        path = tmp_path / "newsapi.ndjson"
+        path.write_text(news_line(1) + "\n" + "{broken\n" + news_line(2) + "\n" + news_line(3)[:40],
+                        encoding="utf-8")
+        assert [a["id"] for a in main.iter_ndjson(str(path))] == [1, 2]
+        out = capsys.readouterr().out
+        assert "Битая строка" in out and "ещё дописывается" in out
+
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(news_line(3)[40:] + "\n")
+        assert [a["id"] for a in main.iter_news_file(str(path))] == [1, 2, 3]
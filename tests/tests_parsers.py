@@ -0,0 +1,697 @@
+"""Загрузчик: token bucket, high-water mark провайдера, журнал сырых ответов, клиенты API, circuit breaker,
+метрики, постраничная загрузка, планировщик тематических запросов и разбор JSON"""
+import asyncio
+import io
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from bench_fetcher import run_benchmark
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from clients import json_stream, twelve_data_client
+from clients.twelve_data_client import PriceCache, TwelveDataClient
+from content_filter import ContentFilter
+from cursors import CursorStore, cap_marks
+from metrics import FetcherMetrics
+from mock_server import MockProviderServer
+from news_fetcher import SurgicalNewsFetcher
+from pagination import cursor_pages, numbered_pages
+from query_planner import QueryPlanner, build_query
+from rate_limiter import TokenBucket
+from seen_index import BloomFilter, SeenUrlIndex, canonicalize_url
+from snapshot_log import SnapshotLog, SnapshotStore
+
+BASE = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def article(i, minutes_ago=None, **fields):
+    published = BASE - timedelta(minutes=i if minutes_ago is None else minutes_ago)
+    return {"url": f"https://example.com/news/{i}", "title": f"Long enough headline number {i}",
+            "publishedAt": published.isoformat(), **fields}
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.content = json.dumps(payload).encode()
+        self.text = self.content.decode()
+        self.status_code = status_code
+        self.closed = False
+
+    @property
+    def raw(self):
+        # Тело как поток сокета (для stream=True); читать его можно только один раз
+        if not hasattr(self, "_raw"):
+            self._raw = io.BytesIO(self.content)
+        return self._raw
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """requests.Session: отвечает функцией handler(url, params), запоминает запросы"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []
+
+    def get(self, url, params=None, **kwargs):
+        self.calls.append((url, dict(params or {})))
+        return self.handler(url, params or {})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def mock_fetcher(tmp_path):
+    """Запускает MockProviderServer с настройками провайдеров и загрузчик, направленный на него"""
+    running = []
+
+    def start(**settings):
+        server = MockProviderServer(settings={p: {"jitter": 0, **s} for p, s in settings.items()}, seed=1).start()
+        fetcher = SurgicalNewsFetcher(data_dir=str(tmp_path))
+        server.point_clients(fetcher.clients)
+        running.append((server, fetcher))
+        return fetcher
+
+    yield start
+    for server, fetcher in running:
+        fetcher.close()
+        server.stop()
+
+
+class TestTokenBucket:
+    """Один токен — один запрос, восстановление раз в interval секунд"""
+
+    def test_starts_full_and_refills_over_interval(self):
+        clock = FakeClock()
+        bucket = TokenBucket(interval=10, capacity=2, clock=clock)
+        assert bucket.try_acquire() and bucket.try_acquire()
+        assert not bucket.try_acquire()
+        assert bucket.time_until_available() == pytest.approx(10)
+
+        clock.now += 5
+        assert bucket.available() == pytest.approx(0.5)
+        clock.now += 5
+        assert bucket.try_acquire()
+
+    def test_refill_is_capped_by_capacity(self):
+        clock = FakeClock()
+        bucket = TokenBucket(interval=1, capacity=3, clock=clock)
+        clock.now += 100
+        assert bucket.available() == pytest.approx(3)
+
+    def test_consume_goes_into_debt(self):
+        clock = FakeClock()
+        bucket = TokenBucket(interval=10, capacity=1, clock=clock)
+        bucket.consume(3)
+        assert bucket.available() == pytest.approx(-2)
+        assert bucket.time_until_available() == pytest.approx(30)
+
+
+class TestCursors:
+    """High-water mark провайдера"""
+
+    def test_advance_skips_older_and_boundary_articles(self, tmp_path):
+        cursors = CursorStore(str(tmp_path / "cursors.json"))
+        first = [article(1), article(2), article(3, minutes_ago=1)]
+        cursors.advance("newsapi", first)
+        assert cursors.get("newsapi")["published"] == "2025-01-01T11:59:00"
+
+        # Тот же момент публикации: новая статья проходит, уже виденные — нет
+        same_second = article(9, minutes_ago=1)
+        newer = article(0)
+        assert cursors.filter_new("newsapi", first + [same_second, newer]) == [same_second, newer]
+
+    def test_cursor_is_persisted(self, tmp_path):
+        path = str(tmp_path / "cursors.json")
+        CursorStore(path).advance("newsapi", [article(1)])
+        assert CursorStore(path).filter_new("newsapi", [article(1), article(2)]) == []
+
+    def test_id_cursor(self, tmp_path):
+        cursors = CursorStore(str(tmp_path / "cursors.json"))
+        cursors.advance("finnhub", [{"id": 5, "datetime": 100}, {"id": 7, "datetime": 90}])
+        assert cursors.get("finnhub")["id"] == 7
+        assert [a["id"] for a in cursors.filter_new("finnhub", [{"id": 6}, {"id": 8}])] == [8]
+
+
+    @pytest.mark.parametrize("sort_by_priority", [True, False])
+    def test_articles_cut_by_max_results_come_back(self, tmp_path, sort_by_priority):
+        content_filter = ContentFilter({}, {"max_results": 4, "sort_by_priority": sort_by_priority})
+        cursors = CursorStore(str(tmp_path / "cursors.json"))
+        index = SeenUrlIndex(str(tmp_path / "seen.sqlite3"))
+        articles = [article(i) for i in range(10)]
+
+        delivered = []
+        for _ in range(4):
+            marks, dropped = [], []
+            fresh = index.iter_unseen(cursors.iter_new("newsapi", [dict(a) for a in articles], marks))
+            kept = content_filter.apply(fresh, dropped)
+            cursors.advance_marks("newsapi", cap_marks(marks, dropped))
+            kept, _ = index.remember(kept, "newsapi")
+            delivered += [a["url"] for a in kept]
+
+        assert sorted(delivered) == sorted(a["url"] for a in articles)
+        assert cursors.get("newsapi")["published"] == "2025-01-01T12:00:00"
+        index.close()
+
+    def test_cap_marks_stops_before_oldest_dropped(self):
+        marks = [(BASE, "a", None), (BASE - timedelta(minutes=1), "b", None), (BASE - timedelta(minutes=2), "c", None)]
+        dropped = [(BASE - timedelta(minutes=1), "b", None)]
+        assert cap_marks(marks, dropped) == [marks[2]]
+        assert cap_marks(marks, []) == marks
+
+class TestSnapshotLog:
+    """Сегменты журнала, чтение с offset и восстановление после сбоя"""
+
+    def test_segments_rotate_by_size_and_read_from_offset(self, tmp_path):
+        log = SnapshotLog(str(tmp_path), segment_max_bytes=200)
+        offsets = [log.append({"i": i, "pad": "x" * 30}) for i in range(50)]
+        assert offsets == list(range(50)) and log.next_offset == 50
+
+        segments = log.segments()
+        assert len(segments) > 1 and segments[0][0] == 0
+        assert [base for base, _ in segments] == sorted(base for base, _ in segments)
+        assert [(o, r["i"]) for o, r in log.read(37)] == [(i, i) for i in range(37, 50)]
+        assert [r["i"] for _, r in log.read()] == list(range(50))
+
+    def test_tail_returns_next_offset(self, tmp_path):
+        log = SnapshotLog(str(tmp_path), segment_max_bytes=200)
+        log.append_many([{"i": i} for i in range(20)])
+        records, next_offset = log.tail(10, limit=5)
+        assert [r["i"] for r in records] == [10, 11, 12, 13, 14] and next_offset == 15
+        records, next_offset = log.tail(next_offset)
+        assert [r["i"] for r in records] == list(range(15, 20)) and next_offset == 20
+        assert log.tail(next_offset) == ([], 20)
+
+    def test_torn_tail_is_truncated_on_open(self, tmp_path):
+        log = SnapshotLog(str(tmp_path), segment_max_bytes=200)
+        for i in range(10):
+            log.append({"i": i})
+        _, path = log.segments()[-1]
+        size = os.path.getsize(path)
+        with open(path, "ab") as f:
+            f.write(b"\x1f\x8b\x08garbage")
+
+        # Читатель пропускает недописанный фрейм, при открытии журнала хвост обрезается
+        assert [o for o, _ in log.read(8)] == [8, 9]
+        recovered = SnapshotLog(str(tmp_path), segment_max_bytes=200)
+        assert recovered.next_offset == 10 and os.path.getsize(path) == size
+        assert recovered.append({"i": 10}) == 10
+        assert [r["i"] for _, r in recovered.read(9)] == [9, 10]
+
+    def test_reader_sees_frames_appended_by_another_writer(self, tmp_path):
+        writer = SnapshotLog(str(tmp_path))
+        reader = SnapshotLog(str(tmp_path))
+        writer.append({"i": 0})
+        assert [r["i"] for _, r in reader.read()] == [0]
+        writer.append_many([{"i": 1}, {"i": 2}])
+        assert [(o, r["i"]) for o, r in reader.read(1)] == [(1, 1), (2, 2)]
+
+    def test_store_keeps_one_log_per_provider(self, tmp_path):
+        store = SnapshotStore(str(tmp_path))
+        assert store.append("newsapi", {"a": 1}) == 0
+        assert store.append("finnhub", {"b": 1}) == 0
+        assert store.append("newsapi", {"a": 2}) == 1
+        assert store.tail("newsapi") == ([{"a": 1}, {"a": 2}], 2)
+
+
+class TestTwelveData:
+    """Котировки Twelve Data: батч /price, поштучный запасной путь и кеш"""
+
+    @staticmethod
+    def quotes(params):
+        # Для одного символа ответ плоский, для нескольких — по символам
+        symbols = params["symbol"].split(",")
+        if len(symbols) == 1:
+            return {"price": f"{len(symbols[0])}.00"}
+        return {s: {"price": f"{len(s)}.00"} for s in symbols}
+
+    def test_batch_request_per_chunk(self):
+        session = FakeSession(lambda url, params: FakeResponse(self.quotes(params)))
+        client = TwelveDataClient("key", session=session, batch_size=3, cache=PriceCache())
+        prices = client.get_prices(["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA"])
+
+        assert prices == {s: {"price": f"{len(s)}.00"} for s in ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA"]}
+        assert sorted(params["symbol"] for _, params in session.calls) == ["AAPL,MSFT,GOOGL", "AMZN,TSLA"]
+        assert all(url.endswith("/price") for url, _ in session.calls)
+
+    def test_failed_batch_falls_back_to_single_requests(self):
+        def handler(url, params):
+            if "," in params["symbol"]:
+                return FakeResponse({"status": "error", "message": "batch unavailable"})
+            if params["symbol"] == "TSLA":
+                return FakeResponse({"message": "not found"}, status_code=404)
+            return FakeResponse(self.quotes(params))
+
+        session = FakeSession(handler)
+        client = TwelveDataClient("key", session=session, cache=PriceCache())
+        news = client.get_latest_news(symbols=["AAPL", "MSFT", "TSLA"])
+
+        assert [item["symbol"] for item in news] == ["AAPL", "MSFT"]
+        assert sorted(params["symbol"] for _, params in session.calls) == ["AAPL", "AAPL,MSFT,TSLA", "MSFT", "TSLA"]
+
+    def test_cache_serves_fresh_quotes_until_ttl(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(twelve_data_client.time, "monotonic", clock)
+        session = FakeSession(lambda url, params: FakeResponse(self.quotes(params)))
+        client = TwelveDataClient("key", session=session, cache=PriceCache(ttl=15))
+
+        client.get_prices(["AAPL", "MSFT"])
+        clock.now += 10
+        client.get_prices(["AAPL", "MSFT", "NVDA"])
+        assert [params["symbol"] for _, params in session.calls] == ["AAPL,MSFT", "NVDA"]
+
+        clock.now += 10
+        client.get_prices(["AAPL", "NVDA"])
+        assert [params["symbol"] for _, params in session.calls][2:] == ["AAPL"]
+
+
+class TestContentFilter:
+    """Правила CONTENT_FILTERS, скомпилированные один раз"""
+
+    FILTERS = {
+        "exclude_keywords": ["bet", "promo"],
+        "priority_keywords": ["crash", "interest rate"],
+        "min_title_length": 15,
+        "max_title_length": 80,
+        "min_description_length": 20,
+        "allowed_languages": ["en", "ru"],
+        "exclude_sources": ["promo.com", "casino"],
+    }
+
+    def apply(self, articles, **settings):
+        return ContentFilter(self.FILTERS, {"max_results": 0, **settings}).apply(articles)
+
+    def test_keywords_match_whole_words_only(self):
+        kept = self.apply([
+            article(1, title="Analysts bet on a quick rebound"),
+            article(2, title="Better earnings lift the index"),
+            article(3, title="PROMO: open an account today"),
+            article(4, title="Promotional rates end this week"),
+        ])
+        assert [a["url"] for a in kept] == [article(i)["url"] for i in (2, 4)]
+
+    def test_priority_score_from_title_and_description(self):
+        kept = self.apply([
+            article(1, title="Markets crash after the interest rate decision"),
+            article(2, title="Quiet trading session in Europe", description="Traders fear a crash later this year"),
+            article(3, title="Quiet trading session in Asia"),
+        ], sort_by_priority=False)
+        assert [(a["priority_score"], a["is_priority"]) for a in kept] == [(1.0, True), (0.35, False), (0.0, False)]
+
+    def test_sources_by_domain_and_by_word(self):
+        kept = self.apply([
+            article(1, url="https://news.promo.com/a"),
+            article(2, url="https://notpromo.com/a"),
+            article(3, source={"name": "Casino Daily"}),
+            article(4, source="Reuters"),
+        ])
+        assert [a["url"] for a in kept] == ["https://notpromo.com/a", article(4)["url"]]
+
+    def test_language_and_length_rules(self):
+        kept = self.apply([
+            article(1, language="english"),
+            article(2, language="de"),
+            article(3, language="RU"),
+            article(4),
+            article(5, title="Too short"),
+            article(6, title="x" * 81),
+            article(7, description="short"),
+        ])
+        assert [a["url"] for a in kept] == [article(i)["url"] for i in (1, 3, 4)]
+
+    def test_duplicates_and_best_max_results(self):
+        articles = [article(i) for i in range(5)] + [article(1)]
+        articles[3]["title"] = "Stocks crash across the board"
+        kept = ContentFilter(self.FILTERS, {"max_results": 2}).apply(articles)
+        assert [a["url"] for a in kept] == [article(3)["url"], article(0)["url"]]
+
+
+class TestSeenIndex:
+    """Bloom-фильтр и точный индекс виденных URL"""
+
+    def test_bloom_has_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"key-{i}")
+        assert all(f"key-{i}" in bloom for i in range(1000))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        assert false_positives < 300
+
+    def test_canonical_url_ignores_tracking_and_cosmetics(self):
+        assert canonicalize_url("https://www.Example.com/a/?utm_source=x&id=2&fbclid=y#top") == \
+            canonicalize_url("http://example.com/a?id=2")
+        assert canonicalize_url("https://example.com/a?id=2") != canonicalize_url("https://example.com/a?id=3")
+
+    def test_filter_unseen_across_providers_and_restarts(self, tmp_path):
+        path = str(tmp_path / "seen.sqlite3")
+        index = SeenUrlIndex(path)
+        fresh, duplicates = index.filter_unseen([article(1), article(2), article(1)], "newsapi")
+        assert [a["url"] for a in fresh] == [article(1)["url"], article(2)["url"]] and duplicates == 1
+
+        reprint = dict(article(2), url=article(2)["url"] + "?utm_medium=rss")
+        fresh, duplicates = index.filter_unseen([reprint, article(3)], "newsdata")
+        assert [a["url"] for a in fresh] == [article(3)["url"]] and duplicates == 1
+        index.close()
+
+        reopened = SeenUrlIndex(path)
+        assert reopened.seen(article(1)["url"]) and not reopened.seen(article(4)["url"])
+        reopened.close()
+
+    def test_iter_unseen_records_nothing_until_remember(self, tmp_path):
+        index = SeenUrlIndex(str(tmp_path / "seen.sqlite3"))
+        skipped = Counter()
+        fresh = list(index.iter_unseen([article(1), article(2)], skipped))
+        assert len(fresh) == 2 and len(index) == 0
+
+        # Пока ответ разбирался, другой провайдер успел запомнить тот же URL
+        index.filter_unseen([article(2)], "polygon")
+        kept, raced = index.remember(fresh, "newsapi")
+        assert [a["url"] for a in kept] == [article(1)["url"]] and raced == 1
+        assert len(index) == 2
+        index.close()
+
+
+class TestCircuitBreaker:
+    """closed → open → half-open → closed, cooldown удваивается после неудачной пробы"""
+
+    def test_opens_after_threshold_and_probes_once(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=3, base_cooldown=30, max_cooldown=100, clock=clock)
+        for _ in range(2):
+            breaker.record_failure("boom")
+        assert breaker.state == CLOSED and breaker.allow_request()
+
+        breaker.record_failure("boom")
+        assert breaker.state == OPEN and not breaker.allow_request()
+        assert breaker.snapshot()["retry_in"] == 30
+
+        clock.now += 30
+        assert breaker.allow_request() and breaker.state == HALF_OPEN
+        assert not breaker.allow_request()  # пробный запрос уже в полете
+
+        breaker.record_success()
+        assert breaker.state == CLOSED and breaker.failures == 0 and breaker.allow_request()
+
+    def test_failed_probe_doubles_cooldown_up_to_max(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, base_cooldown=30, max_cooldown=100, clock=clock)
+        breaker.record_failure()
+        cooldowns = []
+        for _ in range(3):
+            clock.now += breaker.cooldown
+            assert breaker.allow_request()
+            breaker.record_failure()
+            cooldowns.append(breaker.cooldown)
+        assert cooldowns == [60, 100, 100] and breaker.trips == 4
+
+        clock.now += 100
+        breaker.allow_request()
+        breaker.record_success()
+        assert breaker.cooldown == 30
+
+    def test_provider_errors_trip_the_breaker(self, mock_fetcher):
+        fetcher = mock_fetcher(marketaux={"latency": 0, "error_rate": 1.0})
+        for _ in range(3):
+            assert "error" in fetcher.fetch_api("marketaux")
+        assert fetcher.breaker_states()["marketaux"]["state"] == OPEN
+
+        result = fetcher.fetch_api("marketaux")
+        assert result["error"] == "circuit open" and result["skipped"]
+
+    def test_response_after_deadline_is_rejected(self, mock_fetcher):
+        fetcher = mock_fetcher(finnhub={"latency": 0.5})
+        result = fetcher.fetch_api("finnhub", deadline=time.monotonic() + 0.1)
+        assert result["error"] == "cycle deadline exceeded" and result["raw_data"] == {}
+        assert fetcher.cursors.get("finnhub") == {}
+
+        result = fetcher.fetch_api("finnhub", deadline=time.monotonic() + 5)
+        assert "error" not in result and result["raw_data"]["articles"]
+
+
+class TestBenchmark:
+    """Офлайн-бенчмарк опрашивает всех провайдеров в каждом цикле"""
+
+    def test_every_provider_is_polled_each_cycle(self):
+        report = run_benchmark(cycles=3, latency=0, jitter=0)
+        assert report["cycles"] == 3 and report["errors"] == 0
+        assert report["requests"] >= 3 * 5 and report["articles"] > 0
+
+
+class TestMetrics:
+    """Счетчики и гистограмма латентности в формате Prometheus"""
+
+    def test_render_prometheus(self):
+        metrics = FetcherMetrics(["newsapi", "finnhub"])
+        metrics.inc("newsapi", "requests_total", 2)
+        metrics.observe_request("newsapi", 0.3)
+        metrics.observe_request("newsapi", 3.0, ok=False)
+        metrics.observe_articles("newsapi", returned=10, fresh=6, filtered=5, new=4, duplicates=1)
+
+        lines = metrics.render_prometheus().splitlines()
+        assert "# TYPE radar_fetch_requests_total counter" in lines
+        assert 'radar_fetch_requests_total{provider="newsapi"} 2' in lines
+        assert 'radar_fetch_errors_total{provider="newsapi"} 1' in lines
+        assert 'radar_fetch_articles_new_total{provider="finnhub"} 0' in lines
+        assert "# TYPE radar_fetch_latency_seconds histogram" in lines
+        assert 'radar_fetch_latency_seconds_bucket{provider="newsapi",le="0.25"} 0' in lines
+        assert 'radar_fetch_latency_seconds_bucket{provider="newsapi",le="0.5"} 1' in lines
+        assert 'radar_fetch_latency_seconds_bucket{provider="newsapi",le="5.0"} 2' in lines
+        assert 'radar_fetch_latency_seconds_bucket{provider="newsapi",le="+Inf"} 2' in lines
+        assert 'radar_fetch_latency_seconds_count{provider="newsapi"} 2' in lines
+
+        snapshot = metrics.snapshot()["newsapi"]
+        assert snapshot["latency_seconds_avg"] == pytest.approx(1.65)
+        assert snapshot["new_per_second"] == pytest.approx(4 / 3.3, abs=1e-3)
+
+    def test_every_http_response_is_counted(self, tmp_path):
+        # Со второй страницей и темами планировщика на провайдера приходится несколько запросов
+        settings = {p: {"latency": 0, "jitter": 0, "pages": 2} for p in ["newsapi", "polygon", "newsdata"]}
+        with MockProviderServer(settings=settings, seed=1) as server:
+            fetcher = SurgicalNewsFetcher(data_dir=str(tmp_path))
+            server.point_clients(fetcher.clients)
+            fetcher.run_cycle()
+            fetcher.close()
+
+        snapshot = fetcher.metrics.snapshot()
+        assert server.stats["newsapi"]["requests"] > 1
+        for api in fetcher.clients:
+            assert snapshot[api]["requests_total"] == server.stats[api]["requests"]
+            assert snapshot[api]["bytes_received_total"] == server.stats[api]["bytes"]
+
+    def test_streamed_body_bytes_are_counted(self, mock_fetcher):
+        body = json.dumps([{"id": i, "headline": f"Long enough headline number {i}", "url": f"https://e.com/{i}",
+                            "datetime": int(time.time()) + i, "summary": "x" * 200} for i in range(200)]).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                # Без Content-Length: объем виден только по мере чтения тела
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                for i in range(0, len(body), 1000):
+                    self.wfile.write(body[i:i + 1000])
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            fetcher = mock_fetcher()
+            fetcher.clients["finnhub"].base_url = f"http://127.0.0.1:{server.server_port}/api/v1"
+            result = fetcher.fetch_api("finnhub")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert "error" not in result and result["raw_data"]["articles"]
+        snapshot = fetcher.metrics.snapshot()["finnhub"]
+        assert snapshot["requests_total"] == 1 and snapshot["bytes_received_total"] == len(body)
+
+
+async def run_inline(fn, *args):
+    return fn(*args)
+
+
+def collect(pages):
+    async def consume():
+        return [page async for page in pages]
+    return asyncio.run(consume())
+
+
+class TestPagination:
+    """Страницы до max_pages, неполной страницы, high-water mark или ошибки"""
+
+    def test_numbered_pages_stop_at_max_pages_or_short_page(self):
+        requested = []
+
+        def fetch_page(page):
+            requested.append(page)
+            return [page] * (2 if page < 3 else 1)
+
+        assert collect(numbered_pages(fetch_page, run_inline, max_pages=2, page_size=2)) == [[1, 1], [2, 2]]
+        requested.clear()
+        assert collect(numbered_pages(fetch_page, run_inline, max_pages=5, page_size=2, concurrency=1)) == \
+            [[1, 1], [2, 2], [3]]
+        assert requested == [1, 2, 3]
+
+    def test_numbered_pages_stop_when_and_errors(self):
+        def fetch_page(page):
+            if page == 3:
+                raise RuntimeError("HTTP 500")
+            return [page, page]
+
+        stop_at_two = collect(numbered_pages(fetch_page, run_inline, 5, 2, stop_when=lambda page: page[0] == 2))
+        assert stop_at_two == [[1, 1], [2, 2]]
+        assert collect(numbered_pages(fetch_page, run_inline, 5, 2)) == [[1, 1], [2, 2]]
+        with pytest.raises(RuntimeError):
+            collect(numbered_pages(lambda page: fetch_page(3), run_inline, 5, 2))
+
+    def test_cursor_pages_follow_cursor_until_limit(self):
+        def fetch_next(cursor):
+            n = int(cursor)
+            return [n], str(n + 1) if n < 4 else None
+
+        def fetch_first():
+            return fetch_next("1")
+
+        assert collect(cursor_pages(fetch_first, fetch_next, run_inline, max_pages=10)) == [[1], [2], [3], [4]]
+        assert collect(cursor_pages(fetch_first, fetch_next, run_inline, max_pages=2)) == [[1], [2]]
+        assert collect(cursor_pages(fetch_first, fetch_next, run_inline, 10, stop_when=lambda page: page == [3])) == \
+            [[1], [2], [3]]
+
+    def test_fetcher_stops_paging_at_the_watermark(self, mock_fetcher):
+        # Без fresh мок отдает одни и те же статьи: во втором цикле первая же страница упирается в курсор
+        fetcher = mock_fetcher(polygon={"latency": 0, "pages": 10, "fresh": False})
+        fetcher.fetch_api("polygon")
+        assert fetcher.metrics.snapshot()["polygon"]["pages_total"] == 4  # PAGINATION_SETTINGS max_pages
+        fetcher.fetch_api("polygon")
+        assert fetcher.metrics.snapshot()["polygon"]["pages_total"] == 5
+
+
+class TestQueryPlanner:
+    """Квота на цикл и выбор тем по EWMA выхода с UCB-бонусом"""
+
+    KEYWORDS = {"movers": ["stock surge"], "banks": ["federal reserve"], "crypto": ["bitcoin"]}
+
+    def planner(self, clock, **options):
+        return QueryPlanner(self.KEYWORDS, {"newsapi": 900}, {"newsapi": 2}, clock=clock, **options)
+
+    def test_build_query_quotes_phrases_and_respects_length(self):
+        assert build_query(["stock surge", "bitcoin", "ipo"], " OR ", 100) == '"stock surge" OR bitcoin OR ipo'
+        assert build_query(["stock surge", "bitcoin", "ipo"], " OR ", 25) == '"stock surge" OR bitcoin'
+
+    def test_allowance_follows_remaining_daily_quota(self):
+        clock = FakeClock()
+        clock.now = 20000 * 86400  # начало суток UTC
+        planner = self.planner(clock)
+        # 96 запросов в сутки, по 2 за цикл раз в 900 с — 48 циклов
+        assert planner.daily_budget("newsapi") == 96 and planner.allowance("newsapi") == 2
+        planner.spend("newsapi", 60)
+        assert planner.allowance("newsapi") == 1
+        planner.spend("newsapi", 100)
+        assert planner.allowance("newsapi") == 1  # сам цикл уже оплачен токеном
+
+        clock.now += 86400  # новые сутки — квота снова полная
+        assert planner.allowance("newsapi") == 2
+
+    def test_untried_topics_first_then_best_yield(self, tmp_path):
+        clock = FakeClock()
+        clock.now = 20000 * 86400 + 43200  # полдень: квоты хватает на две темы за цикл
+        planner = self.planner(clock, smoothing=0.5, state_path=str(tmp_path / "planner.json"))
+        first = [topic for topic, _ in planner.plan("newsapi")]
+        assert first == ["movers", "banks"]
+
+        planner.record("newsapi", first, [["movers"], ["movers", "banks"], ["movers"]])
+        assert [topic for topic, _ in planner.plan("newsapi")] == ["crypto", "movers"]
+
+        planner.record("newsapi", ["crypto", "movers"], [["crypto"]])
+        stats = planner.snapshot()["newsapi"]
+        assert stats["movers"] == {"calls": 2, "yield": 1.5}  # EWMA: 0.5 * 0 + 0.5 * 3
+        assert stats["banks"] == {"calls": 1, "yield": 1} and stats["crypto"] == {"calls": 1, "yield": 1}
+
+        reloaded = self.planner(clock, state_path=str(tmp_path / "planner.json"))
+        assert reloaded.snapshot() == planner.snapshot()
+
+    def test_exploration_bonus_favours_rarely_asked_topics(self):
+        clock = FakeClock()
+        clock.now = 20000 * 86400 + 43200
+        greedy = self.planner(clock, exploration=0)
+        curious = self.planner(clock, exploration=5)
+        for planner in (greedy, curious):
+            for _ in range(5):
+                planner.record("newsapi", ["movers"], [["movers"]] * 2)
+            planner.record("newsapi", ["banks", "crypto"], [["banks"]])
+        assert [topic for topic, _ in greedy.plan("newsapi")] == ["movers", "banks"]
+        assert [topic for topic, _ in curious.plan("newsapi")] == ["banks", "crypto"]
+
+    def test_topics_stay_out_of_saved_articles(self, mock_fetcher, tmp_path):
+        fetcher = mock_fetcher(**{p: {"latency": 0} for p in ["newsapi", "newsdata", "marketaux"]})
+        results = fetcher.run_cycle()
+        for api in ["newsapi", "newsdata", "marketaux"]:
+            articles = results[api]["raw_data"]["articles"]
+            assert articles and not any("topics" in art for art in articles)
+            with open(tmp_path / f"news_{api}_latest.json", encoding="utf-8") as f:
+                assert not any("topics" in art for art in json.load(f)["raw_data"]["articles"])
+            assert any(s["calls"] for s in fetcher.topic_yields()[api].values())
+
+
+class TestJsonStream:
+    """Потоковый разбор через ijson и запасной путь без него"""
+
+    PAYLOAD = {"status": "ok", "data": [{"id": 1, "score": 0.5}, {"id": 2, "score": 1.5}]}
+
+    def test_stream_items_with_ijson(self):
+        response = FakeResponse(self.PAYLOAD)
+        assert list(json_stream.iter_json_items(response, "data")) == self.PAYLOAD["data"]
+        assert response.raw.tell() == len(response.content) and response.closed
+
+    def test_without_ijson_body_is_decoded_whole(self, monkeypatch):
+        monkeypatch.setattr(json_stream, "ijson", None)
+        response = FakeResponse(self.PAYLOAD)
+        assert list(json_stream.iter_json_items(response, "data")) == self.PAYLOAD["data"]
+        assert response.closed and not hasattr(response, "_raw")
+        assert list(json_stream.iter_json_items(FakeResponse(self.PAYLOAD), "missing")) == []
+        assert list(json_stream.iter_json_items(FakeResponse([{"id": 3}]))) == [{"id": 3}]
+
+    def test_already_read_body_is_not_streamed(self):
+        response = FakeResponse(self.PAYLOAD)
+        assert list(json_stream.iter_json_items(response, "data", streamed=False)) == self.PAYLOAD["data"]
+        assert not hasattr(response, "_raw")
+
+    def test_load_json_without_orjson(self, monkeypatch):
+        monkeypatch.setattr(json_stream, "orjson", None)
+        assert json_stream.load_json(FakeResponse(self.PAYLOAD)) == self.PAYLOAD
+
+    def test_get_json_raises_http_errors_before_parsing(self):
+        failed = FakeResponse({"message": "rate limited"}, status_code=429)
+        session = FakeSession(lambda url, params: failed)
+        with pytest.raises(RuntimeError):
+            json_stream.get_json(session, "https://api.example.com/news", stream_key="data", stream=True)
+        assert failed.closed
+
+        session = FakeSession(lambda url, params: FakeResponse(self.PAYLOAD))
+        items = json_stream.get_json(session, "https://api.example.com/news", {"q": "x"}, stream_key="data", stream=True)
+        assert list(items) == self.PAYLOAD["data"]
+        assert json_stream.get_json(session, "https://api.example.com/news") == self.PAYLOAD